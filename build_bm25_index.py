@@ -0,0 +1,62 @@
+"""
+Build the persistent BM25 index for all documents
+Run this once (and after the corpus changes) so search startup
+loads the index instead of re-tokenizing every document
+
+The index holds whole documents. Passage indexing (a TextChunker passed
+to BM25SearchEngine) is opt-in through the API only: the search scripts
+open data/bm25_index without a chunker and would rebuild a passage index.
+"""
+
+from src.document_loader import DocumentLoader
+from src.sparse_search import BM25SearchEngine
+from src.bm25_index import BM25Index
+from loguru import logger
+import os
+import sys
+import time
+
+INDEX_DIR = "data/bm25_index"
+
+
+def build_index(force: bool = False, processes: int = 1):
+    """Tokenize all documents and save the BM25 index to disk"""
+
+    print("=" * 70)
+    print("Building BM25 Index")
+    print("=" * 70)
+
+    # Stream documents into the index builder
+    print("\n1. Building index (streaming documents)...")
+    loader = DocumentLoader("data")
+    start = time.perf_counter()
+    engine = BM25SearchEngine.from_loader(loader, index_dir=INDEX_DIR, rebuild=force,
+                                          processes=processes)
+    elapsed = time.perf_counter() - start
+
+    if not engine.documents:
+        print("\n   ❌ Error: No documents found in data/")
+        return False
+    print(f"   ✓ Index ready in {elapsed:.1f}s")
+
+    # Sanity check: the saved index must load back
+    if BM25Index.load(INDEX_DIR) is None:
+        print("\n   ❌ Error: Saved index could not be loaded")
+        return False
+
+    print("\n" + "=" * 70)
+    print(f"Documents indexed: {engine.num_documents}")
+    print(f"Vocabulary size:   {len(engine.index.vocabulary)}")
+    print(f"Index saved to:    {INDEX_DIR}")
+    print("=" * 70)
+    return True
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")  # Only show warnings and errors
+
+    processes = (os.cpu_count() or 1) if "--parallel" in sys.argv else 1
+    success = build_index(force="--force" in sys.argv, processes=processes)
+    sys.exit(0 if success else 1)
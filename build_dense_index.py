@@ -0,0 +1,66 @@
+"""
+Build the dense embedding index for all documents
+Run this once after the BM25 index (and after the corpus changes) so
+searches map the stored passage embeddings instead of encoding the corpus
+"""
+
+from src.document_loader import DocumentLoader
+from src.sparse_search import BM25SearchEngine
+from src.dense_search import DenseSearchEngine
+from loguru import logger
+import sys
+import time
+
+BM25_INDEX_DIR = "data/bm25_index"
+DENSE_INDEX_DIR = "data/dense_index"
+
+
+def build_index(force: bool = False, dtype: str = "float16", hnsw: bool = False):
+    """Embed every document's passages and save the vectors to disk"""
+
+    print("=" * 70)
+    print("Building Dense Embedding Index")
+    print("=" * 70)
+
+    print("\n1. Loading BM25 engine...")
+    bm25_engine = BM25SearchEngine.from_loader(DocumentLoader("data"), index_dir=BM25_INDEX_DIR)
+    if not bm25_engine.documents:
+        print("\n   ❌ Error: No documents found in data/")
+        return False
+
+    print("\n2. Embedding passages (CPU)...")
+    start = time.perf_counter()
+    try:
+        dense_engine = DenseSearchEngine(bm25_engine, DENSE_INDEX_DIR, dtype=dtype, rebuild=force)
+    except ImportError:
+        print("\n   ❌ Error: sentence-transformers is not installed")
+        print("   pip install sentence-transformers")
+        return False
+    print(f"   ✓ Index ready in {time.perf_counter() - start:.1f}s")
+
+    if hnsw:
+        print("\n3. Building HNSW graph...")
+        try:
+            dense_engine.vectors.build_hnsw()
+        except ImportError:
+            print("\n   ❌ Error: hnswlib is not installed (pip install hnswlib)")
+            return False
+
+    print("\n" + "=" * 70)
+    print(f"Documents embedded: {bm25_engine.num_documents}")
+    print(f"Passages:           {len(dense_engine.vectors)}")
+    print(f"Vector storage:     {dense_engine.vectors.dtype}, dim {dense_engine.vectors.dim}")
+    print(f"Index saved to:     {DENSE_INDEX_DIR}")
+    print("=" * 70)
+    return True
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")  # Only show warnings and errors
+
+    success = build_index(force="--force" in sys.argv,
+                          dtype="int8" if "--int8" in sys.argv else "float16",
+                          hnsw="--hnsw" in sys.argv)
+    sys.exit(0 if success else 1)
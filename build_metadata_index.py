@@ -1,87 +1,213 @@
 """
 Build metadata index for all documents
-Run this once to extract and store metadata
+Run this once to extract and store metadata; later runs only process
+new or changed files (tracked in the file manifest)
 """
 
 from src.document_loader import DocumentLoader
 from src.metadata_extractor import MetadataExtractor
 from src.metadata_store import MetadataStore
 from loguru import logger
+import argparse
 import sys
+from typing import Dict
 from tqdm import tqdm
 
+# Documents written to the database per transaction
+STORE_BATCH_SIZE = 500
 
-def build_index():
-    """Extract metadata from all documents and store in database"""
+
+def plan_update(loader: DocumentLoader, manifest: Dict[str, Dict], full: bool = False):
+    """
+    Decide which files need (re-)extraction
+    
+    A file is unchanged when its size, mtime and extractor version match
+    the manifest; those files are not even read.
+    
+    Returns:
+        (files to load, {relative path: stat}, unchanged count, removed paths)
+    """
+    current_version = MetadataExtractor.EXTRACTOR_VERSION
+    remaining = dict(manifest)
+    to_load = []
+    stats = {}
+    unchanged = 0
+    
+    for filepath in loader.list_files():
+        relative = loader.relative_path(filepath)
+        stat = filepath.stat()
+        entry = remaining.pop(relative, None)
+        if (not full and entry is not None
+                and entry['size'] == stat.st_size
+                and entry['mtime_ns'] == stat.st_mtime_ns
+                and entry['extractor_version'] == current_version):
+            unchanged += 1
+            continue
+        to_load.append(filepath)
+        stats[relative] = stat
+    
+    return to_load, stats, unchanged, list(remaining)
+
+
+def build_index(workers: int = 1, batch_size: int = 32, full: bool = False):
+    """
+    Extract metadata for new or changed documents and store in database
+    
+    Args:
+        workers: spaCy worker processes for extraction
+        batch_size: Documents per spaCy batch
+        full: Re-extract every document regardless of the manifest
+    """
     
     print("=" * 70)
     print("MVP 2: Building Metadata Index")
     print("=" * 70)
     
-    # Load documents
-    print("\n1. Loading documents...")
+    store = MetadataStore("data/metadata.db")
+    current_version = MetadataExtractor.EXTRACTOR_VERSION
+    
+    # Compare the collection against the manifest
+    print("\n1. Scanning documents...")
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    print(f"   ✓ Loaded {len(documents)} documents")
-    
-    # Initialize extractor and store
-    print("\n2. Initializing metadata extractor...")
-    try:
-        extractor = MetadataExtractor()
-        print("   ✓ spaCy model loaded")
-    except OSError as e:
-        print(f"\n   ❌ Error: {e}")
-        print("\n   Please install spaCy model:")
-        print("   python -m spacy download en_core_web_sm")
-        return False
+    manifest = store.get_manifest()
+    to_load, file_stats, unchanged, removed = plan_update(loader, manifest, full)
+    print(f"   ✓ {unchanged} unchanged, {len(to_load)} new or modified, "
+          f"{len(removed)} removed")
     
-    store = MetadataStore("data/metadata.db")
-    print("   ✓ Database initialized")
+    # Forget removed files; their metadata is pruned below
+    if removed:
+        store.remove_from_manifest(removed)
+    
+    # Documents whose metadata is already current (e.g. a copied or touched
+    # file) only need a manifest entry
+    current_doc_ids = {
+        entry['doc_id'] for entry in manifest.values()
+        if entry['extractor_version'] == current_version and not full
+    }
+    pending = {}
+    manifest_only = []
+    
+    def manifest_entry(doc):
+        relative = loader.relative_path(doc['filepath'])
+        stat = file_stats[relative]
+        return {
+            'path': relative,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'content_hash': doc['metadata']['content_hash'],
+            'doc_id': doc['doc_id'],
+            'extractor_version': current_version
+        }
+    
+    def skip_file():
+        # Files that turn out to need no extraction leave the progress total
+        progress.total -= 1
+        progress.refresh()
     
-    # Extract and store metadata for each document
-    print("\n3. Extracting metadata from documents...")
+    def documents_to_extract():
+        for doc in loader.iter_documents(to_load):
+            entry = manifest_entry(doc)
+            if doc['doc_id'] in current_doc_ids:
+                manifest_only.append(entry)
+                skip_file()
+                continue
+            if doc['doc_id'] in pending:
+                # Byte-identical copy already queued in this run
+                pending[doc['doc_id']].append(entry)
+                skip_file()
+                continue
+            pending[doc['doc_id']] = [entry]
+            yield doc['text'], doc['doc_id']
     
-    total_people = set()
-    total_locations = set()
-    total_organizations = set()
-    total_dates = set()
+    num_documents = 0
+    failed_doc_ids = []
+    batch = []
     
-    for doc in tqdm(documents, desc="Processing"):
+    def flush():
+        # One transaction for the batch's metadata, one for its manifest entries
         try:
-            # Extract metadata
-            metadata = extractor.extract_metadata(doc['text'], doc['doc_id'])
-            
-            # Store in database
-            store.store_metadata(metadata)
-            
-            # Collect statistics
-            total_people.update(metadata['people'])
-            total_locations.update(metadata['locations'])
-            total_organizations.update(metadata['organizations'])
-            total_dates.update(metadata['dates'])
-            
+            store.store_many(batch)
+            stored = True
         except Exception as e:
-            logger.error(f"Error processing {doc['filename']}: {e}")
+            # Rolled back; without manifest entries the next run retries them
+            logger.error(f"Error storing metadata of {len(batch)} documents: {e}")
+            failed_doc_ids.extend(metadata['doc_id'] for metadata in batch)
+            stored = False
+        entries = manifest_only[:]
+        for metadata in batch:
+            files = pending.pop(metadata['doc_id'])
+            if stored:
+                entries.extend(files)
+                current_doc_ids.add(metadata['doc_id'])
+        store.update_manifest(entries)
+        batch.clear()
+        manifest_only.clear()
     
-    print(f"\n   ✓ Metadata extracted and stored")
+    if to_load:
+        # Initialize extractor only when there is work to do
+        print("\n2. Initializing metadata extractor...")
+        try:
+            extractor = MetadataExtractor()
+            print("   ✓ spaCy model loaded")
+        except OSError as e:
+            print(f"\n   ❌ Error: {e}")
+            print("\n   Please install spaCy model:")
+            print("   python -m spacy download en_core_web_sm")
+            return False
+        
+        # Extract and store metadata for each new or changed document
+        print(f"\n3. Extracting metadata from documents ({workers} worker(s))...")
+        
+        # One step per extracted document, out of the files still to load
+        progress = tqdm(total=len(to_load), desc="Processing")
+        
+        # Extract metadata in batches (spaCy nlp.pipe)
+        extracted = extractor.extract_metadata_batch(documents_to_extract(),
+                                                     batch_size=batch_size,
+                                                     n_process=workers)
+        
+        # Indexes are rebuilt once at the end when (re)loading everything
+        with store.bulk_load(defer_indexes=full or not manifest):
+            for metadata in extracted:
+                progress.update()
+                num_documents += 1
+                batch.append(metadata)
+                if len(batch) >= STORE_BATCH_SIZE:
+                    # Store in database, then record the source files
+                    flush()
+            flush()
+        # Files the loader could not read were never reached either
+        progress.total = progress.n
+        progress.close()
+        
+        print(f"\n   ✓ Metadata extracted and stored")
+    
+    # Drop metadata of removed files and of files whose content changed
+    pruned = store.prune_unreferenced()
+    
+    entities = store.get_all_entities()
     
     # Display statistics
     print("\n" + "=" * 70)
     print("Metadata Index Statistics")
     print("=" * 70)
-    print(f"\nDocuments indexed:    {len(documents)}")
-    print(f"Unique people:        {len(total_people)}")
-    print(f"Unique locations:     {len(total_locations)}")
-    print(f"Unique organizations: {len(total_organizations)}")
-    print(f"Unique dates:         {len(total_dates)}")
+    print(f"\nDocuments extracted:  {num_documents}")
+    print(f"Documents unchanged:  {unchanged}")
+    if failed_doc_ids:
+        print(f"Documents not stored: {len(failed_doc_ids)} (retried on the next run)")
+    print(f"Documents pruned:     {pruned}")
+    print(f"Unique people:        {len(entities['people'])}")
+    print(f"Unique locations:     {len(entities['locations'])}")
+    print(f"Unique organizations: {len(entities['organizations'])}")
+    print(f"Unique dates:         {len(entities['dates'])}")
     
     # Show sample entities
-    if total_people:
-        print(f"\nSample people: {', '.join(list(total_people)[:10])}")
-    if total_locations:
-        print(f"Sample locations: {', '.join(list(total_locations)[:10])}")
-    if total_organizations:
-        print(f"Sample organizations: {', '.join(list(total_organizations)[:5])}")
+    if entities['people']:
+        print(f"\nSample people: {', '.join(entities['people'][:10])}")
+    if entities['locations']:
+        print(f"Sample locations: {', '.join(entities['locations'][:10])}")
+    if entities['organizations']:
+        print(f"Sample organizations: {', '.join(entities['organizations'][:5])}")
     
     print("\n" + "=" * 70)
     print("✅ Metadata index built successfully!")
@@ -93,10 +219,19 @@ def build_index():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the metadata index")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="spaCy worker processes for extraction (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="documents per spaCy batch (default: 32)")
+    parser.add_argument("--full", action="store_true",
+                        help="re-extract every document, ignoring the manifest")
+    args = parser.parse_args()
+    
     # Configure logging
     logger.remove()
     logger.add(sys.stderr, level="WARNING")  # Only show warnings and errors
     
-    success = build_index()
+    success = build_index(workers=args.workers, batch_size=args.batch_size, full=args.full)
     sys.exit(0 if success else 1)
 
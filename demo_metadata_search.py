@@ -22,19 +22,14 @@ def demo():
         print("\nPlease run: python build_metadata_index.py")
         return
     
-    # Load documents
-    print("\n1. Loading documents...")
+    # Load (or build) BM25 index
+    print("\n1. Loading BM25 search index...")
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    print(f"   ✓ Loaded {len(documents)} documents")
-    
-    # Build BM25 index
-    print("\n2. Building BM25 search index...")
-    bm25_engine = BM25SearchEngine(documents)
-    print(f"   ✓ Index ready")
+    bm25_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
+    print(f"   ✓ Index ready ({len(bm25_engine.documents)} documents)")
     
     # Load metadata store
-    print("\n3. Loading metadata store...")
+    print("\n2. Loading metadata store...")
     metadata_store = MetadataStore("data/metadata.db")
     print(f"   ✓ Metadata loaded")
     
@@ -13,16 +13,11 @@ def demo():
     print("MVP 1: Document Search System Demo")
     print("=" * 70)
     
-    # Load documents
-    print("\n1. Loading documents from data/ folder...")
+    # Load (or build) search index
+    print("\n1. Loading BM25 search index for data/ folder...")
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    print(f"   ✓ Loaded {len(documents)} documents")
-    
-    # Build search index
-    print("\n2. Building BM25 search index...")
-    search_engine = BM25SearchEngine(documents)
-    print(f"   ✓ Index ready!")
+    search_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
+    print(f"   ✓ Index ready! ({len(search_engine.documents)} documents)")
     
     # Demo queries
     demo_queries = [
@@ -33,7 +28,7 @@ def demo():
         "investigation"
     ]
     
-    print("\n3. Running demo queries:")
+    print("\n2. Running demo queries:")
     print("-" * 70)
     
     for query in demo_queries:
@@ -27,16 +27,14 @@ def main():
     # Load documents and build index
     print("\nLoading search system...")
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    
-    bm25_engine = BM25SearchEngine(documents)
+    bm25_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
     metadata_store = MetadataStore("data/metadata.db")
     enhanced_search = EnhancedSearchEngine(bm25_engine, metadata_store)
     
     # Get available entities
     entities = metadata_store.get_all_entities()
     
-    print(f"✓ Loaded {len(documents)} documents")
+    print(f"✓ Loaded {len(bm25_engine.documents)} documents")
     print(f"✓ Metadata: {len(entities['people'])} people, "
           f"{len(entities['locations'])} locations, "
           f"{len(entities['organizations'])} organizations")
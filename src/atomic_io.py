@@ -0,0 +1,35 @@
+"""
+Replace index files without disturbing processes that have them mapped
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+TEMP_SUFFIX = ".tmp"
+
+
+def temp_path(path: Path) -> Path:
+    """Sibling path the replacement for path is written to"""
+    path = Path(path)
+    return path.with_name(path.name + TEMP_SUFFIX)
+
+
+def commit_file(path: Path):
+    """Move a finished replacement written to temp_path(path) into place"""
+    os.replace(temp_path(path), path)
+
+
+def save_array(path: Path, array: np.ndarray):
+    """
+    Write an .npy file next to path, then rename it over path
+
+    Rewriting the file in place would change or truncate pages that
+    readers have memory-mapped (a truncated page raises SIGBUS). The
+    rename gives path a new inode; existing mappings keep the old one
+    until they are closed.
+    """
+    with open(temp_path(path), "wb") as f:
+        np.save(f, array)
+    commit_file(path)
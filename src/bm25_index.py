@@ -0,0 +1,684 @@
+"""
+Persistent inverted index for BM25 scoring
+"""
+
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.atomic_io import save_array
+from src.positional_index import PositionalIndex
+from src.token_arrays import TokenArrays
+
+# Bump whenever the on-disk layout or scoring semantics change
+INDEX_FORMAT_VERSION = 6
+
+META_FILE = "bm25_meta.json"
+VOCAB_FILE = "bm25_vocab.json"
+# Below this many query postings an exhaustive scan beats MaxScore bookkeeping
+MAXSCORE_MIN_POSTINGS = 50000
+
+ARRAY_FILES = ["term_ptr", "post_docs", "post_tfs", "doc_len", "idf", "term_max"]
+
+
+class BM25Index:
+    """
+    Inverted index with BM25Okapi statistics
+
+    Postings are stored CSR-style: the postings of term ``t`` live in
+    ``post_docs[term_ptr[t]:term_ptr[t + 1]]`` (document ordinals, ascending)
+    and ``post_tfs`` (term frequencies) at the same positions. The
+    corpus itself is kept as int32 term-id sequences (TokenArrays) over
+    the same vocabulary, and the token positions of every posting
+    (PositionalIndex) answer phrase and proximity queries.
+    """
+
+    def __init__(self,
+                 vocabulary: Dict[str, int],
+                 term_ptr: np.ndarray,
+                 post_docs: np.ndarray,
+                 post_tfs: np.ndarray,
+                 doc_len: np.ndarray,
+                 idf: np.ndarray,
+                 term_max: Optional[np.ndarray] = None,
+                 k1: float = 1.5,
+                 b: float = 0.75,
+                 epsilon: float = 0.25,
+                 tokens: Optional[TokenArrays] = None,
+                 positions: Optional[PositionalIndex] = None):
+        self.vocabulary = vocabulary
+        self.tokens = tokens
+        self.positions = positions
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_len = doc_len
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.corpus_size = len(doc_len)
+        total_tokens = int(doc_len.sum())
+        self.avgdl = total_tokens / self.corpus_size if self.corpus_size else 0.0
+
+        # Per-document length normalization, shared by every query term
+        self.doc_norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl) \
+            if self.corpus_size else np.zeros(0)
+
+        # Per-term score upper bounds used for MaxScore pruning
+        self.term_max = term_max if term_max is not None else self._compute_term_max()
+
+    @classmethod
+    def build(cls,
+              tokenized_corpus: Iterable[List[str]],
+              k1: float = 1.5,
+              b: float = 0.75,
+              epsilon: float = 0.25) -> "BM25Index":
+        """
+        Build index from tokenized documents
+
+        Term ids are assigned in order of first appearance, which keeps the
+        IDF computation identical to rank_bm25's BM25Okapi.
+
+        Args:
+            tokenized_corpus: Iterable of token lists, one per document, or
+                              of (tokens, byte offsets) pairs to also keep
+                              token offsets for snippets
+            k1, b, epsilon: BM25Okapi parameters
+
+        Returns:
+            BM25Index instance
+        """
+        vocabulary: Dict[str, int] = {}
+        tokens = TokenArrays.from_tokens(tokenized_corpus, vocabulary)
+        return cls.build_from_arrays(tokens, vocabulary, k1=k1, b=b, epsilon=epsilon)
+
+    @classmethod
+    def build_from_arrays(cls,
+                          tokens: TokenArrays,
+                          vocabulary: Dict[str, int],
+                          k1: float = 1.5,
+                          b: float = 0.75,
+                          epsilon: float = 0.25) -> "BM25Index":
+        """
+        Build index from integer-encoded documents
+
+        Term frequencies are counted for the whole corpus at once: each
+        token becomes the key term * corpus_size + doc, and one stable
+        sort of the keys yields the postings grouped by term with
+        ascending document ordinals, each followed by its token
+        positions in text order.
+
+        Args:
+            tokens: Term-id sequences of all documents
+            vocabulary: Term -> id mapping the sequences were encoded with
+            k1, b, epsilon: BM25Okapi parameters
+
+        Returns:
+            BM25Index instance
+        """
+        corpus_size = len(tokens)
+        doc_ids = tokens.doc_ids()
+        keys = tokens.doc_tokens.astype(np.int64) * max(corpus_size, 1) + doc_ids
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        segment_starts = np.ones(len(keys), dtype=bool)
+        segment_starts[1:] = keys[1:] != keys[:-1]
+        first = np.flatnonzero(segment_starts)
+        post_tfs = np.diff(np.append(first, len(keys))).astype(np.int32)
+        keys = keys[first]
+        terms = keys // max(corpus_size, 1)
+        post_docs = (keys - terms * corpus_size).astype(np.int32)
+
+        token_positions = np.arange(len(order), dtype=np.int64) - tokens.doc_ptr[doc_ids]
+        positions = PositionalIndex.from_sorted(token_positions[order], segment_starts, post_tfs)
+
+        doc_freqs = np.bincount(terms, minlength=len(vocabulary))
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=term_ptr[1:])
+
+        doc_len = tokens.lengths()
+        idf = cls._compute_idf(doc_freqs, corpus_size, epsilon)
+
+        return cls(vocabulary, term_ptr, post_docs, post_tfs, doc_len, idf,
+                   k1=k1, b=b, epsilon=epsilon, tokens=tokens, positions=positions)
+
+    @staticmethod
+    def _compute_idf(doc_freqs: np.ndarray, corpus_size: int, epsilon: float) -> np.ndarray:
+        """Okapi IDF with negative values floored at epsilon * average IDF"""
+        idf = np.zeros(len(doc_freqs), dtype=np.float64)
+        if len(doc_freqs) == 0:
+            return idf
+
+        # math.log in term-id order mirrors BM25Okapi._calc_idf exactly
+        idf_sum = 0.0
+        for term_id, freq in enumerate(doc_freqs.tolist()):
+            value = math.log(corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            idf[term_id] = value
+            idf_sum += value
+
+        average_idf = idf_sum / len(doc_freqs)
+        idf[idf < 0] = epsilon * average_idf
+        return idf
+
+    def _compute_term_max(self) -> np.ndarray:
+        """Largest single-document contribution of each term"""
+        if len(self.post_docs) == 0:
+            return np.zeros(len(self.vocabulary))
+        doc_freqs = np.diff(self.term_ptr)
+        posting_idf = np.repeat(self.idf, doc_freqs)
+        q_freq = self.post_tfs
+        contributions = posting_idf * (
+            q_freq * (self.k1 + 1) / (q_freq + self.doc_norm[self.post_docs])
+        )
+        return np.maximum.reduceat(contributions, self.term_ptr[:-1])
+
+    def postings(self, term: str):
+        """
+        Posting list for a term
+
+        Returns:
+            (doc ordinals, term frequencies) arrays, or None for unknown terms
+        """
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+        return self.post_docs[start:end], self.post_tfs[start:end]
+
+    def term_scores(self, term: str):
+        """
+        BM25 contribution of one term to each document in its posting list
+
+        Returns:
+            (doc ordinals, scores) arrays, or None for unknown terms
+        """
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        return self._term_id_scores(term_id)
+
+    def score(self, query_tokens: List[str]):
+        """
+        Score only the documents that contain at least one query term
+
+        Work is proportional to the total posting-list length of the query
+        terms, not to the corpus size. Contributions are summed per document
+        in query-token order, so scores are bit-identical to BM25Okapi.
+
+        Args:
+            query_tokens: Tokenized query (repeated tokens count repeatedly)
+
+        Returns:
+            (doc ordinals, scores) arrays; ordinals are ascending and unique
+        """
+        doc_parts = []
+        score_parts = []
+        for token in query_tokens:
+            contribution = self.term_scores(token)
+            if contribution is not None:
+                doc_parts.append(contribution[0])
+                score_parts.append(contribution[1])
+
+        if not doc_parts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        if len(doc_parts) == 1:
+            return np.array(doc_parts[0]), score_parts[0]
+
+        docs = np.concatenate(doc_parts)
+        contributions = np.concatenate(score_parts)
+        return self._accumulate(docs, contributions)
+
+    def _accumulate(self, docs: np.ndarray, contributions: np.ndarray):
+        """Sum contributions per document, preserving input order within a document"""
+        if len(docs) * 8 < self.corpus_size:
+            # Short posting lists: sort-based merge avoids touching the whole corpus
+            unique_docs, slots = np.unique(docs, return_inverse=True)
+            return unique_docs, np.bincount(slots, weights=contributions,
+                                            minlength=len(unique_docs))
+        touched = np.zeros(self.corpus_size, dtype=bool)
+        touched[docs] = True
+        unique_docs = np.flatnonzero(touched).astype(np.int32)
+        dense = np.bincount(docs, weights=contributions, minlength=self.corpus_size)
+        return unique_docs, dense[unique_docs]
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """
+        Compute BM25 scores for every document
+
+        Args:
+            query_tokens: Tokenized query
+
+        Returns:
+            Array of scores indexed by document ordinal
+        """
+        scores = np.zeros(self.corpus_size)
+        docs, doc_scores = self.score(query_tokens)
+        scores[docs] = doc_scores
+        return scores
+
+    def top_k(self,
+              query_tokens: List[str],
+              k: int,
+              allowed: Optional[np.ndarray] = None,
+              proximity_weight: float = 0.0):
+        """
+        Highest-scoring documents without scoring every posting
+
+        Uses MaxScore dynamic pruning: terms are accumulated in decreasing
+        order of their score upper bound, and once the bounds of the
+        remaining terms cannot lift an unseen document past the current
+        k-th best partial score, those terms are only probed for the
+        surviving candidates (binary search into their posting lists)
+        instead of being scanned. Final scores are computed exactly and
+        match score().
+
+        Args:
+            query_tokens: Tokenized query
+            k: Number of documents to return
+            allowed: Optional boolean mask over document ordinals; only
+                     documents where it is True are returned
+            proximity_weight: If positive, scores of documents containing
+                              every query term are multiplied by
+                              1 + proximity_weight * closeness (see proximity())
+
+        Returns:
+            (doc ordinals, scores) arrays sorted by descending score,
+            ties broken by document ordinal
+        """
+        term_ids = [self.vocabulary[t] for t in query_tokens if t in self.vocabulary]
+        if not term_ids or k <= 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+
+        if proximity_weight > 0 and self.positions is not None and len(set(term_ids)) > 1:
+            return self._top_k_proximity(query_tokens, k, allowed, proximity_weight)
+
+        if allowed is not None:
+            return self._top_k_allowed(query_tokens, term_ids, k, allowed)
+
+        # Pruning relies on contributions being non-negative
+        if len(set(term_ids)) == 1 or (self.idf[term_ids] < 0).any():
+            docs, scores = self.score(query_tokens)
+            return self._select_top(docs, scores, k)
+
+        multiplicity = Counter(term_ids)
+        ordered = sorted(multiplicity, key=lambda t: self.term_max[t], reverse=True)
+        bounds = [float(self.term_max[t]) * multiplicity[t] for t in ordered]
+        remaining_bounds = [sum(bounds[i + 1:]) for i in range(len(ordered))]
+        total_postings = sum(int(self.term_ptr[t + 1] - self.term_ptr[t]) for t in ordered)
+
+        # The k-th best partial score after i terms is at most the sum of their
+        # bounds, so pruning is only possible where that exceeds the rest
+        can_prune = [
+            0 < remaining_bounds[i] < sum(bounds[:i + 1]) for i in range(len(ordered))
+        ]
+        if total_postings < MAXSCORE_MIN_POSTINGS or not any(can_prune):
+            docs, scores = self.score(query_tokens)
+            return self._select_top(docs, scores, k)
+
+        # Essential terms: scan posting lists until unseen documents are ruled out
+        partial = np.zeros(self.corpus_size)
+        touched = np.zeros(self.corpus_size, dtype=bool)
+        candidates = None
+        for i, term_id in enumerate(ordered):
+            term_docs, term_contrib = self._term_id_scores(term_id)
+            partial[term_docs] += term_contrib * multiplicity[term_id]
+            touched[term_docs] = True
+            if not can_prune[i]:
+                continue
+
+            seen = np.flatnonzero(touched)
+            if len(seen) < k:
+                continue
+            threshold = self._kth_largest(partial[seen], k)
+            if remaining_bounds[i] < threshold:
+                candidates = seen[partial[seen] + remaining_bounds[i] >= threshold]
+                break
+
+        if candidates is None:
+            # No early termination: every query posting was scanned anyway
+            docs, scores = self.score(query_tokens)
+            return self._select_top(docs, scores, k)
+
+        # Non-essential terms: probe only the surviving candidates, re-pruning
+        # as partial scores grow and the remaining bound shrinks
+        candidate_partial = partial[candidates]
+        for j in range(i + 1, len(ordered)):
+            term_id = ordered[j]
+            candidate_partial += self._probe(term_id, candidates) * multiplicity[term_id]
+            threshold = self._kth_largest(candidate_partial, k)
+            keep = candidate_partial + remaining_bounds[j] >= threshold
+            candidates, candidate_partial = candidates[keep], candidate_partial[keep]
+
+        candidates = candidates.astype(np.int32)
+        return self._select_top(candidates, self._score_candidates(query_tokens, candidates), k)
+
+    def _top_k_allowed(self, query_tokens: List[str], term_ids: List[int], k: int,
+                       allowed: np.ndarray):
+        """Top k among the allowed documents, scoring whichever side is smaller"""
+        allowed_docs = np.flatnonzero(allowed).astype(np.int32)
+        total_postings = sum(int(self.term_ptr[t + 1] - self.term_ptr[t]) for t in set(term_ids))
+
+        if len(allowed_docs) < total_postings:
+            # Selective filter: score only the allowed documents
+            scores = self._score_candidates(query_tokens, allowed_docs)
+            matched = self._contains_any(term_ids, allowed_docs)
+            return self._select_top(allowed_docs[matched], scores[matched], k)
+
+        # Broad filter: mask the sparse score vector, then select
+        docs, scores = self.score(query_tokens)
+        keep = allowed[docs]
+        return self._select_top(docs[keep], scores[keep], k)
+
+    def _top_k_proximity(self, query_tokens: List[str], k: int,
+                         allowed: Optional[np.ndarray], weight: float):
+        """
+        Top k with scores of documents containing all terms raised by proximity
+
+        Only those documents change score, and only upwards, so any other
+        document in the final top k is also in the unboosted top k.
+        """
+        docs, scores = self.top_k(query_tokens, k, allowed)
+        near_docs, closeness = self.proximity(query_tokens, allowed)
+        if len(near_docs) == 0:
+            return docs, scores
+        near_scores = self._score_candidates(query_tokens, near_docs) * (1 + weight * closeness)
+        keep = ~np.isin(docs, near_docs)
+        return self._select_top(np.concatenate((docs[keep], near_docs)),
+                                np.concatenate((scores[keep], near_scores)), k)
+
+    def _doc_freq(self, term_id: int) -> int:
+        """Number of documents containing a term"""
+        return int(self.term_ptr[term_id + 1] - self.term_ptr[term_id])
+
+    def _intersect(self, term_ids: List[int], allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sorted ordinals of the (allowed) documents containing every term"""
+        ordered = sorted(set(term_ids), key=self._doc_freq)
+        docs = self.post_docs[self.term_ptr[ordered[0]]:self.term_ptr[ordered[0] + 1]]
+        if allowed is not None:
+            docs = docs[allowed[docs]]
+        # Probe the rarest list's documents into the longer lists
+        for term_id in ordered[1:]:
+            docs = docs[self._contains_any([term_id], docs)]
+        return np.asarray(docs, dtype=np.int32)
+
+    def _term_positions(self, term_id: int, docs: np.ndarray):
+        """(slot into docs, position) of a term in sorted documents that all contain it"""
+        start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+        return self.positions.decode(start + np.searchsorted(self.post_docs[start:end], docs))
+
+    def phrase_docs(self, phrase_tokens: List[str], allowed: Optional[np.ndarray] = None):
+        """
+        Documents containing the tokens as a consecutive sequence
+
+        Candidates are the documents containing every phrase term (the
+        same intersection a keyword query touches). Within them, only the
+        positions of the phrase term with the fewest occurrences are
+        decoded; each implies a phrase start that the other terms are
+        checked against by direct lookup in the corpus token arrays (or,
+        without them, by probing their decoded positions).
+
+        Args:
+            phrase_tokens: Tokenized phrase
+            allowed: Optional boolean mask restricting the documents
+
+        Returns:
+            (doc ordinals, phrase frequencies) arrays; ordinals ascending
+        """
+        empty = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        if self.positions is None:
+            raise ValueError("Index was built without token positions")
+        term_ids = [self.vocabulary.get(token) for token in phrase_tokens]
+        if not term_ids or None in term_ids:
+            return empty
+        docs = self._intersect(term_ids, allowed)
+        if len(docs) == 0:
+            return empty
+
+        pos_ptr = self.positions.pos_ptr
+        anchor = min(range(len(term_ids)), key=lambda i: pos_ptr[self.term_ptr[term_ids[i] + 1]]
+                     - pos_ptr[self.term_ptr[term_ids[i]]])
+        slots, positions = self._term_positions(term_ids[anchor], docs)
+        start_docs = docs[slots]
+        starts = positions - anchor
+        fits = (starts >= 0) & (starts + len(term_ids) <= self.doc_len[start_docs])
+        start_docs, starts = start_docs[fits], starts[fits]
+
+        for offset, term_id in enumerate(term_ids):
+            if offset == anchor or len(starts) == 0:
+                continue
+            if self.tokens is not None:
+                token_index = self.tokens.doc_ptr[start_docs] + starts + offset
+                match = self.tokens.doc_tokens[token_index] == term_id
+            else:
+                # Sorted doc * stride + position keys on both sides
+                stride = int(self.doc_len.max()) + 1
+                slots, positions = self._term_positions(term_id, docs)
+                keys = docs[slots].astype(np.int64) * stride + positions
+                wanted = start_docs.astype(np.int64) * stride + starts + offset
+                found = np.searchsorted(keys, wanted)
+                found[found == len(keys)] = 0
+                match = keys[found] == wanted
+            start_docs, starts = start_docs[match], starts[match]
+
+        docs = self._sorted_unique(start_docs)
+        return docs, np.diff(np.searchsorted(start_docs, docs), append=len(start_docs))
+
+    @staticmethod
+    def _sorted_unique(values: np.ndarray) -> np.ndarray:
+        """Distinct values of a sorted array, as int32"""
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = values[1:] != values[:-1]
+        return values[keep].astype(np.int32)
+
+    def proximity(self, query_tokens: List[str], allowed: Optional[np.ndarray] = None):
+        """
+        How close the query terms occur in documents containing all of them
+
+        For each pair of consecutive distinct query terms, the smallest
+        token distance between their occurrences is found by merging the
+        sorted position keys of both terms. A document's closeness is the
+        mean of 1 / distance over the pairs: 1.0 when every pair occurs
+        adjacently somewhere, approaching 0 as the terms drift apart.
+
+        Args:
+            query_tokens: Tokenized query
+            allowed: Optional boolean mask restricting the documents
+
+        Returns:
+            (doc ordinals, closeness) arrays; ordinals ascending, empty
+            for fewer than two distinct known terms
+        """
+        term_ids = list(dict.fromkeys(self.vocabulary[t] for t in query_tokens
+                                      if t in self.vocabulary))
+        if len(term_ids) < 2 or self.positions is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        docs = self._intersect(term_ids, allowed)
+        if len(docs) == 0:
+            return docs, np.zeros(0)
+
+        stride = int(self.doc_len.max()) + 1
+        keys = {}
+        for term_id in term_ids:
+            slots, positions = self._term_positions(term_id, docs)
+            keys[term_id] = slots, slots.astype(np.int64) * stride + positions
+
+        closeness = np.zeros(len(docs))
+        for first, second in zip(term_ids, term_ids[1:]):
+            slots_a, keys_a = keys[first]
+            slots_b, keys_b = keys[second]
+            # Nearest occurrence of the first term before and after each of the second
+            after = np.searchsorted(keys_a, keys_b)
+            before = np.maximum(after - 1, 0)
+            after = np.minimum(after, len(keys_a) - 1)
+            distance = np.minimum(
+                np.where(slots_a[after] == slots_b, np.abs(keys_a[after] - keys_b), np.inf),
+                np.where(slots_a[before] == slots_b, np.abs(keys_b - keys_a[before]), np.inf)
+            )
+            # Every document has an occurrence of both terms
+            doc_starts = np.searchsorted(slots_b, np.arange(len(docs)))
+            closeness += 1.0 / np.minimum.reduceat(distance, doc_starts)
+        return docs, closeness / (len(term_ids) - 1)
+
+    def _contains_any(self, term_ids: List[int], candidates: np.ndarray) -> np.ndarray:
+        """Mask of sorted candidates that contain at least one of the terms"""
+        found = np.zeros(len(candidates), dtype=bool)
+        for term_id in set(term_ids):
+            term_docs = self.post_docs[self.term_ptr[term_id]:self.term_ptr[term_id + 1]]
+            pos = np.searchsorted(term_docs, candidates)
+            pos[pos == len(term_docs)] = 0
+            found |= term_docs[pos] == candidates
+        return found
+
+    @staticmethod
+    def _kth_largest(values: np.ndarray, k: int) -> float:
+        """k-th largest value, lowered slightly to absorb summation-order rounding"""
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        return threshold - 1e-9 * abs(threshold)
+
+    def _term_id_scores(self, term_id: int):
+        """Posting docs and BM25 contributions for a term id"""
+        start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+        docs = self.post_docs[start:end]
+        q_freq = self.post_tfs[start:end]
+        return docs, self.idf[term_id] * (q_freq * (self.k1 + 1) / (q_freq + self.doc_norm[docs]))
+
+    def _probe(self, term_id: int, candidates: np.ndarray) -> np.ndarray:
+        """BM25 contribution of a term for each of a sorted array of candidates"""
+        start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+        if len(candidates) * 16 > end - start:
+            # Many candidates: one dense scatter beats per-candidate binary search
+            term_docs, term_contrib = self._term_id_scores(term_id)
+            dense = np.zeros(self.corpus_size)
+            dense[term_docs] = term_contrib
+            return dense[candidates]
+
+        term_docs = self.post_docs[start:end]
+        pos = np.searchsorted(term_docs, candidates)
+        pos[pos == len(term_docs)] = 0
+        hit = term_docs[pos] == candidates
+        q_freq = self.post_tfs[start:end][pos[hit]]
+        contribution = np.zeros(len(candidates))
+        contribution[hit] = self.idf[term_id] * (
+            q_freq * (self.k1 + 1) / (q_freq + self.doc_norm[candidates[hit]])
+        )
+        return contribution
+
+    def _score_candidates(self, query_tokens: List[str], candidates: np.ndarray) -> np.ndarray:
+        """Exact BM25 scores for a sorted array of candidate documents"""
+        scores = np.zeros(len(candidates))
+        for token in query_tokens:
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                scores += self._probe(term_id, candidates)
+        return scores
+
+    @staticmethod
+    def _select_top(docs: np.ndarray, scores: np.ndarray, k: int):
+        """Partial selection of the k best (doc, score) pairs"""
+        if len(scores) > k:
+            # argpartition-style cut; keep boundary ties so the result is deterministic
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            docs, scores = docs[keep], scores[keep]
+        order = np.lexsort((docs, -scores))[:k]
+        return docs[order], scores[order]
+
+    def save(self, index_dir: str, fingerprint: str):
+        """
+        Write index to a directory
+
+        Args:
+            index_dir: Target directory (created if missing)
+            fingerprint: Corpus/tokenizer fingerprint the index was built from
+        """
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        # Invalidate any previous index before its files are replaced; files
+        # are renamed into place so readers that mapped them are unaffected
+        self.invalidate(index_dir)
+
+        for name in ARRAY_FILES:
+            save_array(path / f"{name}.npy", getattr(self, name))
+        if self.tokens is not None:
+            self.tokens.save(index_dir)
+        if self.positions is not None:
+            self.positions.save(index_dir)
+
+        terms = [None] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        with open(path / VOCAB_FILE, "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+        # Metadata is written last so a partial write is never considered valid
+        meta = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'fingerprint': fingerprint,
+            'corpus_size': self.corpus_size,
+            'vocabulary_size': len(self.vocabulary),
+            'k1': self.k1,
+            'b': self.b,
+            'epsilon': self.epsilon
+        }
+        with open(path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        logger.info(f"Saved BM25 index ({self.corpus_size} docs, "
+                    f"{len(self.vocabulary)} terms) to {index_dir}")
+
+    @staticmethod
+    def invalidate(index_dir: str):
+        """Mark any index in the directory as invalid (until the next save)"""
+        (Path(index_dir) / META_FILE).unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, index_dir: str, fingerprint: Optional[str] = None) -> Optional["BM25Index"]:
+        """
+        Load index from a directory
+
+        Args:
+            index_dir: Directory written by save()
+            fingerprint: Expected fingerprint; a mismatch marks the index stale
+
+        Returns:
+            BM25Index, or None if the index is missing, stale or incompatible
+        """
+        path = Path(index_dir)
+        meta_path = path / META_FILE
+        if not meta_path.exists():
+            return None
+
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+
+            if meta.get('format_version') != INDEX_FORMAT_VERSION:
+                logger.info("BM25 index format changed, rebuild required")
+                return None
+            if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+                logger.info("BM25 index is stale (corpus or tokenizer changed)")
+                return None
+
+            arrays = {
+                name: np.load(path / f"{name}.npy", mmap_mode="r")
+                for name in ARRAY_FILES
+            }
+            with open(path / VOCAB_FILE, encoding="utf-8") as f:
+                terms = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load BM25 index from {index_dir}: {e}")
+            return None
+
+        vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        index = cls(vocabulary, k1=meta['k1'], b=meta['b'], epsilon=meta['epsilon'],
+                    tokens=TokenArrays.load(index_dir),
+                    positions=PositionalIndex.load(index_dir, arrays['post_tfs']), **arrays)
+        logger.info(f"Loaded BM25 index ({index.corpus_size} docs) from {index_dir}")
+        return index
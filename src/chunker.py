@@ -0,0 +1,110 @@
+"""
+Split long documents into overlapping passages
+"""
+
+from typing import Dict, List, Tuple
+
+PAGE_BREAK = "\f"
+
+# Preferred cut points after page breaks, best first
+SEPARATORS = ["\n\n", "\n", " "]
+
+
+class TextChunker:
+    """
+    Passages of at most ``window`` characters, overlapping by ``overlap``
+
+    A passage ends at the last page break (form feed) in its window,
+    unless that would leave it shorter than a quarter of the window;
+    otherwise at the last blank line, line break or space in the second
+    half of the window, and only without any of these mid-word. The
+    next passage starts ``overlap`` characters earlier, at a word
+    boundary, so text at a cut is seen whole by one of the passages.
+    Passages do not overlap across a page break they were cut at.
+    """
+
+    def __init__(self, window: int = 2000, overlap: int = 200):
+        """
+        Args:
+            window: Maximum passage length in characters
+            overlap: Characters repeated from the end of the previous passage
+        """
+        if window <= 0 or not 0 <= overlap < window // 2:
+            raise ValueError(f"Need window > 0 and 0 <= overlap < window / 2, "
+                             f"got window={window}, overlap={overlap}")
+        self.window = window
+        self.overlap = overlap
+
+    def get_config(self) -> Dict:
+        """Settings that change the passages (for index fingerprints)"""
+        return {'window': self.window, 'overlap': self.overlap}
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Character spans of the passages of a text
+
+        Returns:
+            List of (start, end) offsets, in text order; no spans for
+            empty text, one span for text that fits in the window
+        """
+        spans = []
+        start = 0
+        while start < len(text):
+            limit = start + self.window
+            if limit >= len(text):
+                spans.append((start, len(text)))
+                break
+            end, page_break = self._cut(text, start, limit)
+            spans.append((start, end))
+            start = end if page_break else self._overlap_start(text, end)
+        return spans
+
+    def chunks(self, text: str) -> List[str]:
+        """Passage texts of a text"""
+        return [text[start:end] for start, end in self.spans(text)]
+
+    def _cut(self, text: str, start: int, limit: int) -> Tuple[int, bool]:
+        """End of the passage starting at start, and whether it is a page break"""
+        page = text.rfind(PAGE_BREAK, start + self.window // 4, limit)
+        if page != -1:
+            return page + 1, True
+        for separator in SEPARATORS:
+            position = text.rfind(separator, start + self.window // 2, limit)
+            if position != -1:
+                return position + len(separator), False
+        return limit, False
+
+    def _overlap_start(self, text: str, end: int) -> int:
+        """Start of the passage after one ending at end: overlap back, on a word boundary"""
+        if self.overlap == 0:
+            return end
+        space = text.find(" ", end - self.overlap, end)
+        return space + 1 if space != -1 else end
+
+
+def utf8_offsets(text: str, positions: List[int]) -> List[int]:
+    """
+    UTF-8 byte offsets of ascending character positions in a text
+
+    Encodes only the text between consecutive positions, so the cost is
+    one pass over the text however many positions there are.
+    """
+    if text.isascii():
+        return list(positions)
+    offsets = []
+    previous = 0
+    byte_offset = 0
+    for position in positions:
+        byte_offset += len(text[previous:position].encode('utf-8', errors='surrogatepass'))
+        offsets.append(byte_offset)
+        previous = position
+    return offsets
+
+
+# Usage Example
+if __name__ == "__main__":
+    chunker = TextChunker(window=60, overlap=10)
+    text = ("Flight logs list the passengers of every trip. " * 3
+            + "\fPage two starts here. " + "More text follows on page two. " * 2)
+    for start, end in chunker.spans(text):
+        print(f"{start:4d}-{end:4d} {text[start:end]!r}")
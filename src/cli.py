@@ -20,20 +20,16 @@ def main():
     print("Epstein Document Collection")
     print("=" * 60)
     
-    # Load documents
-    print("\nLoading documents from data/ folder...")
+    # Load (or build) search index; documents are streamed only when building
+    print("\nLoading search index for data/ folder...")
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
+    search_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
     
-    if not documents:
+    if not search_engine.documents:
         print("Error: No documents found in data/")
         return
     
-    print(f"✓ Loaded {len(documents)} documents")
-    
-    # Build search index
-    print("\nBuilding search index...")
-    search_engine = BM25SearchEngine(documents)
+    print(f"✓ Indexed {len(search_engine.documents)} documents")
     print("✓ Index ready!")
     
     # Interactive search loop
@@ -0,0 +1,384 @@
+"""
+Dense embedding retrieval over document passages
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.atomic_io import save_array
+from src.chunker import TextChunker, utf8_offsets
+from src.sparse_search import BM25SearchEngine
+from src.vector_index import VectorIndex
+
+# Bump whenever the passage layout or the stored vectors change meaning
+DENSE_FORMAT_VERSION = 1
+
+DENSE_META_FILE = "dense_meta.json"
+PASSAGE_PTR_FILE = "passage_ptr.npy"
+PASSAGE_BYTES_FILE = "passage_bytes.npy"
+
+# Small sentence embedding model that runs well on CPU (384 dimensions)
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Passages sized to the model's input limit (256 word pieces)
+DENSE_CHUNK_CHARS = 1000
+DENSE_CHUNK_OVERLAP = 100
+
+
+class DenseSearchEngine:
+    """
+    Semantic retrieval tier over the documents of a BM25 engine
+
+    Documents are split into passages, which are embedded in batches
+    once at build time and stored in a memory-mapped VectorIndex, next
+    to each document's passage range and the passages' byte offsets.
+    Later runs, and any number of processes, map the same files instead
+    of re-encoding. A document scores as its most similar passage.
+    search() retrieves from the whole corpus (exact, or approximate with
+    an HNSW graph); rerank() scores only the passages of candidate
+    documents, e.g. BM25 results.
+    """
+
+    def __init__(self,
+                 bm25_engine: BM25SearchEngine,
+                 index_dir: str,
+                 model_name: str = DEFAULT_MODEL,
+                 encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 chunker: Optional[TextChunker] = None,
+                 dtype: str = "float16",
+                 batch_size: int = 64,
+                 rebuild: bool = False):
+        """
+        Load the dense index from index_dir, or build it if missing or stale
+
+        Args:
+            bm25_engine: Engine whose documents are embedded
+            index_dir: Directory for vectors and passage tables
+            model_name: sentence-transformers model, loaded on first use
+                        (also identifies a custom encoder in the fingerprint)
+            encoder: Optional function mapping a list of texts to an
+                     embedding matrix, used instead of the model
+            chunker: Passage splitter (default: DENSE_CHUNK_CHARS windows)
+            dtype: Vector storage, 'float16' or 'int8'
+            batch_size: Passages encoded per batch
+            rebuild: Ignore any persisted index and build from scratch
+        """
+        self.bm25_engine = bm25_engine
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self._encoder = encoder
+        self.chunker = chunker or TextChunker(DENSE_CHUNK_CHARS, DENSE_CHUNK_OVERLAP)
+        self.dtype = dtype
+        self.batch_size = batch_size
+        self._ordinals = None
+
+        self.index_version = self.compute_fingerprint()
+        if rebuild or not self._load():
+            self._build()
+
+    @property
+    def encoder(self) -> Callable[[List[str]], np.ndarray]:
+        """Embedding function, loading the model on first use"""
+        if self._encoder is None:
+            self._encoder = self._load_model(self.model_name)
+        return self._encoder
+
+    @staticmethod
+    def _load_model(model_name: str) -> Callable[[List[str]], np.ndarray]:
+        """CPU sentence-transformers encoder"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.error("sentence-transformers not installed. "
+                         "Run: pip install sentence-transformers")
+            raise
+        model = SentenceTransformer(model_name, device="cpu")
+        return lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                          normalize_embeddings=True, show_progress_bar=False)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-length float32 embeddings of texts"""
+        vectors = np.asarray(self.encoder(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Unit-length embedding of a query"""
+        return self.encode([query])[0]
+
+    def compute_fingerprint(self) -> str:
+        """Hash of the BM25 corpus version, model, chunker and storage settings"""
+        settings = {
+            'format_version': DENSE_FORMAT_VERSION,
+            'model': self.model_name,
+            'chunker': self.chunker.get_config(),
+            'dtype': self.dtype
+        }
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        digest.update(self.bm25_engine.index_version.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load(self) -> bool:
+        """Map a persisted index if it matches the current fingerprint"""
+        path = Path(self.index_dir)
+        try:
+            with open(path / DENSE_META_FILE, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get('fingerprint') != self.index_version:
+                logger.info("Dense index is stale (corpus, model or settings changed)")
+                return False
+            passage_ptr = np.load(path / PASSAGE_PTR_FILE)
+            passage_bytes = np.load(path / PASSAGE_BYTES_FILE, mmap_mode="r")
+            vectors = VectorIndex(self.index_dir)
+        except (OSError, ValueError) as e:
+            logger.info(f"No usable dense index in {self.index_dir}: {e}")
+            return False
+        self._set_passages(passage_ptr, passage_bytes)
+        self.vectors = vectors
+        logger.info(f"Loaded dense index ({len(vectors)} passages) from {self.index_dir}")
+        return True
+
+    def _set_passages(self, passage_ptr: np.ndarray, passage_bytes: np.ndarray):
+        """Passage ranges per document and the document of every passage"""
+        self.passage_ptr = passage_ptr
+        self.passage_bytes = passage_bytes
+        self.passage_docs = np.repeat(np.arange(len(passage_ptr) - 1, dtype=np.int32),
+                                      np.diff(passage_ptr))
+
+    def _build(self):
+        """Split, embed and store every document's passages"""
+        path = Path(self.index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        # Invalidate before any file is replaced; metadata is written last.
+        # Files are renamed into place, so readers that mapped them are unaffected
+        (path / DENSE_META_FILE).unlink(missing_ok=True)
+
+        num_documents = self.bm25_engine.num_documents
+        logger.info(f"Embedding passages of {num_documents} documents with {self.model_name}...")
+        writer = VectorIndex.writer(self.index_dir, self.dtype)
+        counts = []
+        byte_spans = []
+        batch = []
+        for doc_index in range(num_documents):
+            text = self.bm25_engine.get_text(doc_index)
+            spans = self.chunker.spans(text)
+            counts.append(len(spans))
+            # Passages overlap, so their starts and ends interleave
+            positions = sorted({position for span in spans for position in span})
+            offsets = dict(zip(positions, utf8_offsets(text, positions)))
+            for start, end in spans:
+                byte_spans.append((offsets[start], offsets[end]))
+                batch.append(text[start:end])
+                if len(batch) == self.batch_size:
+                    writer.add(self.encode(batch))
+                    batch = []
+        if batch:
+            writer.add(self.encode(batch))
+        self.vectors = writer.close()
+
+        passage_ptr = np.zeros(num_documents + 1, dtype=np.int64)
+        np.cumsum(counts, out=passage_ptr[1:])
+        passage_bytes = np.array(byte_spans, dtype=np.int64).reshape(-1, 2)
+        save_array(path / PASSAGE_PTR_FILE, passage_ptr)
+        save_array(path / PASSAGE_BYTES_FILE, passage_bytes)
+        self._set_passages(passage_ptr, passage_bytes)
+
+        meta = {
+            'format_version': DENSE_FORMAT_VERSION,
+            'fingerprint': self.index_version,
+            'model': self.model_name,
+            'num_documents': num_documents,
+            'num_passages': len(self.vectors)
+        }
+        with open(path / DENSE_META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        logger.info(f"Dense index built: {len(self.vectors)} passages of "
+                    f"{num_documents} documents")
+
+    def _passages_of(self, doc_indices: np.ndarray) -> np.ndarray:
+        """Passage ordinals of the given documents"""
+        starts = self.passage_ptr[doc_indices]
+        lengths = self.passage_ptr[np.asarray(doc_indices) + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + offsets
+
+    def _best_per_document(self, passages: np.ndarray, scores: np.ndarray, top_k: int):
+        """Top documents by best passage score, with that passage"""
+        docs = self.passage_docs[passages]
+        order = np.lexsort((-scores, docs))
+        sorted_docs = docs[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_docs[1:] != sorted_docs[:-1]
+        best = order[first]
+        ranked = best[np.lexsort((docs[best], -scores[best]))][:top_k]
+        return docs[ranked], scores[ranked], passages[ranked]
+
+    def rank(self,
+             query_vector: np.ndarray,
+             top_k: int,
+             allowed: Optional[np.ndarray] = None,
+             approximate: bool = False):
+        """
+        Most similar documents to a query embedding
+
+        Args:
+            query_vector: Unit-length query embedding
+            top_k: Number of documents to return
+            allowed: Optional boolean mask over document ordinals
+            approximate: Use the HNSW graph if the index has one (ignored
+                         with a filter, whose passages are scored exactly)
+
+        Returns:
+            (doc ordinals, cosine similarities, best passage ordinals)
+            arrays sorted by descending similarity
+        """
+        if approximate and allowed is None and self.vectors.hnsw is not None:
+            # Fetch passages until they cover top_k documents
+            count = top_k * 4
+            while True:
+                passages, scores = self.vectors.approximate_top_k(query_vector, count)
+                ranked = self._best_per_document(passages, scores, top_k)
+                if len(ranked[0]) >= top_k or count >= len(self.vectors):
+                    return ranked
+                count *= 4
+
+        if allowed is None:
+            passages = np.arange(len(self.vectors))
+        else:
+            passages = self._passages_of(np.flatnonzero(allowed))
+        scores = self.vectors.scores(query_vector, None if allowed is None else passages)
+        return self._best_per_document(passages, scores, top_k)
+
+    def score_documents(self, query_vector: np.ndarray, doc_indices: np.ndarray):
+        """
+        Best passage similarity of each candidate document
+
+        Returns:
+            (similarities, best passage ordinals) in the order of
+            doc_indices; -1.0 and -1 for documents without passages
+        """
+        doc_indices = np.asarray(doc_indices, dtype=np.int64)
+        passages = self._passages_of(doc_indices)
+        docs, scores, best = self._best_per_document(
+            passages, self.vectors.scores(query_vector, passages), len(doc_indices)
+        )
+        similarities = np.full(len(doc_indices), -1.0)
+        best_passages = np.full(len(doc_indices), -1, dtype=np.int64)
+        slots = {doc: slot for slot, doc in enumerate(doc_indices.tolist())}
+        for doc, score, passage in zip(docs.tolist(), scores.tolist(), best.tolist()):
+            similarities[slots[doc]] = score
+            best_passages[slots[doc]] = passage
+        return similarities, best_passages
+
+    def passage_text(self, passage: int) -> str:
+        """Text of a passage, read from the BM25 engine's documents"""
+        byte_start, byte_end = self.passage_bytes[passage]
+        return self.bm25_engine.read_span(int(self.passage_docs[passage]),
+                                          int(byte_start), int(byte_end))
+
+    def build_results(self,
+                      query: str,
+                      doc_indices: np.ndarray,
+                      scores: np.ndarray,
+                      passages: np.ndarray) -> List[Dict]:
+        """
+        Result dicts with the best passage as preview
+
+        Returns:
+            List of result dicts ('doc_id', 'filename', 'score', 'preview',
+            'highlights') in the given order
+        """
+        processor = self.bm25_engine.processor
+        query_terms = set(processor.tokenize(query))
+        results = []
+        for doc_index, score, passage in zip(doc_indices, scores, passages):
+            doc = self.bm25_engine.documents[int(doc_index)]
+            preview = ""
+            if passage >= 0:
+                preview = processor.extract_preview(" ".join(self.passage_text(passage).split()))
+            results.append({
+                'doc_id': doc['doc_id'],
+                'filename': doc['filename'],
+                'score': float(score),
+                'preview': preview,
+                'highlights': [(start, end) for token, start, end in processor.token_spans(preview)
+                               if token in query_terms]
+            })
+        return results
+
+    def search(self,
+               query: str,
+               top_k: int = 10,
+               allowed: Optional[np.ndarray] = None,
+               approximate: bool = False) -> List[Dict]:
+        """
+        Semantic search over all documents
+
+        Args:
+            query: Search query string
+            top_k: Number of results to return
+            allowed: Optional boolean mask over document ordinals
+            approximate: Use the HNSW graph when available
+
+        Returns:
+            List of result dicts sorted by cosine similarity
+        """
+        doc_indices, scores, passages = self.rank(self.encode_query(query), top_k,
+                                                  allowed, approximate)
+        results = self.build_results(query, doc_indices, scores, passages)
+        logger.info(f"Dense search found {len(results)} results for query: '{query}'")
+        return results
+
+    def rerank(self, query: str, results: List[Dict], top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Re-order candidate results (e.g. from BM25) by semantic similarity
+
+        Only the passages of the candidates are scored. Each result keeps
+        its fields; the previous score is kept as 'bm25_score' and
+        'score' becomes the similarity.
+
+        Args:
+            query: Search query string
+            results: Candidate result dicts with 'doc_id'
+            top_k: Number of results to return (default: all)
+        """
+        if self._ordinals is None:
+            self._ordinals = {}
+            for ordinal, doc in enumerate(self.bm25_engine.documents):
+                self._ordinals.setdefault(doc['doc_id'], ordinal)
+        doc_indices = np.array([self._ordinals[result['doc_id']] for result in results],
+                               dtype=np.int64)
+        similarities, _ = self.score_documents(self.encode_query(query), doc_indices)
+
+        reranked = []
+        for pos in np.argsort(-similarities, kind='stable')[:top_k]:
+            result = dict(results[pos])
+            result['bm25_score'] = result['score']
+            result['score'] = float(similarities[pos])
+            reranked.append(result)
+        return reranked
+
+
+# Usage Example
+if __name__ == "__main__":
+    from src.document_loader import DocumentLoader
+
+    bm25_engine = BM25SearchEngine.from_loader(DocumentLoader("data"),
+                                               index_dir="data/bm25_index")
+    dense_engine = DenseSearchEngine(bm25_engine, "data/dense_index")
+
+    # Independent semantic retrieval
+    for result in dense_engine.search("private island visitors", top_k=5):
+        print(f"{result['filename']} ({result['score']:.3f}): {result['preview']}")
+
+    # Semantic re-ranking of BM25 candidates
+    candidates = bm25_engine.search("island visitors", top_k=100)
+    for result in dense_engine.rerank("island visitors", candidates, top_k=5):
+        print(f"{result['filename']} ({result['score']:.3f})")
@@ -0,0 +1,133 @@
+"""
+Memory-mapped document text store for on-demand previews
+"""
+
+import mmap
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from src.atomic_io import commit_file, save_array, temp_path
+
+TEXT_FILE = "texts.bin"
+OFFSETS_FILE = "text_offsets.npy"
+CHAR_LENGTHS_FILE = "text_char_lengths.npy"
+
+# A UTF-8 character is at most 4 bytes
+MAX_UTF8_BYTES = 4
+
+
+class DocumentStoreWriter:
+    """
+    Append document texts to a store in a single streaming pass
+
+    The blob is written to a temporary file and renamed over the old one
+    on close(), so a store that is open (mapped) elsewhere stays valid.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._file = open(temp_path(self.store_dir / TEXT_FILE), "wb")
+        self._offsets = [0]
+        self._char_lengths = []
+
+    def add(self, text: str):
+        """Append one document's text; documents are numbered in call order"""
+        data = text.encode("utf-8", errors="surrogatepass")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._char_lengths.append(len(text))
+
+    def close(self) -> "DocumentStore":
+        """Finish writing and open the store for reading"""
+        self._file.close()
+        save_array(self.store_dir / OFFSETS_FILE, np.array(self._offsets, dtype=np.int64))
+        save_array(self.store_dir / CHAR_LENGTHS_FILE,
+                   np.array(self._char_lengths, dtype=np.int64))
+        commit_file(self.store_dir / TEXT_FILE)
+        logger.info(f"Wrote document store ({len(self._char_lengths)} docs, "
+                    f"{self._offsets[-1] / 1e6:.1f} MB) to {self.store_dir}")
+        return DocumentStore(str(self.store_dir))
+
+
+class DocumentStore:
+    """
+    Concatenated UTF-8 text blob plus an offset table, opened with mmap
+
+    Document ``i`` occupies bytes ``offsets[i]:offsets[i + 1]`` of the blob.
+    Only the pages actually sliced are read from disk, so previews of
+    multi-megabyte documents cost the same as previews of tiny ones.
+    """
+
+    def __init__(self, store_dir: str):
+        path = Path(store_dir)
+        self.offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        self.char_lengths = np.load(path / CHAR_LENGTHS_FILE, mmap_mode="r")
+
+        self._file = open(path / TEXT_FILE, "rb")
+        if self.offsets[-1] > 0:
+            self._mmap: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0,
+                                                       access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        else:
+            self._mmap = None
+            self._view = memoryview(b"")
+
+    @staticmethod
+    def exists(store_dir: str) -> bool:
+        """True if a complete store is present in the directory"""
+        path = Path(store_dir)
+        return all((path / name).exists()
+                   for name in (TEXT_FILE, OFFSETS_FILE, CHAR_LENGTHS_FILE))
+
+    @staticmethod
+    def writer(store_dir: str) -> DocumentStoreWriter:
+        """Start writing a new store into the directory"""
+        return DocumentStoreWriter(store_dir)
+
+    def __len__(self) -> int:
+        return len(self.char_lengths)
+
+    def get_text(self, doc_index: int) -> str:
+        """Full text of a document"""
+        start, end = int(self.offsets[doc_index]), int(self.offsets[doc_index + 1])
+        return str(self._view[start:end], "utf-8", "surrogatepass")
+
+    def read_span(self, doc_index: int, byte_start: int, byte_end: int) -> str:
+        """
+        Decode a byte range of a document
+
+        Args:
+            doc_index: Document ordinal
+            byte_start, byte_end: Offsets relative to the start of the document;
+                                  partial characters at either edge are dropped
+        """
+        base, end = int(self.offsets[doc_index]), int(self.offsets[doc_index + 1])
+        start = min(base + max(byte_start, 0), end)
+        stop = min(base + max(byte_end, 0), end)
+        return str(self._view[start:stop], "utf-8", "ignore")
+
+    def preview(self, doc_index: int, max_length: int = 200) -> str:
+        """First N characters of a document, same as TextProcessor.extract_preview"""
+        preview = self.read_span(doc_index, 0, max_length * MAX_UTF8_BYTES)[:max_length]
+        if self.char_lengths[doc_index] > max_length:
+            preview += "..."
+        return preview
+
+    def close(self):
+        """Release the memory map"""
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+# Usage Example
+if __name__ == "__main__":
+    store = DocumentStore("data/bm25_index")
+    print(f"{len(store)} documents")
+    print(store.preview(0))
+    store.close()
@@ -2,11 +2,51 @@
 Enhanced search combining BM25 keyword search with metadata filtering
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+import numpy as np
 from loguru import logger
 from src.sparse_search import BM25SearchEngine
+from src.dense_search import DenseSearchEngine
 from src.metadata_store import MetadataStore
 from src.metadata_extractor import MetadataExtractor
+from src.facet_index import FacetIndex
+from src.metadata_store import normalize_entity
+from src.query_cache import QueryCache
+from src.query_entity_matcher import QueryEntityMatcher
+from src.entity_matcher import EntityMatcher
+
+# Filters matching at most this fraction of the corpus are applied before
+# BM25 scoring rather than to its top candidates
+FILTER_FIRST_MAX_SELECTIVITY = 0.25
+
+# strict: documents must match every filter type (AND)
+# loose: documents must match any filter type (OR)
+# boost: nothing is removed; matching documents are ranked higher
+# adaptive: strict, then loose, then boost until top_k results are found
+FILTER_STRATEGIES = ('strict', 'loose', 'boost', 'adaptive')
+
+# Boost mode multiplies the BM25 score by 1 + sum(weight * fraction of the
+# filter's names the document matches)
+BOOST_WEIGHTS = {
+    'people': 0.3,
+    'locations': 0.2,
+    'organizations': 0.2,
+    'date_range': 0.2
+}
+
+# bm25: keyword ranking only
+# hybrid: BM25 and dense rankings, computed concurrently and fused
+SEARCH_MODES = ('bm25', 'hybrid')
+
+# rrf: sum of 1 / (RRF_K + rank) over the rankings a document is in
+# linear: weighted sum of min-max normalized scores (0 where absent)
+FUSION_METHODS = ('rrf', 'linear')
+RRF_K = 60
+
+# Documents taken from each ranking before fusion
+HYBRID_CANDIDATES = 100
 
 
 class EnhancedSearchEngine:
@@ -14,21 +54,116 @@ class EnhancedSearchEngine:
     Two-tier search combining BM25 + metadata filtering
     Tier 1: BM25 keyword search (fast, broad)
     Tier 2: Metadata filtering (precise, entity-based)
+    With a dense engine, Tier 1 can also fuse BM25 with semantic retrieval
     """
     
     def __init__(self, 
                  bm25_engine: BM25SearchEngine,
-                 metadata_store: MetadataStore):
+                 metadata_store: MetadataStore,
+                 use_facet_index: bool = True,
+                 cache_size: int = 256,
+                 cache_ttl: Optional[float] = 600.0,
+                 dense_engine: Optional[DenseSearchEngine] = None):
         """
         Initialize enhanced search engine
         
         Args:
             bm25_engine: BM25 search engine instance
             metadata_store: Metadata store instance
+            use_facet_index: Load entity postings into memory so filters
+                             are applied to the BM25 scores directly
+                             instead of querying SQLite per search
+            cache_size: Maximum number of cached result lists (0 disables
+                        the cache)
+            cache_ttl: Seconds a cached result stays valid (None = until
+                       evicted or an index changes)
+            dense_engine: Optional dense engine over the same documents,
+                          enabling mode='hybrid' searches
         """
         self.bm25_engine = bm25_engine
         self.metadata_store = metadata_store
-        self.metadata_extractor = MetadataExtractor()
+        self.dense_engine = dense_engine
+        # Runs the query encoding and the dense stage beside the BM25 stage
+        self._executor = (ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-search")
+                          if dense_engine is not None else None)
+        self._metadata_extractor = None
+        self._query_matcher = None
+        self._entity_matcher = None
+        self.facet_index = None
+        self.last_plan: Dict = {}
+        self._ordinals = None
+        self.cache = QueryCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self._metadata_version = metadata_store.data_version()
+        if use_facet_index:
+            self.refresh_facets()
+    
+    @property
+    def metadata_extractor(self) -> MetadataExtractor:
+        """spaCy extractor, loaded on first use (fallback for auto filters)"""
+        if self._metadata_extractor is None:
+            self._metadata_extractor = MetadataExtractor()
+        return self._metadata_extractor
+    
+    @property
+    def query_matcher(self) -> QueryEntityMatcher:
+        """Gazetteer of known entities, rebuilt after the metadata changed"""
+        if self._query_matcher is None:
+            self._query_matcher = QueryEntityMatcher.from_store(self.metadata_store)
+        return self._query_matcher
+    
+    @property
+    def entity_matcher(self) -> EntityMatcher:
+        """Partial/fuzzy entity lookup index, rebuilt after the metadata changed"""
+        if self._entity_matcher is None:
+            self._entity_matcher = EntityMatcher.from_store(self.metadata_store)
+        return self._entity_matcher
+    
+    def refresh_facets(self):
+        """Reload the in-memory facet index (after the metadata changed)"""
+        doc_ids = [doc['doc_id'] for doc in self.bm25_engine.documents]
+        self.facet_index = FacetIndex.from_store(self.metadata_store, doc_ids)
+        self._metadata_version = self.metadata_store.data_version()
+    
+    def _check_metadata_version(self):
+        """Reload facets and drop cached results if the metadata changed"""
+        version = self.metadata_store.data_version()
+        if version == self._metadata_version:
+            return
+        logger.info("Metadata changed, refreshing facets and clearing the query cache")
+        self._query_matcher = None
+        self._entity_matcher = None
+        if self.cache is not None:
+            self.cache.clear()
+        if self.facet_index is not None:
+            self.refresh_facets()
+        self._metadata_version = version
+    
+    def _cache_key(self, kind: str, query_key: tuple, filters: Dict, *options) -> tuple:
+        """Cache key covering the query, filters, options and index versions"""
+        filter_key = tuple(
+            (name, tuple(value) if name == 'date_range'
+             else tuple(sorted({normalize_entity(item) for item in value})))
+            for name, value in sorted(filters.items()) if value
+        )
+        dense_version = self.dense_engine.index_version if self.dense_engine is not None else None
+        return (kind, query_key, filter_key, options,
+                self.bm25_engine.index_version, dense_version, self._metadata_version)
+    
+    def close(self):
+        """Stop the hybrid search worker threads (the stores stay open)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def __enter__(self) -> "EnhancedSearchEngine":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def cache_stats(self) -> Dict:
+        """Query cache hit/miss statistics (empty if the cache is disabled)"""
+        return self.cache.stats() if self.cache is not None else {}
         
     def search(self,
                query: str,
@@ -37,10 +172,24 @@ class EnhancedSearchEngine:
                filter_locations: Optional[List[str]] = None,
                filter_organizations: Optional[List[str]] = None,
                filter_date_range: Optional[tuple] = None,
-               bm25_candidates: int = 500) -> List[Dict]:
+               bm25_candidates: int = 500,
+               entity_match: str = "exact",
+               filter_strategy: str = "strict",
+               mode: str = "bm25",
+               fusion: str = "rrf",
+               dense_weight: float = 0.5,
+               hybrid_candidates: int = HYBRID_CANDIDATES) -> List[Dict]:
         """
         Search with two-tier retrieval
         
+        A planner uses the number of documents passing the filters
+        (counted on the facet index, or estimated by MetadataStore) to
+        pick the order of the tiers: selective filters are evaluated
+        first and BM25 scores only the documents that pass; broad filters
+        are applied to the top BM25 candidates, falling back to
+        filter-first if too few of them survive. The chosen plan is
+        recorded in last_plan.
+        
         Args:
             query: Search query string
             top_k: Number of final results to return
@@ -48,76 +197,482 @@ class EnhancedSearchEngine:
             filter_locations: Optional list of locations to filter by
             filter_organizations: Optional list of organizations to filter by
             filter_date_range: Optional (start_date, end_date) tuple
-            bm25_candidates: Number of candidates from BM25 (default 100)
+            bm25_candidates: Number of BM25 candidates to post-filter when
+                             the filters are broad
+            entity_match: How filter names match entities: 'exact',
+                          'partial' ("Maxwell" matches "Ghislaine Maxwell")
+                          or 'fuzzy' (partial, tolerating typos)
+            filter_strategy: 'strict' (all filter types must match),
+                             'loose' (any filter type), 'boost' (rerank
+                             the BM25 candidates by metadata matches
+                             instead of removing any) or 'adaptive'
+                             (the first of these giving top_k results)
+            mode: 'bm25', or 'hybrid' to fuse BM25 with the dense engine's
+                  semantic ranking (see _hybrid_search)
+            fusion: Hybrid fusion, 'rrf' (reciprocal rank fusion) or
+                    'linear' (blend of min-max normalized scores)
+            dense_weight: Weight of the dense scores in linear fusion (the
+                          BM25 scores get 1 - dense_weight)
+            hybrid_candidates: Documents taken from each ranking before
+                               hybrid fusion
             
         Returns:
             List of documents sorted by relevance
         """
         
+        if filter_strategy not in FILTER_STRATEGIES:
+            raise ValueError(f"filter_strategy must be one of {FILTER_STRATEGIES}, "
+                             f"got {filter_strategy!r}")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}, got {mode!r}")
+        if mode == 'hybrid':
+            if self.dense_engine is None:
+                raise ValueError("mode='hybrid' needs an EnhancedSearchEngine with a dense_engine")
+            if self._executor is None:
+                raise ValueError("mode='hybrid' is unavailable after close()")
+            if fusion not in FUSION_METHODS:
+                raise ValueError(f"fusion must be one of {FUSION_METHODS}, got {fusion!r}")
+            if not 0.0 <= dense_weight <= 1.0:
+                raise ValueError(f"dense_weight must be between 0 and 1, got {dense_weight}")
+        filters = {
+            'people': filter_people,
+            'locations': filter_locations,
+            'organizations': filter_organizations,
+            'date_range': filter_date_range
+        }
+        
+        # Results depend on the query only through its tokens and phrases
+        self._check_metadata_version()
+        if entity_match != "exact":
+            filters = self.entity_matcher.expand_filters(filters, entity_match)
+            logger.info(f"Expanded entity filters ({entity_match}): {filters}")
+        tokens, phrases = self.bm25_engine.parse_query(query)
+        query_key = (tuple(tokens), tuple(tuple(phrase) for phrase in phrases))
+        options = (top_k, bm25_candidates, filter_strategy)
+        if mode == 'hybrid':
+            # The embedding depends on the query text, not just its tokens
+            query_key += (" ".join(query.split()),)
+            options += (mode, fusion, dense_weight, hybrid_candidates)
+        key = self._cache_key('search', query_key, filters, *options)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Query cache hit for '{query}'")
+                self.last_plan = {'strategy': 'cached'}
+                return cached
+        
+        if mode == 'hybrid':
+            results = self._hybrid_search(query, top_k, filters, filter_strategy,
+                                          fusion, dense_weight, hybrid_candidates)
+        else:
+            results = self._search(query, top_k, filters, bm25_candidates, filter_strategy)
+        if self.cache is not None:
+            self.cache.put(key, results)
+        return results
+    
+    def _search(self,
+                query: str,
+                top_k: int,
+                filters: Dict,
+                bm25_candidates: int,
+                filter_strategy: str = "strict") -> List[Dict]:
+        """Uncached two-tier search"""
+        if not any(filters.values()):
+            logger.info("No metadata filters applied")
+            self.last_plan = {'strategy': 'unfiltered'}
+            results = self.bm25_engine.search(query, top_k=top_k)
+            logger.info(f"Returning {len(results)} final results")
+            return results
+        
+        if filter_strategy == 'boost':
+            return self._boost_search(query, top_k, filters, bm25_candidates)
+        if filter_strategy == 'adaptive':
+            for combine in ("and", "or"):
+                results = self._filtered_search(query, top_k, filters, bm25_candidates, combine)
+                if len(results) >= top_k:
+                    self.last_plan['adaptive'] = True
+                    return results
+                logger.info(f"Adaptive: {combine.upper()} filtering gave {len(results)} results")
+            results = self._boost_search(query, top_k, filters, bm25_candidates)
+            self.last_plan['adaptive'] = True
+            return results
+        
+        combine = "and" if filter_strategy == 'strict' else "or"
+        return self._filtered_search(query, top_k, filters, bm25_candidates, combine)
+    
+    def _filtered_search(self,
+                         query: str,
+                         top_k: int,
+                         filters: Dict,
+                         bm25_candidates: int,
+                         combine: str) -> List[Dict]:
+        """Search restricted to documents passing the filters"""
+        # Plan: filter first when few documents can pass the filters. The
+        # facet index counts them exactly (and the mask serves either plan);
+        # without it SQL gives an upper bound from the entity counts
+        allowed = None
+        if self.facet_index is not None:
+            allowed = self.facet_index.mask(combine=combine, **filters)
+            estimate = int(allowed.sum())
+        else:
+            estimate = self.metadata_store.estimate_filter_cardinality(combine=combine, **filters)
+        strategy = self._choose_strategy(estimate, top_k, bm25_candidates)
+        self.last_plan = {'strategy': strategy, 'estimated_docs': estimate, 'fallback': False,
+                          'filter_strategy': 'strict' if combine == "and" else 'loose'}
+        logger.info(f"Filters match at most {estimate} docs, using {strategy}")
+        
+        if strategy == 'post_filter':
+            results = self._post_filter_search(query, top_k, bm25_candidates, filters, combine,
+                                               allowed)
+            if results is not None:
+                logger.info(f"Returning {len(results)} final results")
+                return results
+            # Too few candidates survived; the filtered ranking needs a full pass
+            logger.info("Post-filtering returned too few results, falling back to filter-first")
+            self.last_plan['fallback'] = True
+        
+        # Score BM25 only over the documents that pass the filters
+        if allowed is None:
+            allowed = self._allowed_mask(filters, combine)
+        logger.info(f"Filters allow {int(allowed.sum())} docs")
+        results = self.bm25_engine.search(query, top_k=top_k, allowed=allowed)
+        logger.info(f"Returning {len(results)} final results")
+        return results
+    
+    def _choose_strategy(self, estimate: int, top_k: int, bm25_candidates: int) -> str:
+        """
+        Pick 'filter_first' or 'post_filter' from the filter cardinality estimate
+        
+        Post-filtering ranks bm25_candidates documents and keeps those that
+        pass; it is only worthwhile when the filters are broad enough for
+        about twice top_k of them to survive.
+        """
+        corpus_size = max(len(self.bm25_engine.documents), 1)
+        selectivity = estimate / corpus_size
+        expected_survivors = bm25_candidates * selectivity
+        if selectivity <= FILTER_FIRST_MAX_SELECTIVITY or expected_survivors < 2 * top_k:
+            return 'filter_first'
+        return 'post_filter'
+    
+    def _post_filter_search(self,
+                            query: str,
+                            top_k: int,
+                            bm25_candidates: int,
+                            filters: Dict,
+                            combine: str = "and",
+                            allowed: Optional[np.ndarray] = None) -> Optional[List[Dict]]:
+        """
+        Rank BM25 candidates, then filter them
+        
+        Args:
+            allowed: Facet mask of the filters, if already computed
+            
+        Returns:
+            Filtered results, or None when fewer than top_k survived out of
+            a full candidate list (better matches may lie beyond it)
+        """
         # TIER 1: BM25 Keyword Search
         logger.info(f"Tier 1: Running BM25 search for '{query}'")
         bm25_results = self.bm25_engine.search(query, top_k=bm25_candidates)
+        logger.info(f"BM25 found {len(bm25_results)} candidates")
+        
+        # TIER 2: Metadata Filtering
+        logger.info("Tier 2: Applying metadata filters")
+        doc_ids = [doc['doc_id'] for doc in bm25_results]
+        if self.facet_index is not None:
+            if allowed is None:
+                allowed = self.facet_index.mask(combine=combine, **filters)
+            ordinals = self._doc_ordinals()
+            filtered_doc_ids = {doc_id for doc_id in doc_ids if allowed[ordinals[doc_id][0]]}
+        else:
+            filtered_doc_ids = set(self.metadata_store.filter_documents(
+                doc_ids=doc_ids, combine=combine, **filters))
+        logger.info(f"Metadata filtering: {len(doc_ids)} → {len(filtered_doc_ids)} docs")
+        
+        # Keep only filtered documents, preserve BM25 ranking
+        filtered_results = [doc for doc in bm25_results if doc['doc_id'] in filtered_doc_ids]
+        if len(filtered_results) < top_k and len(bm25_results) == bm25_candidates:
+            return None
+        return filtered_results[:top_k]
+    
+    def _allowed_mask(self, filters: Dict, combine: str = "and") -> np.ndarray:
+        """Boolean mask over BM25 document ordinals of documents passing the filters"""
+        if self.facet_index is not None:
+            return self.facet_index.mask(combine=combine, **filters)
         
-        if not bm25_results:
-            logger.info("No BM25 results found")
+        allowed = np.zeros(len(self.bm25_engine.documents), dtype=bool)
+        ordinals = self._doc_ordinals()
+        for doc_id in self.metadata_store.filter_documents(None, combine=combine, **filters):
+            allowed[ordinals.get(doc_id, [])] = True
+        return allowed
+    
+    def _boost_search(self,
+                      query: str,
+                      top_k: int,
+                      filters: Dict,
+                      bm25_candidates: int) -> List[Dict]:
+        """
+        Rerank the BM25 candidates by how well they match the filters
+        
+        No candidate is removed. The boost of all candidates is computed
+        in one vectorized pass over their ordinals, from the facet index
+        (or one SQL read per filter type without it).
+        """
+        self.last_plan = {'strategy': 'boost', 'filter_strategy': 'boost'}
+        query_tokens, phrases = self.bm25_engine.parse_query(query)
+        if not query_tokens:
             return []
+        doc_indices, scores = self.bm25_engine.rank(query_tokens, phrases, bm25_candidates)
+        positive = scores > 0
+        doc_indices, scores = doc_indices[positive], scores[positive]
+        logger.info(f"Boosting {len(doc_indices)} BM25 candidates by metadata matches")
         
-        logger.info(f"BM25 found {len(bm25_results)} candidates")
+        boost = self._metadata_boost(doc_indices, filters)
+        boosted = scores * (1.0 + boost)
+        order = np.argsort(-boosted, kind='stable')[:top_k]
         
-        # TIER 2: Metadata Filtering (if any filters provided)
-        has_filters = any([
-            filter_people,
-            filter_locations,
-            filter_organizations,
-            filter_date_range
-        ])
-        
-        if has_filters:
-            logger.info("Tier 2: Applying metadata filters")
-            doc_ids = [doc['doc_id'] for doc in bm25_results]
+        results = self.bm25_engine.build_results(doc_indices[order], boosted[order], query_tokens)
+        for result, pos in zip(results, order):
+            result['bm25_score'] = float(scores[pos])
+            result['metadata_boost'] = float(boost[pos])
+        logger.info(f"Returning {len(results)} final results")
+        return results
+    
+    def _metadata_boost(self, doc_indices: np.ndarray, filters: Dict) -> np.ndarray:
+        """Boost of each document ordinal (see BOOST_WEIGHTS)"""
+        boost = np.zeros(len(doc_indices))
+        for key, entity_type in [('people', 'person'),
+                                 ('locations', 'location'),
+                                 ('organizations', 'organization')]:
+            names = filters.get(key)
+            if not names:
+                continue
+            if self.facet_index is not None:
+                counts = self.facet_index.match_counts(entity_type, names)[doc_indices]
+            else:
+                doc_ids = [self.bm25_engine.documents[i]['doc_id'] for i in doc_indices]
+                counts = np.array(self.metadata_store.count_entity_matches(
+                    doc_ids, entity_type, names), dtype=np.float64)
+            boost += BOOST_WEIGHTS[key] * counts / len(names)
+        
+        if filters.get('date_range'):
+            in_range = self._allowed_mask({'date_range': filters['date_range']})
+            boost += BOOST_WEIGHTS['date_range'] * in_range[doc_indices]
+        return boost
+    
+    def _hybrid_search(self,
+                       query: str,
+                       top_k: int,
+                       filters: Dict,
+                       filter_strategy: str,
+                       fusion: str,
+                       dense_weight: float,
+                       candidates: int) -> List[Dict]:
+        """
+        Fuse the BM25 and dense rankings of a query
+        
+        The query is encoded and ranked by the dense engine on worker
+        threads while BM25 ranks on this one, so the slower stage sets
+        the latency rather than their sum. Filters become one allowed
+        mask that both stages rank within; 'adaptive' relaxes it (strict,
+        loose, then boost) until top_k results are found, and 'boost'
+        multiplies the fused scores instead (see BOOST_WEIGHTS). Quoted
+        phrases restrict the BM25 ranking only. Stage timings in
+        milliseconds are recorded in last_plan['latency_ms'].
+        """
+        start = time.perf_counter()
+        latency = {'filter': 0.0, 'encode': 0.0, 'bm25': 0.0, 'dense': 0.0, 'fusion': 0.0}
+        query_tokens, phrases = self.bm25_engine.parse_query(query)
+        query_vector = self._executor.submit(self._timed, latency, 'encode',
+                                             self.dense_engine.encode_query, query)
+        
+        if not any(filters.values()):
+            plans = [('unfiltered', None)]
+        elif filter_strategy == 'adaptive':
+            plans = [('strict', "and"), ('loose', "or"), ('boost', None)]
+        else:
+            plans = [(filter_strategy, {'strict': "and", 'loose': "or"}.get(filter_strategy))]
+        
+        for plan, combine in plans:
+            allowed = None
+            if combine is not None:
+                allowed = self._timed(latency, 'filter', self._allowed_mask, filters, combine)
+                logger.info(f"Filters allow {int(allowed.sum())} docs")
             
-            filtered_doc_ids = self.metadata_store.filter_documents(
-                doc_ids=doc_ids,
-                people=filter_people,
-                locations=filter_locations,
-                organizations=filter_organizations,
-                date_range=filter_date_range
+            # TIER 1: BM25 and dense rankings, concurrently
+            dense = self._executor.submit(
+                lambda allowed=allowed: self._timed(latency, 'dense', self.dense_engine.rank,
+                                                    query_vector.result(), candidates, allowed)
             )
+            if query_tokens:
+                bm25_docs, bm25_scores = self._timed(latency, 'bm25', self.bm25_engine.rank,
+                                                     query_tokens, phrases, candidates, allowed)
+                positive = bm25_scores > 0
+                bm25_docs, bm25_scores = bm25_docs[positive], bm25_scores[positive]
+            else:
+                bm25_docs, bm25_scores = np.zeros(0, dtype=np.int64), np.zeros(0)
+            dense_docs, dense_scores, dense_passages = dense.result()
             
-            logger.info(f"Metadata filtering: {len(doc_ids)} → {len(filtered_doc_ids)} docs")
+            fusion_start = time.perf_counter()
+            doc_indices, fused = self._fuse([(bm25_docs, bm25_scores), (dense_docs, dense_scores)],
+                                            fusion, [1.0 - dense_weight, dense_weight])
+            boost = None
+            if plan == 'boost':
+                # TIER 2: Rerank the fused candidates by metadata matches
+                boost = self._metadata_boost(doc_indices, filters)
+                fused = fused * (1.0 + boost)
+                order = np.argsort(-fused, kind='stable')
+                doc_indices, fused, boost = doc_indices[order], fused[order], boost[order]
+            latency['fusion'] += (time.perf_counter() - fusion_start) * 1000
+            if len(doc_indices) >= top_k or plan == plans[-1][0]:
+                break
+            logger.info(f"Adaptive: {plan} filtering gave {len(doc_indices)} results")
+        
+        results = self._hybrid_results(query, query_tokens, doc_indices[:top_k], fused[:top_k],
+                                       dict(zip(bm25_docs.tolist(), bm25_scores.tolist())),
+                                       dense_docs, dense_scores, dense_passages)
+        if boost is not None:
+            for result, value in zip(results, boost.tolist()):
+                result['metadata_boost'] = value
+        latency['total'] = (time.perf_counter() - start) * 1000
+        self.last_plan = {'strategy': 'hybrid', 'fusion': fusion, 'filter_strategy': plan,
+                          'allowed_docs': None if allowed is None else int(allowed.sum()),
+                          'bm25_candidates': len(bm25_docs), 'dense_candidates': len(dense_docs),
+                          'latency_ms': latency}
+        if filter_strategy == 'adaptive':
+            self.last_plan['adaptive'] = True
+        logger.info(f"Hybrid search: {len(bm25_docs)} BM25 + {len(dense_docs)} dense candidates "
+                    f"fused ({fusion}) into {len(results)} results in {latency['total']:.1f}ms")
+        return results
+    
+    @staticmethod
+    def _timed(latency: Dict, stage: str, function, *args):
+        """Call function, adding its wall time in milliseconds to latency[stage]"""
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            latency[stage] += (time.perf_counter() - start) * 1000
+    
+    @staticmethod
+    def _fuse(rankings: List[tuple], fusion: str, weights: List[float]):
+        """
+        Fuse rankings of document ordinals (see FUSION_METHODS)
+        
+        Args:
+            rankings: (doc ordinals, scores) pairs, each best first
+            fusion: 'rrf' or 'linear'
+            weights: Weight of each ranking in linear fusion
             
-            # Keep only filtered documents, preserve BM25 ranking
-            filtered_results = [
-                doc for doc in bm25_results 
-                if doc['doc_id'] in filtered_doc_ids
-            ]
-        else:
-            logger.info("No metadata filters applied")
-            filtered_results = bm25_results
+        Returns:
+            (doc ordinals, fused scores) sorted by descending fused score,
+            ties broken by ordinal
+        """
+        all_docs = np.concatenate([np.asarray(docs, dtype=np.int64) for docs, _ in rankings])
+        doc_indices, slots = np.unique(all_docs, return_inverse=True)
+        fused = np.zeros(len(doc_indices))
+        offset = 0
+        for (docs, scores), weight in zip(rankings, weights):
+            ranking_slots = slots[offset:offset + len(docs)]
+            offset += len(docs)
+            if not len(docs):
+                continue
+            if fusion == 'rrf':
+                fused[ranking_slots] += 1.0 / (RRF_K + np.arange(1, len(docs) + 1))
+            else:
+                scores = np.asarray(scores, dtype=np.float64)
+                low, span = scores.min(), scores.max() - scores.min()
+                normalized = (scores - low) / span if span > 0 else np.ones(len(scores))
+                fused[ranking_slots] += weight * normalized
+        order = np.lexsort((doc_indices, -fused))
+        return doc_indices[order], fused[order]
+    
+    def _hybrid_results(self,
+                        query: str,
+                        query_tokens: List[str],
+                        doc_indices: np.ndarray,
+                        fused: np.ndarray,
+                        bm25_scores: Dict[int, float],
+                        dense_docs: np.ndarray,
+                        dense_scores: np.ndarray,
+                        dense_passages: np.ndarray) -> List[Dict]:
+        """
+        Result dicts for fused document ordinals
         
-        # Return top K results
-        final_results = filtered_results[:top_k]
-        logger.info(f"Returning {len(final_results)} final results")
+        The preview is the BM25 snippet of documents with a keyword match
+        and the best dense passage of the others. 'bm25_score' and
+        'dense_score' are None for documents missing from that ranking.
+        """
+        dense = {doc: (score, passage) for doc, score, passage
+                 in zip(dense_docs.tolist(), dense_scores.tolist(), dense_passages.tolist())}
+        semantic_only = [doc for doc in doc_indices.tolist() if doc not in bm25_scores]
+        semantic_results = dict(zip(semantic_only, self.dense_engine.build_results(
+            query, semantic_only, [dense[doc][0] for doc in semantic_only],
+            [dense[doc][1] for doc in semantic_only]
+        )))
         
-        return final_results
+        results = []
+        for doc_index, score in zip(doc_indices.tolist(), fused.tolist()):
+            if doc_index in semantic_results:
+                result = semantic_results[doc_index]
+            else:
+                doc = self.bm25_engine.documents[doc_index]
+                snippet = self.bm25_engine.get_snippet(doc_index, query_tokens)
+                result = {'doc_id': doc['doc_id'], 'filename': doc['filename'],
+                          'preview': snippet['text'], 'highlights': snippet['highlights']}
+            result['score'] = score
+            result['bm25_score'] = bm25_scores.get(doc_index)
+            result['dense_score'] = dense[doc_index][0] if doc_index in dense else None
+            results.append(result)
+        return results
+    
+    def _doc_ordinals(self) -> Dict[str, List[int]]:
+        """Doc id -> BM25 document ordinals (byte-identical files share an id)"""
+        if self._ordinals is None:
+            self._ordinals = {}
+            for ordinal, doc in enumerate(self.bm25_engine.documents):
+                self._ordinals.setdefault(doc['doc_id'], []).append(ordinal)
+        return self._ordinals
     
-    def search_with_auto_filters(self, query: str, top_k: int = 10) -> List[Dict]:
+    def search_with_auto_filters(self,
+                                 query: str,
+                                 top_k: int = 10,
+                                 filter_strategy: str = "strict",
+                                 mode: str = "bm25",
+                                 fusion: str = "rrf") -> List[Dict]:
         """
         Search with automatic entity extraction from query
         
         Args:
             query: Search query string
             top_k: Number of results to return
+            filter_strategy: See search()
+            mode: See search()
+            fusion: See search()
             
         Returns:
             List of documents sorted by relevance
         """
         
+        # Entity recognition is case-sensitive, so only whitespace is normalized
+        self._check_metadata_version()
+        key = self._cache_key('auto', (" ".join(query.split()),), {}, top_k, filter_strategy,
+                              mode, fusion)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Query cache hit for '{query}'")
+                self.last_plan = {'strategy': 'cached'}
+                return cached
+        
         # Extract entities from query
         logger.info(f"Auto-extracting entities from query: '{query}'")
         
-        # Use metadata extractor to find entities in query
-        query_metadata = self.metadata_extractor.extract_metadata(query, "query")
+        # Tag known entity names; spaCy is only needed when there are none yet
+        if self.query_matcher.size:
+            query_metadata = self.query_matcher.match(query)
+        else:
+            query_metadata = self.metadata_extractor.extract_metadata(query, "query")
         
         # Use extracted entities as filters
         people = query_metadata['people'] if query_metadata['people'] else None
@@ -128,25 +683,28 @@ class EnhancedSearchEngine:
             logger.info(f"Auto-detected filters - People: {people}, "
                        f"Locations: {locations}, Orgs: {organizations}")
         
-        return self.search(
+        results = self.search(
             query=query,
             top_k=top_k,
             filter_people=people,
             filter_locations=locations,
-            filter_organizations=organizations
+            filter_organizations=organizations,
+            filter_strategy=filter_strategy,
+            mode=mode,
+            fusion=fusion
         )
+        if self.cache is not None:
+            self.cache.put(key, results)
+        return results
 
 
 # Usage Example
 if __name__ == "__main__":
     from src.document_loader import DocumentLoader
     
-    # Load documents
-    loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    
     # Create BM25 engine
-    bm25_engine = BM25SearchEngine(documents)
+    loader = DocumentLoader("data")
+    bm25_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
     
     # Create metadata store
     metadata_store = MetadataStore()
@@ -164,4 +722,13 @@ if __name__ == "__main__":
     print(f"\nFound {len(results)} results:")
     for i, result in enumerate(results, 1):
         print(f"{i}. {result['filename']} (score: {result['score']:.2f})")
+    
+    # Hybrid BM25 + semantic search, fused with reciprocal rank fusion
+    dense_engine = DenseSearchEngine(bm25_engine, "data/dense_index")
+    with EnhancedSearchEngine(bm25_engine, metadata_store,
+                              dense_engine=dense_engine) as hybrid_search:
+        results = hybrid_search.search("private island visitors", top_k=5,
+                                       filter_people=["Maxwell"], mode="hybrid", fusion="rrf")
+        latency = hybrid_search.last_plan['latency_ms']
+        print(f"\nHybrid: {len(results)} results, latency {latency}")
 
@@ -0,0 +1,198 @@
+"""
+Fuzzy and partial entity name lookup for metadata filters
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set
+
+from loguru import logger
+
+from src.metadata_store import MetadataStore, normalize_entity
+
+# Filter keys of get_all_entities() that name entities
+ENTITY_KEYS = ['people', 'locations', 'organizations']
+
+MATCH_MODES = ('exact', 'partial', 'fuzzy')
+
+# Leading words that do not identify an entity
+PREFIXES = {'the', 'mr', 'ms', 'mrs', 'dr'}
+
+# Tokens shorter than this are not corrected for typos
+MIN_FUZZY_TOKEN_LENGTH = 4
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def name_tokens(name: str) -> List[str]:
+    """
+    Identifying tokens of an entity name
+
+    Case, punctuation, initials and a leading title or article are
+    dropped, so "G. Maxwell" and "Mr. Maxwell" both give ["maxwell"].
+    """
+    tokens = WORD_PATTERN.findall(normalize_entity(name))
+    if tokens and tokens[0] in PREFIXES:
+        tokens = tokens[1:]
+    return [token for token in tokens if len(token) > 1]
+
+
+def deletions(token: str) -> Set[str]:
+    """The token and every string obtained by deleting one character"""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class EntityMatcher:
+    """
+    Expand filter names to the canonical entities they refer to
+
+    Entity names are indexed per filter key in a token inverted index
+    (name token -> entities). A filter name matches an entity when one
+    token set contains the other, so "Maxwell" matches "Ghislaine
+    Maxwell" and "G. Maxwell". In fuzzy mode each filter token is also
+    replaced by the indexed tokens within the similarity threshold.
+    Candidates come from a symmetric deletion index over the token
+    vocabulary (two tokens within one edit, transpositions included,
+    share a single-character deletion), so "Maxwel" and "Epstien"
+    match as well. Only the postings of the filter's tokens
+    are touched, so an expansion takes well under a millisecond.
+    """
+
+    def __init__(self,
+                 entities: Dict[str, List[str]],
+                 similarity_threshold: float = 0.85):
+        """
+        Args:
+            entities: Filter key ('people', ...) -> canonical entity names,
+                      as returned by MetadataStore.get_all_entities()
+            similarity_threshold: Minimum token similarity (0-1) for a
+                                  fuzzy match
+        """
+        self.similarity_threshold = similarity_threshold
+        self.names: Dict[str, List[str]] = {}
+        self.tokens: Dict[str, List[frozenset]] = {}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.deletion_postings: Dict[str, Dict[str, List[str]]] = {}
+
+        for key in ENTITY_KEYS:
+            names = []
+            token_sets = []
+            postings: Dict[str, List[int]] = {}
+            for name in entities.get(key, []):
+                tokens = frozenset(name_tokens(name))
+                if not tokens:
+                    continue
+                for token in tokens:
+                    postings.setdefault(token, []).append(len(names))
+                names.append(name)
+                token_sets.append(tokens)
+
+            deletion_postings: Dict[str, List[str]] = {}
+            for token in postings:
+                if len(token) >= MIN_FUZZY_TOKEN_LENGTH:
+                    for deletion in deletions(token):
+                        deletion_postings.setdefault(deletion, []).append(token)
+
+            self.names[key] = names
+            self.tokens[key] = token_sets
+            self.postings[key] = postings
+            self.deletion_postings[key] = deletion_postings
+
+    @classmethod
+    def from_store(cls, store: MetadataStore,
+                   similarity_threshold: float = 0.85) -> "EntityMatcher":
+        """Build the lookup index from the entities in a metadata store"""
+        matcher = cls(store.get_all_entities(), similarity_threshold)
+        logger.info("Built entity lookup index (" + ", ".join(
+            f"{len(matcher.names[key])} {key}" for key in ENTITY_KEYS) + ")")
+        return matcher
+
+    def _similar_tokens(self, key: str, token: str) -> Set[str]:
+        """Indexed tokens within the similarity threshold of a token"""
+        variants = {token} if token in self.postings[key] else set()
+        if len(token) < MIN_FUZZY_TOKEN_LENGTH:
+            return variants
+
+        candidates = set()
+        for deletion in deletions(token):
+            candidates.update(self.deletion_postings[key].get(deletion, ()))
+        for candidate in candidates - variants:
+            if SequenceMatcher(None, token, candidate).ratio() >= self.similarity_threshold:
+                variants.add(candidate)
+        return variants
+
+    def expand(self, key: str, name: str, mode: str = "partial") -> List[str]:
+        """
+        Canonical entity names a filter name refers to
+
+        Args:
+            key: Filter key ('people', 'locations' or 'organizations')
+            name: Filter name as given by the user
+            mode: 'exact' (no expansion), 'partial' (token containment)
+                  or 'fuzzy' (token containment with typo tolerance)
+
+        Returns:
+            Matching entity names, sorted; [name] when nothing matches
+            or in exact mode
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"mode must be one of {MATCH_MODES}, got {mode!r}")
+        query_tokens = name_tokens(name)
+        if mode == "exact" or not query_tokens:
+            return [name]
+
+        postings = self.postings[key]
+        if mode == "fuzzy":
+            variants = [self._similar_tokens(key, token) for token in query_tokens]
+        else:
+            variants = [{token} if token in postings else set() for token in query_tokens]
+
+        candidates = set()
+        for token_variants in variants:
+            for token in token_variants:
+                candidates.update(postings[token])
+
+        matched = []
+        for entity in candidates:
+            entity_tokens = self.tokens[key][entity]
+            # Filter name within the entity name, or the entity name within it
+            if all(token_variants & entity_tokens for token_variants in variants) or \
+                    all(any(token in token_variants for token_variants in variants)
+                        for token in entity_tokens):
+                matched.append(self.names[key][entity])
+
+        return sorted(matched) if matched else [name]
+
+    def expand_filters(self,
+                       filters: Dict[str, Optional[List[str]]],
+                       mode: str = "partial") -> Dict[str, Optional[List[str]]]:
+        """
+        Expand the entity lists of a filter dict (other entries are kept)
+
+        Args:
+            filters: Dict with optional 'people', 'locations' and
+                     'organizations' name lists
+            mode: See expand()
+
+        Returns:
+            New filter dict with each name list replaced by its matches
+        """
+        expanded = dict(filters)
+        for key in ENTITY_KEYS:
+            if filters.get(key):
+                names = []
+                for name in filters[key]:
+                    for match in self.expand(key, name, mode):
+                        if match not in names:
+                            names.append(match)
+                expanded[key] = names
+        return expanded
+
+
+# Usage Example
+if __name__ == "__main__":
+    store = MetadataStore("data/metadata.db")
+    matcher = EntityMatcher.from_store(store)
+    print(matcher.expand('people', "Maxwell"))
+    print(matcher.expand('people', "Maxwel", mode="fuzzy"))
+    store.close()
@@ -0,0 +1,201 @@
+"""
+In-memory entity facet index for metadata filtering
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.metadata_store import MetadataStore, normalize_entity, to_day
+
+
+class FacetIndex:
+    """
+    Entity -> document postings over dense document ordinals
+
+    Ordinals are positions in the BM25 engine's document list, so a
+    filter evaluates to a boolean mask that is applied directly to the
+    BM25 score vector. Postings are stored CSR-style (the documents of
+    entity ``e`` are ``entity_docs[entity_ptr[e]:entity_ptr[e + 1]]``),
+    which stays compact for rare entities; masks are materialized per
+    query, at a cost of one scatter per requested entity. Parsed dates
+    are kept as (day, ordinal) pairs sorted by day, so a date range is
+    two binary searches and one scatter.
+    """
+
+    def __init__(self,
+                 num_docs: int,
+                 keys: Dict[Tuple[str, str], int],
+                 entity_ptr: np.ndarray,
+                 entity_docs: np.ndarray,
+                 date_days: np.ndarray,
+                 date_docs: np.ndarray):
+        """
+        Args:
+            num_docs: Number of document ordinals
+            keys: (entity type, normalized name) -> entity slot
+            entity_ptr: Posting offsets, one more than the number of entities
+            entity_docs: Document ordinals of all postings, ascending per entity
+            date_days: Ordinal days of all date mentions, ascending
+            date_docs: Document ordinal of each entry in date_days
+        """
+        self.num_docs = num_docs
+        self.keys = keys
+        self.entity_ptr = entity_ptr
+        self.entity_docs = entity_docs
+        self.date_days = date_days
+        self.date_docs = date_docs
+
+    @classmethod
+    def from_store(cls, store: MetadataStore, doc_ids: List[str]) -> "FacetIndex":
+        """
+        Load the facet index from a metadata store
+
+        Args:
+            store: MetadataStore to read entity links from
+            doc_ids: Document id of each ordinal (e.g. the BM25 engine's
+                     documents); links to other documents are ignored
+
+        Returns:
+            FacetIndex instance
+        """
+        ordinals = {}
+        for ordinal, doc_id in enumerate(doc_ids):
+            # Byte-identical files share a doc id and therefore their entities
+            ordinals.setdefault(doc_id, []).append(ordinal)
+
+        keys: Dict[Tuple[str, str], int] = {}
+        entity_ptr = [0]
+        entity_docs: List[int] = []
+        current = None
+
+        for row in store.get_entity_links():
+            if row['entity_id'] != current:
+                if current is not None:
+                    entity_ptr.append(len(entity_docs))
+                current = row['entity_id']
+                slot = len(keys)
+                keys[(row['type'], row['norm_key'])] = slot
+            entity_docs.extend(ordinals.get(row['doc_id'], ()))
+        if current is not None:
+            entity_ptr.append(len(entity_docs))
+
+        # Sort each posting list (duplicate doc ids append out of order)
+        entity_ptr = np.array(entity_ptr, dtype=np.int64)
+        entity_docs = np.array(entity_docs, dtype=np.int32)
+        for slot in range(len(keys)):
+            start, end = entity_ptr[slot], entity_ptr[slot + 1]
+            entity_docs[start:end].sort()
+
+        date_days = []
+        date_docs = []
+        for row in store.get_date_postings():
+            for ordinal in ordinals.get(row['doc_id'], ()):
+                date_days.append(row['day'])
+                date_docs.append(ordinal)
+
+        logger.info(f"Loaded facet index ({len(keys)} entities, "
+                    f"{len(entity_docs)} postings, {len(doc_ids)} docs)")
+        return cls(len(doc_ids), keys, entity_ptr, entity_docs,
+                   np.array(date_days, dtype=np.int64), np.array(date_docs, dtype=np.int32))
+
+    def documents(self, entity_type: str, name: str) -> np.ndarray:
+        """Document ordinals linked to an entity (empty if unknown)"""
+        slot = self.keys.get((entity_type, normalize_entity(name)))
+        if slot is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.entity_docs[self.entity_ptr[slot]:self.entity_ptr[slot + 1]]
+
+    def match_counts(self, entity_type: str, names: List[str]) -> np.ndarray:
+        """Number of the given names linked to each document ordinal"""
+        counts = np.zeros(self.num_docs, dtype=np.int32)
+        for name in names:
+            # Ordinals are unique within a posting list
+            counts[self.documents(entity_type, name)] += 1
+        return counts
+
+    def _any_mask(self, slots) -> np.ndarray:
+        """Mask of documents linked to any of the entity slots"""
+        mask = np.zeros(self.num_docs, dtype=bool)
+        for slot in slots:
+            mask[self.entity_docs[self.entity_ptr[slot]:self.entity_ptr[slot + 1]]] = True
+        return mask
+
+    def _date_mask(self, start_date, end_date) -> np.ndarray:
+        """Mask of documents mentioning a date in the range (inclusive)"""
+        lo = np.searchsorted(self.date_days, to_day(start_date), side="left")
+        hi = np.searchsorted(self.date_days, to_day(end_date), side="right")
+        mask = np.zeros(self.num_docs, dtype=bool)
+        mask[self.date_docs[lo:hi]] = True
+        return mask
+
+    def mask(self,
+             people: Optional[List[str]] = None,
+             locations: Optional[List[str]] = None,
+             organizations: Optional[List[str]] = None,
+             date_range: Optional[tuple] = None,
+             combine: str = "and",
+             require_all: bool = False) -> Optional[np.ndarray]:
+        """
+        Evaluate metadata filters as a boolean mask over document ordinals
+
+        Same semantics as MetadataStore.filter_documents.
+
+        Args:
+            people: List of person names to match (OR logic)
+            locations: List of locations to match (OR logic)
+            organizations: List of organizations to match (OR logic)
+            date_range: Tuple of (start_date, end_date), inclusive
+            combine: "and" (default) or "or" across filter types
+            require_all: Require all names of a list instead of any
+
+        Returns:
+            Boolean mask, or None when no filter is given
+        """
+        if combine not in ("and", "or"):
+            raise ValueError(f"combine must be 'and' or 'or', got {combine!r}")
+
+        masks = []
+        for entity_type, names in [('person', people),
+                                   ('location', locations),
+                                   ('organization', organizations)]:
+            if not names:
+                continue
+            slots = [self.keys.get((entity_type, normalize_entity(name))) for name in names]
+            if require_all:
+                matched = np.ones(self.num_docs, dtype=bool)
+                for slot in slots:
+                    matched &= self._any_mask([] if slot is None else [slot])
+            else:
+                matched = self._any_mask([slot for slot in slots if slot is not None])
+            masks.append(matched)
+
+        if date_range:
+            start_date, end_date = date_range
+            masks.append(self._date_mask(start_date, end_date))
+
+        if not masks:
+            return None
+
+        allowed = masks[0]
+        for matched in masks[1:]:
+            if combine == "and":
+                allowed &= matched
+            else:
+                allowed |= matched
+        return allowed
+
+
+# Usage Example
+if __name__ == "__main__":
+    import json
+
+    store = MetadataStore("data/metadata.db")
+    with open("data/bm25_index/documents.json", encoding="utf-8") as f:
+        doc_ids = [record['doc_id'] for record in json.load(f)]
+
+    facets = FacetIndex.from_store(store, doc_ids)
+    allowed = facets.mask(people=["Maxwell"], locations=["Paris"])
+    print(f"{int(allowed.sum())} of {facets.num_docs} documents match")
+    store.close()
@@ -3,19 +3,40 @@ Extract structured metadata from documents using spaCy NER and regex
 """
 
 import re
-from typing import Dict, List, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 import spacy
 from loguru import logger
+from src.chunker import TextChunker
+
+# spaCy processes documents in passages of at most this many characters,
+# overlapping so entities at a cut are seen whole by one passage
+NLP_CHUNK_CHARS = 10000
+NLP_CHUNK_OVERLAP = 200
+
+# Pipeline components whose output is never read; NER and token.is_punct
+# do not depend on them, so disabling them leaves the metadata unchanged
+UNUSED_COMPONENTS = ["parser", "lemmatizer", "tagger", "attribute_ruler"]
 
 
 class MetadataExtractor:
     """Extract entities and structured data from text"""
     
-    def __init__(self):
-        """Load spaCy model for NER"""
+    # Bump whenever extract_metadata() output changes for the same text;
+    # incremental index builds re-extract documents from older versions
+    EXTRACTOR_VERSION = 2
+    
+    def __init__(self, chunker: Optional[TextChunker] = None):
+        """
+        Load spaCy model for NER
+        
+        Args:
+            chunker: Splits documents into the passages spaCy processes
+                     (default: NLP_CHUNK_CHARS windows)
+        """
+        self.chunker = chunker or TextChunker(NLP_CHUNK_CHARS, NLP_CHUNK_OVERLAP)
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            self.nlp = spacy.load("en_core_web_sm", disable=UNUSED_COMPONENTS)
         except OSError:
             logger.error("spaCy model not found. Run: python -m spacy download en_core_web_sm")
             raise
@@ -49,20 +70,86 @@ class MetadataExtractor:
             }
         """
         
-        # Process with spaCy (limit to first 100k chars for speed)
-        doc = self.nlp(text[:100000])
+        # Process with spaCy passage by passage, so the full text is covered
+        # at a bounded cost per passage
+        found = self._empty_found()
+        spans = self.chunker.spans(text)
+        passages = self.nlp.pipe(text[start:end] for start, end in spans)
+        for doc, skip in zip(passages, self._overlaps(spans)):
+            self._read_passage(doc, skip, found)
+        return self._build_metadata(found, text, doc_id)
+    
+    def extract_metadata_batch(self,
+                               documents: Iterable[Tuple[str, str]],
+                               batch_size: int = 32,
+                               n_process: int = 1) -> Iterator[Dict]:
+        """
+        Extract metadata for many documents with spaCy's nlp.pipe
+        
+        Args:
+            documents: Iterable of (text, doc_id) pairs
+            batch_size: Documents per spaCy batch
+            n_process: Worker processes for spaCy (1 = in-process)
+            
+        Yields:
+            Metadata dicts in input order, identical to extract_metadata()
+        """
+        # Passages go through the pipeline with a small context (document
+        # number, overlap, last passage flag): with n_process > 1 spaCy
+        # pickles the context to the workers and back. Texts and doc_ids of
+        # documents in flight wait here for their last passage.
+        pending = {}
+        
+        def passages():
+            for number, (text, doc_id) in enumerate(documents):
+                pending[number] = (text, doc_id)
+                spans = self.chunker.spans(text) or [(0, 0)]
+                for passage, ((start, end), skip) in enumerate(zip(spans, self._overlaps(spans))):
+                    yield text[start:end], (number, skip, passage == len(spans) - 1)
+        
+        found = self._empty_found()
+        for doc, (number, skip, last) in self.nlp.pipe(passages(),
+                                                       as_tuples=True,
+                                                       batch_size=batch_size,
+                                                       n_process=n_process):
+            self._read_passage(doc, skip, found)
+            if last:
+                text, doc_id = pending.pop(number)
+                yield self._build_metadata(found, text, doc_id)
+                found = self._empty_found()
+    
+    @staticmethod
+    def _overlaps(spans: List[Tuple[int, int]]) -> List[int]:
+        """Characters at the start of each passage already in the previous one"""
+        return [max(previous[1] - span[0], 0) if previous else 0
+                for previous, span in zip([None] + spans[:-1], spans)]
+    
+    @staticmethod
+    def _empty_found() -> Dict:
+        """Entities and word count collected over a document's passages"""
+        return {'people': set(), 'organizations': set(), 'locations': set(), 'word_count': 0}
+    
+    def _read_passage(self, doc, skip: int, found: Dict):
+        """Add the entities of a processed passage; words in the overlap are not recounted"""
+        found['people'] |= self._extract_people(doc)
+        found['organizations'] |= self._extract_organizations(doc)
+        found['locations'] |= self._extract_locations(doc)
+        found['word_count'] += sum(1 for token in doc if not token.is_punct and token.idx >= skip)
+    
+    def _build_metadata(self, found: Dict, text: str, doc_id: str) -> Dict:
+        """Assemble metadata from the passages' entities and the full text"""
         
-        # Extract named entities
-        people = self._extract_people(doc)
-        organizations = self._extract_organizations(doc)
-        locations = self._extract_locations(doc)
+        # Named entities from all passages
+        people = found['people']
+        organizations = found['organizations']
+        locations = found['locations']
         
         # Extract with regex
         dates = self._extract_dates(text)
         emails = self._extract_emails(text)
         
         # Basic statistics
-        word_count = len([token for token in doc if not token.is_punct])
+        word_count = found['word_count']
         
         metadata = {
             'doc_id': doc_id,
@@ -2,15 +2,116 @@
 Store and query metadata using SQLite
 """
 
+import re
 import sqlite3
 import json
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterable, List, Dict, Optional, Tuple, Union
 from pathlib import Path
 from loguru import logger
 
+# Metadata list key -> entity type stored in the entities table
+ENTITY_TYPES = {
+    'people': 'person',
+    'organizations': 'organization',
+    'locations': 'location',
+    'dates': 'date',
+    'emails': 'email'
+}
+
+# Tables and value columns of the pre-normalization schema
+LEGACY_ENTITY_TABLES = {
+    'people': 'name',
+    'organizations': 'name',
+    'locations': 'name',
+    'dates': 'date_str',
+    'emails': 'email'
+}
+
+# Secondary indexes; dropped during bulk loads and rebuilt afterwards
+INDEXES = {
+    'idx_doc_entities_doc': "doc_entities(doc_rowid, entity_id)",
+    'idx_entities_type_name': "entities(type, name)",
+    'idx_doc_dates_doc': "doc_dates(doc_rowid, day)"
+}
+
+MONTHS = {name: number for number, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+# The formats MetadataExtractor's date patterns produce
+ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')  # 2015-07-12
+NUMERIC_DATE = re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$')  # 7/12/2015, 7-12-2015
+NAMED_DATE = re.compile(r'^([A-Za-z]+)\.? (\d{1,2}),? (\d{4})$')  # July 12, 2015
+
+# Connection settings used while building the index
+BULK_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB (negative), i.e. 64 MB
+    'temp_store': 'MEMORY'
+}
+
+
+def normalize_entity(name: str) -> str:
+    """Lookup key for an entity name: case-folded, whitespace collapsed"""
+    return " ".join(name.casefold().split())
+
+
+def parse_date(date_str: str) -> Optional[int]:
+    """
+    Parse an extracted date string into an ordinal day number
+    
+    Accepts the formats found by MetadataExtractor ("2015-07-12",
+    "7/12/2015", "7-12-2015", "July 12, 2015"); numeric dates are read as
+    month/day/year.
+    
+    Returns:
+        date.toordinal() of the date, or None if it is not a valid date
+    """
+    text = " ".join(date_str.split())
+    match = ISO_DATE.match(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = NUMERIC_DATE.match(text)
+        if match:
+            month, day, year = match.groups()
+        else:
+            match = NAMED_DATE.match(text)
+            if not match or match.group(1)[:3].lower() not in MONTHS:
+                return None
+            month = MONTHS[match.group(1)[:3].lower()]
+            day, year = match.group(2), match.group(3)
+    try:
+        return date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        return None
+
+
+def to_day(value: Union[str, date, int]) -> int:
+    """Ordinal day of a date range bound (date string, date or ordinal)"""
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, int):
+        return value
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Unrecognized date: {value!r}")
+    return day
+
 
 class MetadataStore:
-    """SQLite-based metadata storage"""
+    """
+    SQLite-based metadata storage
+    
+    Entity names are stored once in ``entities`` (type, canonical name,
+    normalized key) and linked to documents through the integer-only
+    ``doc_entities(doc_rowid, entity_id)`` table. Dates are additionally
+    parsed into ordinal days in ``doc_dates(day, doc_rowid)``, so date
+    ranges are B-tree range scans; each document also records its
+    earliest and latest day.
+    """
     
     def __init__(self, db_path: str = "data/metadata.db"):
         """Initialize database connection"""
@@ -19,207 +120,637 @@ class MetadataStore:
         
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row  # Return rows as dicts
-        self._create_tables()
-        
+        self.conn.create_function("normalize_entity", 1, normalize_entity, deterministic=True)
+        self._writes = 0
+        
+        if self._has_legacy_schema():
+            # Rename, create and copy in one transaction so a failed
+            # migration leaves the old database untouched
+            self.conn.execute("BEGIN")
+            self._rename_legacy_tables()
+            self._create_tables()
+            self._migrate_legacy_tables()
+        else:
+            missing_dates = self._table_exists('document_metadata') \
+                and not self._table_exists('doc_dates')
+            self._add_date_columns()
+            self._create_tables()
+            if missing_dates:
+                self._backfill_dates()
+            self.conn.commit()
+    
     def _create_tables(self):
         """Create database schema"""
         cursor = self.conn.cursor()
         
-        # Main metadata table
+        # Main metadata table; id is the compact key used by doc_entities
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS document_metadata (
-                doc_id TEXT PRIMARY KEY,
+                id INTEGER PRIMARY KEY,
+                doc_id TEXT UNIQUE NOT NULL,
                 word_count INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                min_day INTEGER,
+                max_day INTEGER
             )
         """)
         
-        # Entity tables (many-to-many relationships)
+        # Entity dictionary: one row per distinct (type, normalized name)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS people (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                doc_id TEXT,
-                name TEXT,
-                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY,
+                type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                norm_key TEXT NOT NULL,
+                UNIQUE (type, norm_key)
             )
         """)
         
+        # Document <-> entity links; the primary key covers entity -> documents
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS organizations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                doc_id TEXT,
-                name TEXT,
-                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
-            )
+            CREATE TABLE IF NOT EXISTS doc_entities (
+                doc_rowid INTEGER NOT NULL REFERENCES document_metadata(id),
+                entity_id INTEGER NOT NULL REFERENCES entities(id),
+                PRIMARY KEY (entity_id, doc_rowid)
+            ) WITHOUT ROWID
         """)
         
+        # Parsed dates as ordinal days; the primary key serves range scans
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS locations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                doc_id TEXT,
-                name TEXT,
-                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
-            )
+            CREATE TABLE IF NOT EXISTS doc_dates (
+                day INTEGER NOT NULL,
+                doc_rowid INTEGER NOT NULL REFERENCES document_metadata(id),
+                PRIMARY KEY (day, doc_rowid)
+            ) WITHOUT ROWID
         """)
         
+        # Source files the metadata was extracted from (incremental rebuilds)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS dates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE IF NOT EXISTS file_manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                content_hash TEXT,
                 doc_id TEXT,
-                date_str TEXT,
-                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
+                extractor_version INTEGER,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        # Create indexes for fast lookups
+        self._create_indexes()
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_manifest_doc ON file_manifest(doc_id)")
+        
+        logger.info("Database schema initialized")
+    
+    def _table_exists(self, table: str) -> bool:
+        """True if the table exists"""
+        row = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        return row is not None
+    
+    def _add_date_columns(self):
+        """Add the per-document date bounds to databases created without them"""
+        if not self._table_exists('document_metadata'):
+            return
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(document_metadata)")}
+        for column in ('min_day', 'max_day'):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE document_metadata ADD COLUMN {column} INTEGER")
+    
+    def _backfill_dates(self):
+        """Parse stored date entities into doc_dates and the per-document bounds"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, name FROM entities WHERE type = 'date'")
+        days = [(parse_date(row['name']), row['id']) for row in cursor.fetchall()]
+        cursor.executemany("""
+            INSERT OR IGNORE INTO doc_dates (day, doc_rowid)
+            SELECT ?, doc_rowid FROM doc_entities WHERE entity_id = ?
+        """, [(day, entity_id) for day, entity_id in days if day is not None])
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS emails (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                doc_id TEXT,
-                email TEXT,
-                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
-            )
+            UPDATE document_metadata SET
+                min_day = (SELECT MIN(day) FROM doc_dates WHERE doc_rowid = document_metadata.id),
+                max_day = (SELECT MAX(day) FROM doc_dates WHERE doc_rowid = document_metadata.id)
         """)
+        logger.info("Indexed parsed dates of existing metadata")
+    
+    def _has_legacy_schema(self) -> bool:
+        """True if the database still has one table per entity type"""
+        row = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'people'"
+        ).fetchone()
+        return row is not None
+    
+    def _rename_legacy_tables(self):
+        """Move pre-normalization tables aside so the new schema can be created"""
+        for table in ['document_metadata', *LEGACY_ENTITY_TABLES]:
+            self.conn.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+        # Old indexes follow their tables; drop them to free the names
+        for (name,) in self.conn.execute("""
+                SELECT name FROM sqlite_master
+                WHERE type = 'index' AND tbl_name LIKE 'legacy_%' AND sql IS NOT NULL
+                """).fetchall():
+            self.conn.execute(f"DROP INDEX {name}")
+    
+    def _migrate_legacy_tables(self):
+        """Copy metadata from the old schema into the normalized tables"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO document_metadata (doc_id, word_count, created_at)
+                SELECT doc_id, word_count, created_at FROM legacy_document_metadata
+            """)
+            for table, column in LEGACY_ENTITY_TABLES.items():
+                entity_type = ENTITY_TYPES[table]
+                # First-seen spelling becomes the canonical name
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO entities (type, name, norm_key)
+                    SELECT ?, {column}, normalize_entity({column}) FROM legacy_{table}
+                    WHERE {column} IS NOT NULL ORDER BY id
+                """, (entity_type,))
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO doc_entities (doc_rowid, entity_id)
+                    SELECT d.id, e.id FROM legacy_{table} l
+                    JOIN document_metadata d ON d.doc_id = l.doc_id
+                    JOIN entities e ON e.type = ? AND e.norm_key = normalize_entity(l.{column})
+                """, (entity_type,))
+            for table in ['document_metadata', *LEGACY_ENTITY_TABLES]:
+                cursor.execute(f"DROP TABLE legacy_{table}")
+            self._backfill_dates()
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error migrating metadata schema: {e}")
+            raise
         
-        # Create indexes for fast lookups
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_people_name ON people(name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_people_doc ON people(doc_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orgs_name ON organizations(name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_locations_name ON locations(name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_locations_doc ON locations(doc_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_dates_str ON dates(date_str)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_email ON emails(email)")
+        self.conn.execute("VACUUM")
+        count = self.conn.execute("SELECT COUNT(*) FROM document_metadata").fetchone()[0]
+        logger.info(f"Migrated metadata for {count} documents to the normalized schema")
+    
+    def _create_indexes(self):
+        """Create the secondary indexes"""
+        for name, target in INDEXES.items():
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    
+    def _drop_indexes(self):
+        """Drop the secondary indexes"""
+        for name in INDEXES:
+            self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+    
+    @contextmanager
+    def bulk_load(self, defer_indexes: bool = False):
+        """
+        Tune the connection for a large batch of writes
         
-        self.conn.commit()
-        logger.info("Database schema initialized")
+        Switches to WAL with synchronous=NORMAL and a larger page cache
+        for the duration of the block; the previous settings, journal mode
+        included, are restored afterwards, which checkpoints the WAL and
+        removes the -wal/-shm files. With defer_indexes, the secondary
+        indexes are dropped first and rebuilt once at the end, which is
+        much cheaper than maintaining them row by row on an initial load.
+        
+        Args:
+            defer_indexes: Rebuild secondary indexes after the load
+        """
+        previous = {
+            name: self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ('journal_mode', 'synchronous', 'cache_size', 'temp_store')
+        }
+        for name, value in BULK_PRAGMAS.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        if defer_indexes:
+            self._drop_indexes()
+            self.conn.commit()
+        
+        try:
+            yield self
+        finally:
+            if defer_indexes:
+                self._create_indexes()
+            # Leaving WAL needs no open transaction
+            self.conn.commit()
+            for name, value in previous.items():
+                self.conn.execute(f"PRAGMA {name} = {value}")
+    
+    def data_version(self) -> Tuple[int, int]:
+        """
+        Token that changes whenever stored metadata changes
+        
+        Covers writes through this store and commits by other connections
+        (e.g. build_metadata_index.py running in another process).
+        """
+        return self._writes, self.conn.execute("PRAGMA data_version").fetchone()[0]
     
     def store_metadata(self, metadata: Dict):
         """Store metadata for a document"""
+        self.store_many([metadata])
+    
+    def store_many(self, metadata_list: Iterable[Dict]):
+        """
+        Store metadata for many documents in a single transaction
+        
+        Existing metadata of the same documents is replaced. Rows are
+        written with executemany, one statement per table for the whole
+        batch, and committed once.
+        
+        Args:
+            metadata_list: Metadata dicts as returned by MetadataExtractor
+        """
+        metadata_list = list(metadata_list)
+        if not metadata_list:
+            return
+        
         cursor = self.conn.cursor()
-        doc_id = metadata['doc_id']
+        
+        # Parse dates into ordinal days (unparseable strings stay entities only)
+        doc_days = {
+            metadata['doc_id']: sorted({
+                day for day in map(parse_date, metadata['dates']) if day is not None
+            })
+            for metadata in metadata_list
+        }
         
         try:
-            # Insert main metadata
-            cursor.execute("""
-                INSERT OR REPLACE INTO document_metadata (doc_id, word_count)
-                VALUES (?, ?)
-            """, (doc_id, metadata['word_count']))
-            
-            # Delete existing entities (for updates)
-            for table in ['people', 'organizations', 'locations', 'dates', 'emails']:
-                cursor.execute(f"DELETE FROM {table} WHERE doc_id = ?", (doc_id,))
-            
-            # Insert entities
-            for person in metadata['people']:
-                cursor.execute("INSERT INTO people (doc_id, name) VALUES (?, ?)",
-                             (doc_id, person))
-            
-            for org in metadata['organizations']:
-                cursor.execute("INSERT INTO organizations (doc_id, name) VALUES (?, ?)",
-                             (doc_id, org))
+            # Upsert main metadata; keeps each document's integer id stable
+            cursor.executemany("""
+                INSERT INTO document_metadata (doc_id, word_count, min_day, max_day)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (doc_id) DO UPDATE SET
+                    word_count = excluded.word_count,
+                    min_day = excluded.min_day,
+                    max_day = excluded.max_day
+            """, [
+                (metadata['doc_id'], metadata['word_count'],
+                 days[0] if days else None, days[-1] if days else None)
+                for metadata in metadata_list
+                for days in [doc_days[metadata['doc_id']]]
+            ])
             
-            for loc in metadata['locations']:
-                cursor.execute("INSERT INTO locations (doc_id, name) VALUES (?, ?)",
-                             (doc_id, loc))
+            # Stage (document, entity) pairs of the batch
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS batch_links (
+                    doc_id TEXT, type TEXT, name TEXT, norm_key TEXT
+                )
+            """)
+            cursor.execute("DELETE FROM batch_links")
+            cursor.executemany(
+                "INSERT INTO batch_links (doc_id, type, name, norm_key) VALUES (?, ?, ?, ?)",
+                [
+                    (metadata['doc_id'], entity_type, name, normalize_entity(name))
+                    for metadata in metadata_list
+                    for key, entity_type in ENTITY_TYPES.items()
+                    for name in metadata[key]
+                ]
+            )
             
-            for date in metadata['dates']:
-                cursor.execute("INSERT INTO dates (doc_id, date_str) VALUES (?, ?)",
-                             (doc_id, date))
+            # Delete existing links (for updates), one statement for the batch
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_docs (doc_id TEXT PRIMARY KEY)")
+            cursor.execute("DELETE FROM batch_docs")
+            cursor.executemany("INSERT OR IGNORE INTO batch_docs (doc_id) VALUES (?)",
+                               [(metadata['doc_id'],) for metadata in metadata_list])
+            for table in ['doc_entities', 'doc_dates']:
+                cursor.execute(f"""
+                    DELETE FROM {table} WHERE doc_rowid IN (
+                        SELECT d.id FROM document_metadata d
+                        JOIN batch_docs b ON b.doc_id = d.doc_id
+                    )
+                """)
             
-            for email in metadata['emails']:
-                cursor.execute("INSERT INTO emails (doc_id, email) VALUES (?, ?)",
-                             (doc_id, email))
+            # Add new entities, then link them
+            cursor.execute("""
+                INSERT OR IGNORE INTO entities (type, name, norm_key)
+                SELECT type, name, norm_key FROM batch_links ORDER BY rowid
+            """)
+            cursor.execute("""
+                INSERT OR IGNORE INTO doc_entities (doc_rowid, entity_id)
+                SELECT d.id, e.id FROM batch_links b
+                JOIN document_metadata d ON d.doc_id = b.doc_id
+                JOIN entities e ON e.type = b.type AND e.norm_key = b.norm_key
+            """)
+            cursor.executemany("""
+                INSERT INTO doc_dates (day, doc_rowid)
+                SELECT ?, id FROM document_metadata WHERE doc_id = ?
+            """, [(day, doc_id) for doc_id, days in doc_days.items() for day in days])
             
             self.conn.commit()
-            logger.debug(f"Stored metadata for {doc_id}")
-            
+            self._writes += 1
+            logger.debug(f"Stored metadata for {len(metadata_list)} documents")
+        
         except Exception as e:
             self.conn.rollback()
-            logger.error(f"Error storing metadata for {doc_id}: {e}")
+            logger.error(f"Error storing metadata for {len(metadata_list)} documents: {e}")
             raise
     
-    def filter_documents(self, 
-                        doc_ids: List[str],
+    def get_manifest(self) -> Dict[str, Dict]:
+        """
+        Get the file manifest
+        
+        Returns:
+            Dict mapping relative file path to its manifest entry
+            (size, mtime_ns, content_hash, doc_id, extractor_version)
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT path, size, mtime_ns, content_hash, doc_id, extractor_version
+            FROM file_manifest
+        """)
+        return {row['path']: dict(row) for row in cursor.fetchall()}
+    
+    def update_manifest(self, entries: List[Dict]):
+        """Insert or replace manifest entries (dicts with the manifest columns)"""
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO file_manifest
+                (path, size, mtime_ns, content_hash, doc_id, extractor_version)
+            VALUES (:path, :size, :mtime_ns, :content_hash, :doc_id, :extractor_version)
+        """, entries)
+        self.conn.commit()
+    
+    def remove_from_manifest(self, paths: List[str]):
+        """Forget files that no longer exist"""
+        self.conn.executemany("DELETE FROM file_manifest WHERE path = ?",
+                              [(path,) for path in paths])
+        self.conn.commit()
+    
+    def prune_unreferenced(self) -> int:
+        """
+        Delete metadata for documents no file in the manifest refers to
+        
+        Entities no remaining document mentions are removed as well.
+        
+        Returns:
+            Number of documents removed
+        """
+        cursor = self.conn.cursor()
+        unreferenced = """
+            SELECT id FROM document_metadata
+            WHERE doc_id NOT IN (SELECT doc_id FROM file_manifest)
+        """
+        cursor.execute(unreferenced)
+        rowids = [(row['id'],) for row in cursor.fetchall()]
+        
+        cursor.executemany("DELETE FROM doc_entities WHERE doc_rowid = ?", rowids)
+        cursor.executemany("DELETE FROM doc_dates WHERE doc_rowid = ?", rowids)
+        cursor.executemany("DELETE FROM document_metadata WHERE id = ?", rowids)
+        self._prune_orphan_entities()
+        self.conn.commit()
+        self._writes += 1
+        
+        if rowids:
+            logger.info(f"Pruned metadata for {len(rowids)} removed documents")
+        return len(rowids)
+    
+    def _prune_orphan_entities(self):
+        """Delete entities that are no longer linked to any document"""
+        self.conn.execute("""
+            DELETE FROM entities
+            WHERE NOT EXISTS (SELECT 1 FROM doc_entities WHERE entity_id = entities.id)
+        """)
+    
+    def _entity_ids(self, entity_type: str, names: List[str]) -> List[Optional[int]]:
+        """Entity id for each name (None for names not in the dictionary)"""
+        keys = [normalize_entity(name) for name in names]
+        placeholders = ','.join(['?'] * len(keys))
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT id, norm_key FROM entities
+            WHERE type = ? AND norm_key IN ({placeholders})
+        """, [entity_type] + keys)
+        ids = {row['norm_key']: row['id'] for row in cursor.fetchall()}
+        return [ids.get(key) for key in keys]
+    
+    def count_entity_matches(self,
+                             doc_ids: List[str],
+                             entity_type: str,
+                             names: List[str]) -> List[int]:
+        """
+        Number of the given names linked to each document
+        
+        Args:
+            doc_ids: Documents to count for
+            entity_type: 'person', 'location' or 'organization'
+            names: Entity names (matched on their normalized form)
+            
+        Returns:
+            Match count for each doc id, in input order
+        """
+        entity_ids = [entity_id for entity_id in self._entity_ids(entity_type, names)
+                      if entity_id is not None]
+        documents = self._entity_documents(entity_ids)
+        return [sum(doc_id in documents[entity_id] for entity_id in entity_ids)
+                for doc_id in doc_ids]
+    
+    def documents_in_date_range(self, start_date, end_date) -> List[str]:
+        """
+        Documents mentioning a date in a range (inclusive)
+        
+        Executes as a range scan of the doc_dates primary key.
+        
+        Args:
+            start_date, end_date: Date strings in any extracted format,
+                                  datetime.date objects or ordinal days
+            
+        Returns:
+            Document IDs, sorted
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT d.doc_id FROM doc_dates dd
+            JOIN document_metadata d ON d.id = dd.doc_rowid
+            WHERE dd.day BETWEEN ? AND ?
+            ORDER BY d.doc_id
+        """, (to_day(start_date), to_day(end_date)))
+        return [row['doc_id'] for row in cursor.fetchall()]
+    
+    def get_date_bounds(self, doc_id: str) -> Optional[Tuple[date, date]]:
+        """Earliest and latest date mentioned in a document (None if no dates)"""
+        row = self.conn.execute(
+            "SELECT min_day, max_day FROM document_metadata WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None or row['min_day'] is None:
+            return None
+        return date.fromordinal(row['min_day']), date.fromordinal(row['max_day'])
+    
+    def get_date_postings(self) -> List[sqlite3.Row]:
+        """Every (day, doc_id) pair, ordered by day"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT dd.day, d.doc_id FROM doc_dates dd
+            JOIN document_metadata d ON d.id = dd.doc_rowid
+            ORDER BY dd.day
+        """)
+        return cursor.fetchall()
+    
+    def _entity_documents(self, entity_ids: List[int]) -> Dict[int, set]:
+        """Doc ids linked to each entity, read in one pass over doc_entities"""
+        documents = {entity_id: set() for entity_id in entity_ids}
+        if not entity_ids:
+            return documents
+        placeholders = ','.join(['?'] * len(entity_ids))
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT de.entity_id, d.doc_id FROM doc_entities de
+            JOIN document_metadata d ON d.id = de.doc_rowid
+            WHERE de.entity_id IN ({placeholders})
+        """, list(entity_ids))
+        for row in cursor.fetchall():
+            documents[row['entity_id']].add(row['doc_id'])
+        return documents
+    
+    def filter_documents(self,
+                        doc_ids: Optional[List[str]],
                         people: Optional[List[str]] = None,
                         locations: Optional[List[str]] = None,
                         organizations: Optional[List[str]] = None,
-                        date_range: Optional[tuple] = None) -> List[str]:
+                        date_range: Optional[tuple] = None,
+                        combine: str = "and",
+                        require_all: bool = False) -> List[str]:
         """
         Filter document IDs by metadata criteria
         
+        Filter names are resolved to entity ids, and the documents of all
+        those entities are read in a single query (a primary-key range
+        scan of doc_entities). The filters are then combined as sets and
+        applied to the candidates in one pass, so the cost depends on how
+        many documents the filter entities occur in, not on the number
+        of candidates, and no SQL variable is bound per candidate.
+        Entity names are matched on their normalized form.
+        
         Args:
-            doc_ids: Initial set of document IDs to filter
+            doc_ids: Initial set of document IDs to filter, or None to
+                     filter every stored document
             people: List of person names to match (OR logic)
             locations: List of locations to match (OR logic)
             organizations: List of organizations to match (OR logic)
-            date_range: Tuple of (start_date, end_date) strings
+            date_range: Tuple of (start_date, end_date), inclusive; dates
+                        in any extracted format, datetime.date or
+                        ordinal days
+            combine: "and" (default) keeps documents matching every filter
+                     type; "or" keeps documents matching any of them
+            require_all: Require all names of a list (AND logic) instead
+                         of any of them
             
         Returns:
-            Filtered list of document IDs
+            Filtered list of document IDs, in the order of doc_ids
+            (sorted when doc_ids is None)
         """
-        if not doc_ids:
+        if doc_ids is not None and not doc_ids:
             return []
+        if combine not in ("and", "or"):
+            raise ValueError(f"combine must be 'and' or 'or', got {combine!r}")
+        
+        # Each filter is a list of entity groups; a group matches documents
+        # linked to any of its entities
+        filters = []
+        for entity_type, names in [('person', people),
+                                   ('location', locations),
+                                   ('organization', organizations)]:
+            if not names:
+                continue
+            entity_ids = self._entity_ids(entity_type, names)
+            if require_all:
+                filters.append([[entity_id] if entity_id is not None else []
+                                for entity_id in entity_ids])
+            else:
+                filters.append([[entity_id for entity_id in entity_ids if entity_id is not None]])
+        
+        if doc_ids is None:
+            candidates = [row['doc_id'] for row in self.conn.execute(
+                "SELECT doc_id FROM document_metadata ORDER BY doc_id")]
+        else:
+            candidates = list(dict.fromkeys(doc_ids))
+        if not filters and not date_range:
+            return candidates
+        
+        documents = self._entity_documents(sorted({
+            entity_id for groups in filters for group in groups for entity_id in group
+        }))
+        
+        matches = []
+        for groups in filters:
+            # Names within a filter: any (default) or all of them
+            matched = None
+            for group in groups:
+                group_docs = set().union(*(documents[entity_id] for entity_id in group))
+                matched = group_docs if matched is None else matched & group_docs
+            matches.append(matched)
+        
+        # Filter by date range (index range scan over parsed days)
+        if date_range:
+            start_date, end_date = date_range
+            matches.append(set(self.documents_in_date_range(start_date, end_date)))
+        
+        allowed = None
+        for matched in matches:
+            if allowed is None:
+                allowed = matched
+            elif combine == "and":
+                allowed &= matched
+            else:
+                allowed |= matched
+        
+        filtered_ids = [doc_id for doc_id in candidates if doc_id in allowed]
+        logger.debug(f"Metadata filters kept {len(filtered_ids)} of {len(candidates)} docs")
+        return filtered_ids
+    
+    def document_count(self) -> int:
+        """Number of documents with stored metadata"""
+        return self.conn.execute("SELECT COUNT(*) FROM document_metadata").fetchone()[0]
+    
+    def entity_document_counts(self, entity_type: str, names: List[str]) -> List[int]:
+        """Number of documents linked to each named entity (0 if unknown)"""
+        entity_ids = self._entity_ids(entity_type, names)
+        known = [entity_id for entity_id in entity_ids if entity_id is not None]
+        counts = {}
+        if known:
+            placeholders = ','.join(['?'] * len(known))
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SELECT entity_id, COUNT(*) AS num_docs FROM doc_entities
+                WHERE entity_id IN ({placeholders})
+                GROUP BY entity_id
+            """, known)
+            counts = {row['entity_id']: row['num_docs'] for row in cursor.fetchall()}
+        return [counts.get(entity_id, 0) for entity_id in entity_ids]
+    
+    def estimate_filter_cardinality(self,
+                                    people: Optional[List[str]] = None,
+                                    locations: Optional[List[str]] = None,
+                                    organizations: Optional[List[str]] = None,
+                                    date_range: Optional[tuple] = None,
+                                    combine: str = "and",
+                                    require_all: bool = False) -> int:
+        """
+        Upper bound on the number of documents filter_documents can return
         
-        # Start with initial set
-        filtered_ids = set(doc_ids)
-        cursor = self.conn.cursor()
+        Computed from per-entity document counts (index-only COUNTs on
+        doc_entities) without evaluating the filters: a list of names
+        matches at most the sum (any) or the minimum (all) of their
+        counts, and filter types combine by minimum (and) or sum (or).
+        
+        Returns:
+            Estimated document count, at most document_count()
+        """
+        total = self.document_count()
+        bounds = []
+        for entity_type, names in [('person', people),
+                                   ('location', locations),
+                                   ('organization', organizations)]:
+            if names:
+                counts = self.entity_document_counts(entity_type, names)
+                bounds.append(min(counts) if require_all else sum(counts))
         
-        # Filter by people
-        if people:
-            placeholders = ','.join(['?'] * len(people))
-            doc_placeholders = ','.join(['?'] * len(filtered_ids))
-            query = f"""
-                SELECT DISTINCT doc_id FROM people 
-                WHERE name IN ({placeholders})
-                AND doc_id IN ({doc_placeholders})
-            """
-            cursor.execute(query, people + list(filtered_ids))
-            people_ids = {row['doc_id'] for row in cursor.fetchall()}
-            filtered_ids &= people_ids
-            logger.debug(f"After people filter: {len(filtered_ids)} docs")
-        
-        # Filter by locations
-        if locations:
-            placeholders = ','.join(['?'] * len(locations))
-            doc_placeholders = ','.join(['?'] * len(filtered_ids))
-            query = f"""
-                SELECT DISTINCT doc_id FROM locations 
-                WHERE name IN ({placeholders})
-                AND doc_id IN ({doc_placeholders})
-            """
-            cursor.execute(query, locations + list(filtered_ids))
-            loc_ids = {row['doc_id'] for row in cursor.fetchall()}
-            filtered_ids &= loc_ids
-            logger.debug(f"After location filter: {len(filtered_ids)} docs")
-        
-        # Filter by organizations
-        if organizations:
-            placeholders = ','.join(['?'] * len(organizations))
-            doc_placeholders = ','.join(['?'] * len(filtered_ids))
-            query = f"""
-                SELECT DISTINCT doc_id FROM organizations 
-                WHERE name IN ({placeholders})
-                AND doc_id IN ({doc_placeholders})
-            """
-            cursor.execute(query, organizations + list(filtered_ids))
-            org_ids = {row['doc_id'] for row in cursor.fetchall()}
-            filtered_ids &= org_ids
-            logger.debug(f"After organization filter: {len(filtered_ids)} docs")
-        
-        # Filter by date range
         if date_range:
             start_date, end_date = date_range
-            doc_placeholders = ','.join(['?'] * len(filtered_ids))
-            query = f"""
-                SELECT DISTINCT doc_id FROM dates 
-                WHERE date_str BETWEEN ? AND ?
-                AND doc_id IN ({doc_placeholders})
-            """
-            cursor.execute(query, [start_date, end_date] + list(filtered_ids))
-            date_ids = {row['doc_id'] for row in cursor.fetchall()}
-            filtered_ids &= date_ids
-            logger.debug(f"After date filter: {len(filtered_ids)} docs")
-        
-        return list(filtered_ids)
+            bounds.append(self.conn.execute(
+                "SELECT COUNT(*) FROM doc_dates WHERE day BETWEEN ? AND ?",
+                (to_day(start_date), to_day(end_date))
+            ).fetchone()[0])
+        
+        if not bounds:
+            return total
+        estimate = min(bounds) if combine == "and" else sum(bounds)
+        return min(estimate, total)
     
     def get_metadata(self, doc_id: str) -> Optional[Dict]:
         """Retrieve metadata for a document"""
@@ -243,20 +774,15 @@ class MetadataStore:
         }
         
         # Get entities
-        cursor.execute("SELECT name FROM people WHERE doc_id = ?", (doc_id,))
-        metadata['people'] = [row['name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT name FROM organizations WHERE doc_id = ?", (doc_id,))
-        metadata['organizations'] = [row['name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT name FROM locations WHERE doc_id = ?", (doc_id,))
-        metadata['locations'] = [row['name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT date_str FROM dates WHERE doc_id = ?", (doc_id,))
-        metadata['dates'] = [row['date_str'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT email FROM emails WHERE doc_id = ?", (doc_id,))
-        metadata['emails'] = [row['email'] for row in cursor.fetchall()]
+        keys = {entity_type: key for key, entity_type in ENTITY_TYPES.items()}
+        cursor.execute("""
+            SELECT e.type, e.name FROM doc_entities de
+            JOIN entities e ON e.id = de.entity_id
+            WHERE de.doc_rowid = ?
+            ORDER BY e.type, e.name
+        """, (row['id'],))
+        for entity in cursor.fetchall():
+            metadata[keys[entity['type']]].append(entity['name'])
         
         return metadata
     
@@ -271,19 +797,56 @@ class MetadataStore:
             'dates': []
         }
         
-        cursor.execute("SELECT DISTINCT name FROM people ORDER BY name")
-        entities['people'] = [row['name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT DISTINCT name FROM organizations ORDER BY name")
-        entities['organizations'] = [row['name'] for row in cursor.fetchall()]
+        for key in entities:
+            cursor.execute("""
+                SELECT name FROM entities e
+                WHERE type = ?
+                AND EXISTS (SELECT 1 FROM doc_entities WHERE entity_id = e.id)
+                ORDER BY name
+            """, (ENTITY_TYPES[key],))
+            entities[key] = [row['name'] for row in cursor.fetchall()]
         
-        cursor.execute("SELECT DISTINCT name FROM locations ORDER BY name")
-        entities['locations'] = [row['name'] for row in cursor.fetchall()]
+        return entities
+    
+    def get_entity_catalog(self, entity_types: Optional[List[str]] = None) -> List[sqlite3.Row]:
+        """
+        Every entity that occurs in at least one document
         
-        cursor.execute("SELECT DISTINCT date_str FROM dates ORDER BY date_str")
-        entities['dates'] = [row['date_str'] for row in cursor.fetchall()]
+        Args:
+            entity_types: Restrict to these types ('person', 'location', ...)
+            
+        Returns:
+            Rows with type, name, norm_key and num_docs
+        """
+        types = entity_types or list(ENTITY_TYPES.values())
+        placeholders = ','.join(['?'] * len(types))
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT e.type, e.name, e.norm_key, COUNT(*) AS num_docs
+            FROM entities e
+            JOIN doc_entities de ON de.entity_id = e.id
+            WHERE e.type IN ({placeholders})
+            GROUP BY e.id
+        """, types)
+        return cursor.fetchall()
+    
+    def get_entity_links(self) -> List[sqlite3.Row]:
+        """
+        Every (entity, document) link, grouped by entity
         
-        return entities
+        Returns:
+            Rows with entity_id, type, name, norm_key and doc_id, ordered
+            by entity id
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT e.id AS entity_id, e.type, e.name, e.norm_key, d.doc_id
+            FROM doc_entities de
+            JOIN entities e ON e.id = de.entity_id
+            JOIN document_metadata d ON d.id = de.doc_rowid
+            ORDER BY de.entity_id
+        """)
+        return cursor.fetchall()
     
     def close(self):
         """Close database connection"""
@@ -312,4 +875,3 @@ if __name__ == "__main__":
     print("Retrieved:", retrieved)
     
     store.close()
-
@@ -0,0 +1,101 @@
+"""
+Delta-encoded token positions for phrase and proximity queries
+"""
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.atomic_io import save_array
+
+DELTAS_FILE = "pos_deltas.npy"
+
+
+class PositionalIndex:
+    """
+    Token positions of every (term, document) posting of a BM25 index
+
+    Positions are token ordinals within the document. They are stored
+    in BM25 posting order, ``post_tfs[p]`` of them per posting ``p``:
+    the first one absolute, the rest as gaps to the previous position,
+    in the smallest unsigned dtype that holds the largest gap. Decoding
+    the postings of a few candidate documents is one vectorized gather
+    plus a segmented cumulative sum.
+    """
+
+    def __init__(self, pos_deltas: np.ndarray, post_tfs: np.ndarray):
+        """
+        Args:
+            pos_deltas: Position gaps of all postings, concatenated
+            post_tfs: Term frequency (number of positions) of each posting
+        """
+        self.pos_deltas = pos_deltas
+        self.post_tfs = post_tfs
+        self.pos_ptr = np.zeros(len(post_tfs) + 1, dtype=np.int64)
+        np.cumsum(post_tfs, out=self.pos_ptr[1:])
+
+    @classmethod
+    def from_sorted(cls,
+                    positions: np.ndarray,
+                    segment_starts: np.ndarray,
+                    post_tfs: np.ndarray) -> "PositionalIndex":
+        """
+        Delta-encode positions already grouped by posting
+
+        Args:
+            positions: Token positions, grouped by posting and ascending within one
+            segment_starts: Boolean mask, True at the first position of each posting
+            post_tfs: Term frequency of each posting
+        """
+        deltas = np.diff(positions, prepend=0)
+        deltas[segment_starts] = positions[segment_starts]
+        max_delta = int(deltas.max()) if len(deltas) else 0
+        return cls(deltas.astype(np.min_scalar_type(max_delta)), post_tfs)
+
+    def decode(self, postings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions of a set of postings
+
+        Args:
+            postings: Posting indices into the BM25 posting arrays
+
+        Returns:
+            (slot, position) arrays: for every position, the index into
+            ``postings`` it belongs to, and the position itself; ordered
+            by slot, then ascending position
+        """
+        lengths = self.post_tfs[postings].astype(np.int64)
+        seg_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=seg_ptr[1:])
+        flat = np.arange(seg_ptr[-1]) + np.repeat(self.pos_ptr[postings] - seg_ptr[:-1], lengths)
+
+        # One running sum over all segments, rebased at each segment start
+        running = np.cumsum(self.pos_deltas[flat], dtype=np.int64)
+        before = np.concatenate(([0], running))[seg_ptr[:-1]]
+        slots = np.repeat(np.arange(len(postings)), lengths)
+        return slots, running - before[slots]
+
+    def save(self, index_dir: str):
+        """Write the position gaps to a directory"""
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        save_array(path / DELTAS_FILE, self.pos_deltas)
+
+    @classmethod
+    def load(cls, index_dir: str, post_tfs: np.ndarray) -> Optional["PositionalIndex"]:
+        """Memory-map gaps written by save() (None if missing)"""
+        try:
+            pos_deltas = np.load(Path(index_dir) / DELTAS_FILE, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return cls(pos_deltas, post_tfs)
+
+
+# Usage Example
+if __name__ == "__main__":
+    # Two postings: positions [2, 7, 9] and [0, 4]
+    positions = np.array([2, 7, 9, 0, 4])
+    starts = np.array([True, False, False, True, False])
+    index = PositionalIndex.from_sorted(positions, starts, np.array([3, 2]))
+    print(index.pos_deltas, index.decode(np.array([1, 0])))
@@ -0,0 +1,99 @@
+"""
+Bounded LRU cache for search results
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class QueryCache:
+    """
+    Least-recently-used result cache with optional time-to-live
+
+    Keys must be hashable and should include everything the result
+    depends on (normalized query, filters, top_k, index versions), so a
+    rebuilt index simply stops matching old entries. Values are copied
+    on the way in and out, so callers may modify returned results.
+    """
+
+    def __init__(self,
+                 max_size: int = 256,
+                 ttl_seconds: Optional[float] = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_size: Maximum number of cached entries
+            ttl_seconds: Entry lifetime in seconds (None = no expiry)
+            clock: Time source (monotonic seconds)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value for the key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None \
+                    and self.clock() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+# Usage Example
+if __name__ == "__main__":
+    cache = QueryCache(max_size=2)
+    cache.put(("maxwell paris", 10), [{'doc_id': 'doc_1', 'score': 3.2}])
+    print(cache.get(("maxwell paris", 10)))
+    print(cache.get(("flight logs", 10)))
+    print(cache.stats())
@@ -0,0 +1,128 @@
+"""
+Gazetteer-based entity recognition for short search queries
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+from src.metadata_store import MetadataStore, normalize_entity
+from src.text_processor import ENGLISH_STOPWORDS
+
+# Entity type -> key of the filter lists returned by match()
+FILTER_KEYS = {
+    'person': 'people',
+    'location': 'locations',
+    'organization': 'organizations'
+}
+
+# Entity keys shorter than this are too ambiguous to tag in queries
+MIN_KEY_LENGTH = 3
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class QueryEntityMatcher:
+    """
+    Tag query spans that name known entities
+
+    The gazetteer is a token trie over the normalized names of every
+    person, location and organization in the metadata store. Matching
+    scans the query once, taking the longest entity name starting at
+    each token, so tagging a short query takes microseconds. A name
+    stored under several types is tagged with the type it occurs in
+    most often.
+
+    Single-word names are often common words as well (an organization
+    "Flight" extracted from a letterhead), so they are only tagged where
+    the query capitalizes them, and names that are stopwords are never
+    tagged. Names of several words match in any case.
+    """
+
+    def __init__(self, entities: List[Tuple[str, str, str, int]]):
+        """
+        Args:
+            entities: (type, canonical name, normalized key, document count)
+        """
+        self.trie: Dict = {}
+        self.size = 0
+
+        for entity_type, name, norm_key, num_docs in entities:
+            if entity_type not in FILTER_KEYS or len(norm_key) < MIN_KEY_LENGTH \
+                    or norm_key in ENGLISH_STOPWORDS:
+                continue
+            tokens = self.tokenize(norm_key)
+            if not tokens:
+                continue
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            # The empty-string key marks the end of a name (tokens are never empty)
+            best = node.get("")
+            if best is None or num_docs > best[2]:
+                if best is None:
+                    self.size += 1
+                node[""] = (entity_type, name, num_docs)
+
+    @classmethod
+    def from_store(cls, store: MetadataStore) -> "QueryEntityMatcher":
+        """Build the gazetteer from the entities in a metadata store"""
+        catalog = store.get_entity_catalog(list(FILTER_KEYS))
+        matcher = cls([
+            (row['type'], row['name'], row['norm_key'], row['num_docs'])
+            for row in catalog
+        ])
+        logger.info(f"Built query entity gazetteer ({matcher.size} names)")
+        return matcher
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Word tokens of normalized text"""
+        return WORD_PATTERN.findall(normalize_entity(text))
+
+    def match(self, query: str) -> Dict[str, List[str]]:
+        """
+        Find entity names in a query
+
+        Args:
+            query: Search query string
+
+        Returns:
+            {'people': [...], 'locations': [...], 'organizations': [...]}
+            with canonical entity names, in query order
+        """
+        found = {key: [] for key in FILTER_KEYS.values()}
+        words = WORD_PATTERN.findall(query)
+        tokens = [normalize_entity(word) for word in words]
+
+        start = 0
+        while start < len(tokens):
+            node = self.trie
+            longest = None
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                # A single word only names an entity where it is capitalized
+                if "" in node and (end > start or words[start][:1].isupper()):
+                    longest = (end, node[""])
+            if longest is None:
+                start += 1
+                continue
+
+            end, (entity_type, name, _) = longest
+            names = found[FILTER_KEYS[entity_type]]
+            if name not in names:
+                names.append(name)
+            start = end + 1
+
+        return found
+
+
+# Usage Example
+if __name__ == "__main__":
+    store = MetadataStore("data/metadata.db")
+    matcher = QueryEntityMatcher.from_store(store)
+    print(matcher.match("Maxwell meeting in Paris"))
+    store.close()
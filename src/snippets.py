@@ -0,0 +1,168 @@
+"""
+Query-aware result snippets from indexed token positions
+"""
+
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.bm25_index import BM25Index
+from src.text_processor import TextProcessor
+
+# A UTF-8 character is at most 4 bytes
+MAX_UTF8_BYTES = 4
+
+# Share of the snippet placed before the first hit of the chosen window
+LEAD_FRACTION = 0.2
+
+
+class SnippetGenerator:
+    """
+    Pick the passage of a document that best matches the query
+
+    Query-term hits are found in the document's int32 term-id sequence
+    (TokenArrays) and located in the text through the byte offsets
+    stored at index time. Every window of hits that fits in a snippet
+    is scored by the IDF of the distinct query terms it contains (ties
+    go to denser, then earlier windows), and only the bytes of the
+    winning window are read and decoded. The text is never re-scanned,
+    so the cost per result is a vectorized pass over the document's
+    term ids plus one short read, even for multi-megabyte documents.
+    """
+
+    def __init__(self,
+                 index: BM25Index,
+                 processor: TextProcessor,
+                 unit_ptr: Optional[np.ndarray] = None):
+        """
+        Args:
+            index: BM25 index built with token byte offsets
+            processor: Tokenizer the index was built with
+            unit_ptr: For an index of passages, document ``d`` spans index
+                      units ``unit_ptr[d]:unit_ptr[d + 1]`` (offsets are
+                      relative to the document); None if units are documents
+        """
+        self.index = index
+        self.processor = processor
+        self.unit_ptr = unit_ptr
+
+    @property
+    def available(self) -> bool:
+        """True if the index stores the token offsets snippets need"""
+        return self.index.tokens is not None and self.index.tokens.token_starts is not None
+
+    def _best_window(self,
+                     term_ids: np.ndarray,
+                     hit_terms: np.ndarray,
+                     hit_starts: np.ndarray,
+                     reach: int) -> int:
+        """Index of the hit that starts the best window"""
+        positions = np.arange(len(hit_starts))
+        window_ends = np.searchsorted(hit_starts, hit_starts + reach, side="left")
+        scores = np.zeros(len(hit_starts))
+        for term_id in term_ids:
+            counts = np.zeros(len(hit_starts) + 1, dtype=np.int64)
+            np.cumsum(hit_terms == term_id, out=counts[1:])
+            scores += self.index.idf[term_id] * (counts[window_ends] > counts[positions])
+        # Density breaks ties between windows covering the same terms
+        scores += 1e-6 * (window_ends - positions)
+        return int(np.argmax(scores))
+
+    def snippet(self,
+                doc_index: int,
+                query_tokens: List[str],
+                read_span: Callable[[int, int, int], str],
+                max_length: int = 200) -> Optional[Dict]:
+        """
+        Best-matching passage of a document
+
+        Args:
+            doc_index: Document ordinal
+            query_tokens: Tokenized query
+            read_span: Function (doc_index, byte_start, byte_end) -> text,
+                       e.g. DocumentStore.read_span
+            max_length: Maximum snippet length in characters
+
+        Returns:
+            {'text': snippet, 'highlights': [(start, end), ...]} with
+            character spans of query terms in the snippet, or None when
+            offsets are not indexed or the document has no query term
+        """
+        if not self.available:
+            return None
+        term_ids = np.unique([self.index.vocabulary[t] for t in query_tokens
+                              if t in self.index.vocabulary]).astype(np.int32)
+        if len(term_ids) == 0:
+            return None
+
+        tokens = self.index.tokens
+        first, last = (doc_index, doc_index + 1) if self.unit_ptr is None \
+            else (self.unit_ptr[doc_index], self.unit_ptr[doc_index + 1])
+        token_range = slice(tokens.doc_ptr[first], tokens.doc_ptr[last])
+        doc_terms = tokens.doc_tokens[token_range]
+        hits = np.flatnonzero(np.isin(doc_terms, term_ids))
+        if len(hits) == 0:
+            return None
+        # Overlapping passages repeat tokens; keep each occurrence once
+        hit_starts, keep = np.unique(tokens.token_starts[token_range][hits], return_index=True)
+        hit_starts = hit_starts.astype(np.int64)
+
+        lead = int(max_length * LEAD_FRACTION)
+        best = self._best_window(term_ids, doc_terms[hits][keep], hit_starts, max_length - lead)
+
+        # Bytes are at least characters, so this read covers max_length chars
+        byte_start = max(int(hit_starts[best]) - lead, 0)
+        text = read_span(doc_index, byte_start, byte_start + max_length * MAX_UTF8_BYTES + 1)
+        return self._format(text, byte_start > 0, max_length, set(query_tokens))
+
+    def _format(self, text: str, clipped_start: bool, max_length: int,
+                query_terms: set) -> Dict:
+        """Trim the window to whole words, collapse whitespace and mark hits"""
+        starts_mid_word = clipped_start and not text[:1].isspace()
+        text = " ".join(text.split())
+        if starts_mid_word:
+            # Drop the partial word at the cut
+            first_space = text.find(" ", 0, max_length // 2)
+            if first_space != -1:
+                text = text[first_space + 1:]
+        clipped_end = len(text) > max_length
+        if clipped_end:
+            last_space = text.rfind(" ", max_length // 2, max_length + 1)
+            text = text[:last_space] if last_space != -1 else text[:max_length]
+
+        highlights = [(start, end) for token, start, end in self.processor.token_spans(text)
+                      if token in query_terms]
+        if clipped_start:
+            text = "..." + text
+            highlights = [(start + 3, end + 3) for start, end in highlights]
+        if clipped_end:
+            text += "..."
+        return {'text': text, 'highlights': highlights}
+
+    @staticmethod
+    def highlight(snippet: Dict, before: str = "**", after: str = "**") -> str:
+        """Snippet text with markers around the highlighted spans"""
+        parts = []
+        position = 0
+        for start, end in snippet['highlights']:
+            parts.append(snippet['text'][position:start])
+            parts.append(before + snippet['text'][start:end] + after)
+            position = end
+        parts.append(snippet['text'][position:])
+        return "".join(parts)
+
+
+# Usage Example
+if __name__ == "__main__":
+    from src.document_store import DocumentStore
+
+    index = BM25Index.load("data/bm25_index")
+    store = DocumentStore("data/bm25_index")
+    processor = TextProcessor()
+    snippets = SnippetGenerator(index, processor)
+
+    query = processor.tokenize("flight logs Paris")
+    result = snippets.snippet(0, query, store.read_span)
+    if result:
+        print(SnippetGenerator.highlight(result))
+    store.close()
@@ -2,90 +2,504 @@
 BM25-based keyword search implementation
 """
 
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional, Tuple
+import numpy as np
 from loguru import logger
+from src.document_loader import DocumentLoader
 from src.text_processor import TextProcessor
+from src.bm25_index import BM25Index, INDEX_FORMAT_VERSION
+from src.atomic_io import save_array
+from src.chunker import TextChunker, utf8_offsets
+from src.document_store import DocumentStore
+from src.snippets import SnippetGenerator
+
+
+# Compact per-document records (no text) stored next to the index
+DOCUMENTS_FILE = "documents.json"
+
+# Passage ranges of each document, for indexes of passages
+PASSAGES_FILE = "passage_ptr.npy"
+
+# Quoted parts of a query are matched as phrases
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+# With proximity ranking, documents containing every query term score
+# BM25 * (1 + PROXIMITY_WEIGHT * closeness), closeness 1.0 when adjacent
+PROXIMITY_WEIGHT = 0.5
 
 
 class BM25SearchEngine:
     """
     Sparse retrieval using BM25 algorithm
+    
+    With a TextChunker the index holds passages instead of whole
+    documents: each passage is scored on its own (BM25 statistics are
+    per passage) and a document ranks by its best passage, so a match in
+    a short section of a huge file is not diluted by the file's length.
+    Passage indexing is opt-in: the chunker settings are part of the
+    index fingerprint, so every engine opening a passage index must be
+    given the same chunker (the scripts build and open document indexes).
     """
     
-    def __init__(self, documents: List[Dict]):
+    def __init__(self,
+                 documents: List[Dict],
+                 index_dir: Optional[str] = None,
+                 k1: float = 1.5,
+                 b: float = 0.75,
+                 epsilon: float = 0.25,
+                 chunker: Optional[TextChunker] = None,
+                 processor: Optional[TextProcessor] = None):
         """
         Initialize search engine with documents
         
         Args:
             documents: List of document dicts with 'doc_id' and 'text'
+            index_dir: Optional directory for the persistent BM25 index.
+                       A valid index is loaded from here; a missing or
+                       stale one is rebuilt and saved.
+            k1, b, epsilon: BM25Okapi parameters
+            chunker: Index passages of each document instead of whole documents
+            processor: Tokenizer for documents and queries (default
+                       TextProcessor(); its settings are part of the
+                       index fingerprint)
         """
+        self._setup(index_dir, k1, b, epsilon, chunker, processor)
         self.documents = documents
-        self.processor = TextProcessor()
         
-        # Tokenize all documents
-        logger.info("Tokenizing documents for BM25...")
-        self.tokenized_corpus = [
-            self.processor.tokenize(doc['text']) 
-            for doc in documents
-        ]
+        fingerprint = self.compute_fingerprint(documents, self.processor, k1, b, epsilon,
+                                               chunker)
+        self.index_version = fingerprint
+        self.index = self._load_index(fingerprint)
+        
+        if self.index is None:
+            tokenized_corpus = self._tokenize_corpus(doc['text'] for doc in documents)
+            self._build_index(tokenized_corpus, fingerprint)
+    
+    @classmethod
+    def from_loader(cls,
+                    loader: DocumentLoader,
+                    index_dir: Optional[str] = None,
+                    k1: float = 1.5,
+                    b: float = 0.75,
+                    epsilon: float = 0.25,
+                    rebuild: bool = False,
+                    processes: int = 1,
+                    chunker: Optional[TextChunker] = None,
+                    processor: Optional[TextProcessor] = None) -> "BM25SearchEngine":
+        """
+        Create search engine by streaming documents from a loader
+        
+        A valid persisted index is loaded without reading any document.
+        Otherwise documents are tokenized in a single streaming pass; only
+        the index and compact per-document records (no text) stay in
+        memory. With an index_dir the same pass writes a memory-mapped
+        DocumentStore that previews are sliced from; without one, text is
+        re-read from the source files on demand.
+        
+        Args:
+            loader: DocumentLoader for the collection
+            index_dir: Optional directory for the persistent BM25 index
+            k1, b, epsilon: BM25Okapi parameters
+            rebuild: Ignore any persisted index and build from scratch
+            processes: Tokenizer worker processes used when building
+            chunker: Index passages of each document instead of whole documents
+            processor: Tokenizer for documents and queries (default TextProcessor())
+            
+        Returns:
+            BM25SearchEngine instance
+        """
+        engine = cls.__new__(cls)
+        engine._setup(index_dir, k1, b, epsilon, chunker, processor)
+        engine.loader = loader
+        
+        fingerprint = cls._settings_digest(engine.processor, k1, b, epsilon, chunker)
+        fingerprint.update(loader.fingerprint().encode('utf-8'))
+        fingerprint = fingerprint.hexdigest()
+        engine.index_version = fingerprint
+        
+        engine.index = None if rebuild else engine._load_index(fingerprint)
+        if engine.index is not None:
+            engine.documents = engine._load_records()
+            if engine.documents is None or not DocumentStore.exists(index_dir):
+                engine.index = None
+            else:
+                engine.store = DocumentStore(index_dir)
+        
+        if engine.index is None:
+            engine.documents = []
+            writer = DocumentStore.writer(index_dir) if index_dir else None
+            
+            def stream_texts():
+                # With worker processes this runs in the pool's feeder
+                # thread, which consumes documents in order
+                for doc in loader.iter_documents():
+                    engine.documents.append(
+                        {key: value for key, value in doc.items() if key != 'text'}
+                    )
+                    if writer is not None:
+                        writer.add(doc['text'])
+                    yield doc['text']
+            
+            if index_dir:
+                # Invalidate before the store files are overwritten
+                BM25Index.invalidate(index_dir)
+            engine._build_index(engine._tokenize_corpus(stream_texts(), processes), fingerprint)
+            if writer is not None:
+                engine.store = writer.close()
+        
+        return engine
+    
+    def _setup(self, index_dir: Optional[str], k1: float, b: float, epsilon: float,
+               chunker: Optional[TextChunker] = None,
+               processor: Optional[TextProcessor] = None):
+        """Shared attribute initialization"""
+        self.processor = processor if processor is not None else TextProcessor()
+        self.index_dir = index_dir
+        self.loader = None
+        self.store = None
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.chunker = chunker
+        self.passage_ptr = None
+        self.passage_docs = None
+    
+    def _set_passages(self, passage_ptr: np.ndarray):
+        """Passage ranges per document and the document of every passage"""
+        self.passage_ptr = passage_ptr
+        self.passage_docs = np.repeat(np.arange(len(passage_ptr) - 1, dtype=np.int32),
+                                      np.diff(passage_ptr))
+    
+    @property
+    def num_documents(self) -> int:
+        """Number of documents (index units are passages when chunking)"""
+        if self.passage_ptr is not None:
+            return len(self.passage_ptr) - 1
+        return self.index.corpus_size
+    
+    def _tokenize_corpus(self, texts: Iterable[str], processes: int = 1) -> Iterable:
+        """
+        Tokens with byte offsets of each index unit
+        
+        Units are the documents, or with a chunker their passages in
+        document order; passage offsets are shifted to be relative to
+        the document, and the passage ranges are recorded once the
+        result has been consumed.
+        """
+        if self.chunker is None:
+            return self.processor.tokenize_many(texts, processes=processes, with_offsets=True)
+        
+        counts = []
+        byte_starts = []
+        
+        def passages():
+            for text in texts:
+                spans = self.chunker.spans(text)
+                counts.append(len(spans))
+                byte_starts.extend(utf8_offsets(text, [start for start, _ in spans]))
+                for start, end in spans:
+                    yield text[start:end]
+        
+        def shifted(tokenized):
+            for position, (tokens, starts) in enumerate(tokenized):
+                yield tokens, starts + np.int32(byte_starts[position])
+            passage_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=passage_ptr[1:])
+            self._set_passages(passage_ptr)
+        
+        return shifted(self.processor.tokenize_many(passages(), processes=processes,
+                                                    with_offsets=True))
+    
+    def _load_index(self, fingerprint: str) -> Optional[BM25Index]:
+        """Load persisted index if present and current"""
+        if not self.index_dir:
+            return None
+        index = BM25Index.load(self.index_dir, fingerprint)
+        if index is not None and self.chunker is not None:
+            try:
+                self._set_passages(np.load(Path(self.index_dir) / PASSAGES_FILE))
+            except (OSError, ValueError):
+                return None
+            if self.passage_ptr[-1] != index.corpus_size:
+                return None
+        return index
+    
+    def _build_index(self, tokenized_corpus: Iterable, fingerprint: str):
+        """Build index from tokenized documents and persist it if configured"""
+        logger.info("Tokenizing documents and building BM25 index...")
+        self.index = BM25Index.build(tokenized_corpus, k1=self.k1, b=self.b, epsilon=self.epsilon)
+        logger.info(f"BM25 index built for {self.num_documents} documents "
+                    f"({self.index.corpus_size} index units)")
+        
+        if self.index_dir:
+            # Records first: the index metadata written last marks both valid
+            Path(self.index_dir).mkdir(parents=True, exist_ok=True)
+            if self.loader is not None:
+                with open(Path(self.index_dir) / DOCUMENTS_FILE, "w", encoding="utf-8") as f:
+                    json.dump(self.documents, f)
+            if self.passage_ptr is not None:
+                save_array(Path(self.index_dir) / PASSAGES_FILE, self.passage_ptr)
+            self.index.save(self.index_dir, fingerprint)
+    
+    def _load_records(self) -> Optional[List[Dict]]:
+        """Load compact document records saved alongside the index"""
+        try:
+            with open(Path(self.index_dir) / DOCUMENTS_FILE, encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return records if len(records) == self.num_documents else None
+    
+    def get_text(self, doc_index: int) -> str:
+        """Full text of a document, read from disk if not held in memory"""
+        if self.store is not None:
+            return self.store.get_text(doc_index)
+        doc = self.documents[doc_index]
+        if 'text' in doc:
+            return doc['text']
+        return self.loader.load_text(doc['filepath'])
+    
+    def get_preview(self, doc_index: int, max_length: int = 200) -> str:
+        """Preview of a document, sliced from the document store when available"""
+        if self.store is not None:
+            return self.store.preview(doc_index, max_length)
+        return self.processor.extract_preview(self.get_text(doc_index), max_length)
+    
+    def read_span(self, doc_index: int, byte_start: int, byte_end: int) -> str:
+        """Decode a UTF-8 byte range of a document's text"""
+        if self.store is not None:
+            return self.store.read_span(doc_index, byte_start, byte_end)
+        data = self.get_text(doc_index).encode('utf-8', errors='surrogatepass')
+        return data[max(byte_start, 0):max(byte_end, 0)].decode('utf-8', errors='ignore')
+    
+    def get_snippet(self,
+                    doc_index: int,
+                    query_tokens: List[str],
+                    max_length: int = 200) -> Dict:
+        """
+        Passage of a document that best matches the query
+        
+        Args:
+            doc_index: Document ordinal
+            query_tokens: Tokenized query
+            max_length: Maximum length in characters
+            
+        Returns:
+            {'text': ..., 'highlights': [(start, end), ...]}; the plain
+            preview without highlights if no query term can be located
+        """
+        snippet = SnippetGenerator(self.index, self.processor, self.passage_ptr).snippet(
+            doc_index, query_tokens, self.read_span, max_length
+        )
+        if snippet is None:
+            snippet = {'text': self.get_preview(doc_index, max_length), 'highlights': []}
+        return snippet
+    
+    @staticmethod
+    def _settings_digest(processor: TextProcessor, k1: float, b: float, epsilon: float,
+                         chunker: Optional[TextChunker] = None):
+        """Hash object seeded with tokenizer, chunker settings and BM25 parameters"""
+        settings = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'tokenizer': processor.get_config(),
+            'k1': k1,
+            'b': b,
+            'epsilon': epsilon
+        }
+        if chunker is not None:
+            settings['chunker'] = chunker.get_config()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest
+    
+    @classmethod
+    def compute_fingerprint(cls,
+                            documents: List[Dict],
+                            processor: TextProcessor,
+                            k1: float,
+                            b: float,
+                            epsilon: float,
+                            chunker: Optional[TextChunker] = None) -> str:
+        """
+        Hash of corpus contents, tokenizer/chunker settings and BM25 parameters
         
-        # Build BM25 index
-        logger.info("Building BM25 index...")
-        self.bm25 = BM25Okapi(self.tokenized_corpus)
-        logger.info(f"BM25 index built for {len(documents)} documents")
+        Any change to these invalidates a persisted index.
+        """
+        digest = cls._settings_digest(processor, k1, b, epsilon, chunker)
+        for doc in documents:
+            digest.update(doc['doc_id'].encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(doc['text'].encode('utf-8', errors='surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
         
-    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+    def parse_query(self, query: str) -> Tuple[List[str], List[List[str]]]:
+        """
+        Tokenize a query and its quoted phrases
+        
+        Args:
+            query: Search query string, e.g. '"Little St. James" flight'
+            
+        Returns:
+            (tokens, phrases): the tokens of the whole query, phrase words
+            included, and the tokens of each quoted phrase of two or more
+            tokens
+        """
+        phrases = [self.processor.tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+        return self.processor.tokenize(query), [phrase for phrase in phrases if len(phrase) > 1]
+    
+    def rank(self,
+             query_tokens: List[str],
+             phrases: List[List[str]],
+             top_k: int,
+             allowed: Optional[np.ndarray] = None,
+             proximity: bool = False):
+        """
+        Top documents for a parsed query
+        
+        Phrases restrict the ranking to documents containing them; their
+        positions are only checked in documents containing every phrase
+        term. Scores are BM25 over all query tokens. For an index of
+        passages, phrases, proximity and scores apply per passage and a
+        document scores as its best passage.
+        
+        Args:
+            query_tokens: Tokenized query
+            phrases: Tokenized phrases every result must contain
+            top_k: Number of documents to return
+            allowed: Optional boolean mask over document ordinals
+            proximity: Boost documents where the query terms occur close
+                       together (see PROXIMITY_WEIGHT)
+            
+        Returns:
+            (doc ordinals, scores) arrays sorted by descending score
+        """
+        if allowed is not None and self.passage_docs is not None:
+            allowed = allowed[self.passage_docs]
+        if phrases and self.index.positions is None:
+            logger.warning("Index has no token positions, matching phrases as keywords")
+            phrases = []
+        for phrase in phrases:
+            phrase_units, _ = self.index.phrase_docs(phrase, allowed)
+            allowed = np.zeros(self.index.corpus_size, dtype=bool)
+            allowed[phrase_units] = True
+        
+        weight = PROXIMITY_WEIGHT if proximity else 0.0
+        if self.passage_docs is None:
+            return self.index.top_k(query_tokens, top_k, allowed=allowed, proximity_weight=weight)
+        return self._rank_by_best_passage(query_tokens, top_k, allowed, weight)
+    
+    def _rank_by_best_passage(self,
+                              query_tokens: List[str],
+                              top_k: int,
+                              allowed: Optional[np.ndarray],
+                              proximity_weight: float):
+        """
+        Top documents by their best passage score
+        
+        Passages come out of the index best first, so the first top_k
+        distinct documents among them are the answer; the number of
+        passages fetched grows until that many documents are covered or
+        no passage is left.
+        """
+        count = top_k * 4
+        while True:
+            passages, scores = self.index.top_k(query_tokens, count, allowed=allowed,
+                                                proximity_weight=proximity_weight)
+            docs = self.passage_docs[passages]
+            _, first = np.unique(docs, return_index=True)
+            first = np.sort(first)[:top_k]
+            if len(first) >= top_k or len(passages) < count:
+                return docs[first], scores[first]
+            count *= 4
+    
+    def search(self,
+               query: str,
+               top_k: int = 10,
+               allowed: Optional[np.ndarray] = None,
+               proximity: bool = False) -> List[Dict]:
         """
         Search documents using BM25
         
         Args:
-            query: Search query string
+            query: Search query string; quoted parts ("flight log") must
+                   occur as exact phrases
             top_k: Number of results to return
+            allowed: Optional boolean mask over document ordinals
+                     (positions in self.documents) restricting the results
+            proximity: Rank documents where the query terms occur close
+                       together higher
             
         Returns:
-            List of documents with scores, sorted by relevance
+            List of result dicts ('doc_id', 'filename', 'score', 'preview',
+            'highlights'), sorted by relevance; the preview is the passage
+            best matching the query and highlights are character spans of
+            query terms in it; use get_text() for the full document
         """
         
         # Tokenize query
-        query_tokens = self.processor.tokenize(query)
+        query_tokens, phrases = self.parse_query(query)
         
         if not query_tokens:
             logger.warning("Query resulted in no tokens after processing")
             return []
         
-        # Get BM25 scores for all documents
-        scores = self.bm25.get_scores(query_tokens)
+        # Top K documents by BM25 score (MaxScore-pruned partial selection)
+        doc_indices, scores = self.rank(query_tokens, phrases, top_k,
+                                        allowed=allowed, proximity=proximity)
         
-        # Get top K document indices
-        top_indices = scores.argsort()[-top_k:][::-1]
+        results = self.build_results(doc_indices, scores, query_tokens)
+        logger.info(f"Found {len(results)} results for query: '{query}'")
+        return results
+    
+    def build_results(self,
+                      doc_indices: np.ndarray,
+                      scores: np.ndarray,
+                      query_tokens: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Result dicts for ranked document ordinals
         
-        # Build results
+        Args:
+            doc_indices: Document ordinals, best first
+            scores: Score of each ordinal
+            query_tokens: Tokenized query for query-aware snippets; without
+                          it the preview is the start of the document
+            
+        Returns:
+            List of result dicts, skipping non-positive scores
+        """
         results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only include docs with positive scores
-                doc = self.documents[idx].copy()
-                doc['score'] = float(scores[idx])
-                doc['preview'] = self.processor.extract_preview(doc['text'])
-                results.append(doc)
-        
-        logger.info(f"Found {len(results)} results for query: '{query}'")
+        for pos in range(len(doc_indices)):
+            if scores[pos] > 0:  # Only include docs with positive scores
+                doc_index = int(doc_indices[pos])
+                doc = self.documents[doc_index]
+                if query_tokens:
+                    snippet = self.get_snippet(doc_index, query_tokens)
+                else:
+                    snippet = {'text': self.get_preview(doc_index), 'highlights': []}
+                results.append({
+                    'doc_id': doc['doc_id'],
+                    'filename': doc['filename'],
+                    'score': float(scores[pos]),
+                    'preview': snippet['text'],
+                    'highlights': snippet['highlights']
+                })
         return results
 
 
 # Usage Example
 if __name__ == "__main__":
-    from src.document_loader import DocumentLoader
-    
-    # Load documents
+    # Create search engine (streams documents only if the index needs building)
     loader = DocumentLoader("data")
-    documents = loader.load_documents()
-    
-    # Create search engine
-    search_engine = BM25SearchEngine(documents)
+    search_engine = BM25SearchEngine.from_loader(loader, index_dir="data/bm25_index")
     
     # Search
     results = search_engine.search("Maxwell Paris meeting", top_k=10)
+    phrase_results = search_engine.search('"flight log" Maxwell', top_k=10, proximity=True)
     
     # Display results
     for i, result in enumerate(results, 1):
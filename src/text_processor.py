@@ -2,15 +2,70 @@
 Clean and normalize text for search
 """
 
+import hashlib
 import re
-from typing import List
+from multiprocessing import Pool
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+# Common English function words, for optional stopword removal
+ENGLISH_STOPWORDS = frozenset("""
+    a about above after again against all am an and any are as at be because
+    been before being below between both but by can could did do does doing
+    down during each few for from further had has have having he her here hers
+    herself him himself his how if in into is it its itself just me more most
+    my myself no nor not now of off on once only or other our ours ourselves
+    out over own same she should so some such than that the their theirs them
+    themselves then there these they this those through to too under until up
+    very was we were what when where which while who whom why will with would
+    you your yours yourself yourselves
+""".split())
+
+# ASCII bytes matched by \w
+ASCII_WORD_BYTES = np.zeros(256, dtype=bool)
+for _char in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
+    ASCII_WORD_BYTES[ord(_char)] = True
 
 
 class TextProcessor:
     """Preprocess text for indexing and search"""
     
-    def __init__(self, min_token_length: int = 2):
+    # Bump whenever tokenize() output changes for the same settings
+    TOKENIZER_VERSION = 1
+    
+    def __init__(self,
+                 min_token_length: int = 2,
+                 stopwords: Optional[Iterable[str]] = None,
+                 stem: bool = False):
+        """
+        Args:
+            min_token_length: Shorter tokens are dropped
+            stopwords: Lowercase words to drop (e.g. ENGLISH_STOPWORDS);
+                       None keeps every token
+            stem: Fold plural forms onto their singular ("emails" -> "email")
+        """
         self.min_token_length = min_token_length
+        self.stopwords = frozenset(stopwords) if stopwords else frozenset()
+        self.stem = stem
+        # Maximal runs of word characters are exactly the tokens left by
+        # replacing punctuation with spaces and splitting on whitespace
+        self._token_pattern = re.compile(r"\w{%d,}" % max(min_token_length, 1))
+    
+    def get_config(self) -> Dict:
+        """Tokenizer settings that affect index contents"""
+        config = {
+            'version': self.TOKENIZER_VERSION,
+            'min_token_length': self.min_token_length
+        }
+        # Only non-default options are listed, so existing indexes stay valid
+        if self.stopwords:
+            digest = hashlib.blake2b("\n".join(sorted(self.stopwords)).encode('utf-8'),
+                                     digest_size=8)
+            config['stopwords'] = digest.hexdigest()
+        if self.stem:
+            config['stem'] = True
+        return config
         
     def clean_text(self, text: str) -> str:
         """
@@ -38,20 +93,152 @@ class TextProcessor:
         - Lowercase
         - Split on whitespace and punctuation
         - Remove short tokens
+        - Optionally remove stopwords and stem
         """
         
-        # Lowercase
-        text = text.lower()
+        # One regex pass finds the tokens and drops short ones
+        tokens = self._token_pattern.findall(text.lower())
         
-        # Replace punctuation with spaces
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Split and filter
-        tokens = text.split()
-        tokens = [t for t in tokens if len(t) >= self.min_token_length]
+        if self.stopwords:
+            tokens = [t for t in tokens if t not in self.stopwords]
+        if self.stem:
+            tokens = [self.stem_token(t) for t in tokens]
         
         return tokens
     
+    @staticmethod
+    def stem_token(token: str) -> str:
+        """
+        Light plural stemmer (Harman's S-stemmer)
+        
+        "ies" -> "y" and "es"/"s" -> "" with the usual exceptions
+        ("aies", "eies", "oes", "ss", "us").
+        """
+        if len(token) <= 3 or not token.endswith("s"):
+            return token
+        if token.endswith("ies") and not token.endswith(("eies", "aies")):
+            return token[:-3] + "y"
+        if token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+            return token[:-1]
+        if not token.endswith(("us", "ss")):
+            return token[:-1]
+        return token
+    
+    def _char_spans(self, text: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Tokens with start/end character offsets into the original text"""
+        lowered = text.lower()
+        tokens = self._token_pattern.findall(lowered)
+        
+        if lowered.isascii():
+            # Word runs from byte classes, without a Python loop per token
+            is_word = ASCII_WORD_BYTES[np.frombuffer(lowered.encode('ascii'), dtype=np.uint8)]
+            edges = np.diff(is_word.astype(np.int8), prepend=0, append=0)
+            run_starts = np.flatnonzero(edges == 1)
+            run_ends = np.flatnonzero(edges == -1)
+            long_runs = run_ends - run_starts >= self.min_token_length
+            starts, ends = run_starts[long_runs], run_ends[long_runs]
+        else:
+            # Tokens are maximal word runs, so each is found at the first
+            # occurrence after the previous one
+            starts = []
+            position = 0
+            find = lowered.find
+            for token in tokens:
+                position = find(token, position)
+                starts.append(position)
+                position += len(token)
+            starts = np.array(starts, dtype=np.int64)
+            ends = starts + np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        
+        if self.stopwords:
+            keep = np.fromiter((t not in self.stopwords for t in tokens),
+                               dtype=bool, count=len(tokens))
+            tokens = [t for t, kept in zip(tokens, keep) if kept]
+            starts, ends = starts[keep], ends[keep]
+        if self.stem:
+            tokens = [self.stem_token(t) for t in tokens]
+        
+        if len(lowered) != len(text):
+            # A few characters lowercase to several; map positions back
+            boundaries = np.cumsum([len(c.lower()) for c in text])
+            starts = np.searchsorted(boundaries, starts, side="right")
+            ends = np.searchsorted(boundaries, ends - 1, side="right") + 1
+        return tokens, starts, ends
+    
+    def token_spans(self, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Tokens with their character spans in the text
+        
+        Returns:
+            (token, start, end) for each token tokenize() returns, with
+            start/end indexing the original (not lowercased) text
+        """
+        tokens, starts, ends = self._char_spans(text)
+        return list(zip(tokens, starts.tolist(), ends.tolist()))
+    
+    def tokenize_spans(self, text: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Tokens plus the UTF-8 byte offset at which each starts
+        
+        Returns:
+            (tokens, int32 byte offsets into text.encode('utf-8'))
+        """
+        tokens, starts, _ = self._char_spans(text)
+        if not text.isascii():
+            code_points = np.frombuffer(text.encode('utf-32-le', errors='surrogatepass'),
+                                        dtype=np.uint32)
+            byte_lengths = 1 + (code_points >= 0x80).astype(np.int64) \
+                + (code_points >= 0x800) + (code_points >= 0x10000)
+            byte_offsets = np.zeros(len(code_points) + 1, dtype=np.int64)
+            np.cumsum(byte_lengths, out=byte_offsets[1:])
+            starts = byte_offsets[starts]
+        return tokens, starts.astype(np.int32)
+    
+    def tokenize_many(self,
+                      texts: Iterable[str],
+                      processes: int = 1,
+                      chunksize: int = 64,
+                      with_offsets: bool = False) -> Iterator:
+        """
+        Tokenize many documents, in input order
+        
+        Args:
+            texts: Iterable of document texts (consumed lazily)
+            processes: Worker processes; 1 tokenizes in this process
+            chunksize: Documents sent to a worker at a time
+            with_offsets: Yield tokenize_spans() pairs instead of token lists
+            
+        Yields:
+            Token list (or (tokens, byte offsets)) of each document
+        """
+        tokenize = self.tokenize_spans if with_offsets else self.tokenize
+        if processes <= 1:
+            for text in texts:
+                yield tokenize(text)
+            return
+        
+        with Pool(processes) as pool:
+            yield from pool.imap(tokenize, texts, chunksize=chunksize)
+    
+    def tokenize_ids(self, text: str, vocabulary: Dict[str, int]) -> np.ndarray:
+        """
+        Tokenize and intern tokens as integer term ids
+        
+        Args:
+            text: Document text
+            vocabulary: Term -> id mapping; unseen terms are added with
+                        the next free id
+            
+        Returns:
+            int32 array of term ids, in token order
+        """
+        tokens = self.tokenize(text)
+        return np.fromiter(
+            (vocabulary.setdefault(token, len(vocabulary)) for token in tokens),
+            dtype=np.int32,
+            count=len(tokens)
+        )
+    
     def extract_preview(self, text: str, max_length: int = 200) -> str:
         """Extract first N characters as preview"""
         preview = text[:max_length]
@@ -77,4 +264,7 @@ if __name__ == "__main__":
     
     tokens = processor.tokenize(cleaned)
     print("Tokens:", tokens)
+    
+    filtered = TextProcessor(stopwords=ENGLISH_STOPWORDS, stem=True)
+    print("Filtered tokens:", filtered.tokenize(cleaned))
 
@@ -0,0 +1,136 @@
+"""
+Integer-encoded token sequences for the whole corpus
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.atomic_io import save_array
+
+ARRAY_FILES = ["doc_ptr", "doc_tokens"]
+STARTS_FILE = "token_starts.npy"
+
+
+class TokenArrays:
+    """
+    Every document's token sequence as term ids in one flat array
+
+    The tokens of document ``d`` are ``doc_tokens[doc_ptr[d]:doc_ptr[d + 1]]``
+    (int32 term ids in text order), so the corpus costs four bytes per
+    token instead of a Python string list per document. Term ids come
+    from a vocabulary shared with the BM25 index. Optionally the UTF-8
+    byte offset of each token within its document is kept alongside
+    (``token_starts``), which locates query hits in the stored text
+    without re-tokenizing it.
+    """
+
+    def __init__(self,
+                 doc_ptr: np.ndarray,
+                 doc_tokens: np.ndarray,
+                 token_starts: Optional[np.ndarray] = None):
+        """
+        Args:
+            doc_ptr: Token offsets, one more than the number of documents
+            doc_tokens: Term ids of all documents, concatenated
+            token_starts: Byte offset of each token in its document (int32)
+        """
+        self.doc_ptr = doc_ptr
+        self.doc_tokens = doc_tokens
+        self.token_starts = token_starts
+
+    @classmethod
+    def from_id_arrays(cls,
+                       id_arrays: Iterable[np.ndarray],
+                       start_arrays: Optional[List[np.ndarray]] = None) -> "TokenArrays":
+        """Concatenate per-document term-id (and byte offset) arrays"""
+        chunks = list(id_arrays)
+        doc_ptr = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=doc_ptr[1:])
+        doc_tokens = np.concatenate(chunks).astype(np.int32, copy=False) if chunks \
+            else np.zeros(0, dtype=np.int32)
+        token_starts = None
+        if start_arrays is not None:
+            token_starts = np.concatenate(start_arrays).astype(np.int32, copy=False) \
+                if start_arrays else np.zeros(0, dtype=np.int32)
+        return cls(doc_ptr, doc_tokens, token_starts)
+
+    @classmethod
+    def from_tokens(cls,
+                    tokenized_corpus: Iterable[Union[List[str], Tuple[List[str], np.ndarray]]],
+                    vocabulary: Dict[str, int]) -> "TokenArrays":
+        """
+        Intern token lists against a vocabulary
+
+        Args:
+            tokenized_corpus: Iterable with one token list per document, or
+                              one (tokens, byte offsets) pair as returned by
+                              TextProcessor.tokenize_spans
+            vocabulary: Term -> id mapping; unseen terms get the next free
+                        id, so ids follow order of first appearance
+        """
+        id_arrays = []
+        start_arrays = []
+        for tokens in tokenized_corpus:
+            if isinstance(tokens, tuple):
+                tokens, starts = tokens
+                start_arrays.append(starts)
+            id_arrays.append(np.fromiter(
+                (vocabulary.setdefault(token, len(vocabulary)) for token in tokens),
+                dtype=np.int32, count=len(tokens)
+            ))
+        has_starts = bool(start_arrays) and len(start_arrays) == len(id_arrays)
+        return cls.from_id_arrays(id_arrays, start_arrays if has_starts else None)
+
+    def __len__(self) -> int:
+        return len(self.doc_ptr) - 1
+
+    def lengths(self) -> np.ndarray:
+        """Number of tokens of each document"""
+        return np.diff(self.doc_ptr).astype(np.int32)
+
+    def document(self, doc_index: int) -> np.ndarray:
+        """Term ids of one document, in text order"""
+        return self.doc_tokens[self.doc_ptr[doc_index]:self.doc_ptr[doc_index + 1]]
+
+    def starts(self, doc_index: int) -> Optional[np.ndarray]:
+        """Byte offsets of one document's tokens (None if not stored)"""
+        if self.token_starts is None:
+            return None
+        return self.token_starts[self.doc_ptr[doc_index]:self.doc_ptr[doc_index + 1]]
+
+    def doc_ids(self) -> np.ndarray:
+        """Document ordinal of every token"""
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.lengths())
+
+    def save(self, index_dir: str):
+        """Write the arrays to a directory"""
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_FILES:
+            save_array(path / f"{name}.npy", getattr(self, name))
+        if self.token_starts is not None:
+            save_array(path / STARTS_FILE, self.token_starts)
+        else:
+            (path / STARTS_FILE).unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["TokenArrays"]:
+        """Memory-map arrays written by save() (None if missing)"""
+        path = Path(index_dir)
+        try:
+            arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAY_FILES}
+            if (path / STARTS_FILE).exists():
+                arrays['token_starts'] = np.load(path / STARTS_FILE, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return cls(**arrays)
+
+
+# Usage Example
+if __name__ == "__main__":
+    vocabulary = {}
+    tokens = TokenArrays.from_tokens([["flight", "logs", "paris"], ["paris", "flight"]], vocabulary)
+    print(vocabulary)
+    print(tokens.document(1), tokens.lengths())
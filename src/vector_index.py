@@ -0,0 +1,208 @@
+"""
+Memory-mapped embedding matrix with exact and approximate vector search
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from src.atomic_io import commit_file, save_array, temp_path
+
+VECTORS_FILE = "vectors.bin"
+SCALES_FILE = "vector_scales.npy"
+VECTORS_META_FILE = "vectors_meta.json"
+HNSW_FILE = "hnsw.bin"
+
+# float16 halves float32 storage; int8 quarters it (per-row scale)
+VECTOR_DTYPES = ("float16", "int8")
+
+# Rows widened to float32 per matrix product, bounding temporary memory
+SEARCH_BLOCK_ROWS = 16384
+
+
+class VectorIndexWriter:
+    """
+    Append unit-length embeddings to an index in a single streaming pass
+
+    Files are written under temporary names and renamed into place on
+    close(), so processes that have the previous index mapped keep
+    reading it unharmed.
+    """
+
+    def __init__(self, index_dir: str, dtype: str = "float16"):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"dtype must be one of {VECTOR_DTYPES}, got {dtype!r}")
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self._file = open(temp_path(self.index_dir / VECTORS_FILE), "wb")
+        self._scales = []
+        self._count = 0
+        self._dim = None
+
+    def add(self, vectors: np.ndarray):
+        """Append a batch of embeddings (rows, normalized to unit length)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._scales.append(scales.astype(np.float32))
+            vectors = np.rint(vectors / scales[:, None]).astype(np.int8)
+        else:
+            vectors = vectors.astype(np.float16)
+        self._file.write(vectors.tobytes())
+        self._count += len(vectors)
+
+    def close(self) -> "VectorIndex":
+        """Finish writing and open the index for searching"""
+        self._file.close()
+        if self.dtype == "int8":
+            scales = np.concatenate(self._scales) if self._scales else np.zeros(0, np.float32)
+            save_array(self.index_dir / SCALES_FILE, scales)
+        commit_file(self.index_dir / VECTORS_FILE)
+        (self.index_dir / HNSW_FILE).unlink(missing_ok=True)
+        meta = {'dtype': self.dtype, 'dim': self._dim or 0, 'count': self._count}
+        with open(self.index_dir / VECTORS_META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        logger.info(f"Wrote {self._count} vectors ({self.dtype}, dim {self._dim}) "
+                    f"to {self.index_dir}")
+        return VectorIndex(str(self.index_dir))
+
+
+class VectorIndex:
+    """
+    Unit-length embeddings as a read-only memory-mapped matrix
+
+    Row ``i`` is the embedding of index unit ``i``, stored as float16, or
+    as int8 with a float32 scale per row. Exact search is a blocked
+    matrix product with the query (cosine similarity, since rows and
+    query are normalized), over all rows or just a candidate subset. The
+    file is mapped, not read, so processes searching the same index
+    share one copy in the page cache. An optional HNSW graph (hnswlib)
+    answers approximate top-k queries without touching every row.
+    """
+
+    def __init__(self, index_dir: str):
+        path = Path(index_dir)
+        with open(path / VECTORS_META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dtype = meta['dtype']
+        self.dim = meta['dim']
+        self.count = meta['count']
+        self.index_dir = path
+
+        if self.count:
+            self.vectors = np.memmap(path / VECTORS_FILE, dtype=self.dtype, mode="r",
+                                     shape=(self.count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+        self.scales = np.load(path / SCALES_FILE, mmap_mode="r") if self.dtype == "int8" else None
+        self.hnsw = self._load_hnsw() if (path / HNSW_FILE).exists() else None
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """True if a complete vector index is present in the directory"""
+        return (Path(index_dir) / VECTORS_META_FILE).exists()
+
+    @staticmethod
+    def writer(index_dir: str, dtype: str = "float16") -> VectorIndexWriter:
+        """Start writing a new index into the directory"""
+        return VectorIndexWriter(index_dir, dtype)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _rows_float32(self, rows) -> np.ndarray:
+        """Selected rows as float32, scales applied"""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return block
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of the query with every row, or with selected rows
+
+        Args:
+            query: Unit-length query embedding
+            rows: Optional row indices; scores come back in this order
+        """
+        query = np.asarray(query, dtype=np.float32)
+        total = self.count if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, total)
+            selected = slice(start, end) if rows is None else rows[start:end]
+            scores[start:end] = self._rows_float32(selected) @ query
+        return scores
+
+    def approximate_top_k(self, query: np.ndarray, k: int):
+        """
+        Approximate nearest rows from the HNSW graph
+
+        Returns:
+            (row indices, cosine similarities) arrays, best first
+        """
+        if self.hnsw is None:
+            raise ValueError("No HNSW graph in this index; call build_hnsw() first")
+        k = min(k, self.count)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        self.hnsw.set_ef(max(k, 64))
+        labels, distances = self.hnsw.knn_query(np.asarray(query, dtype=np.float32), k=k)
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def build_hnsw(self, m: int = 16, ef_construction: int = 200):
+        """
+        Build and save an HNSW graph over the rows (requires hnswlib)
+
+        Args:
+            m: Graph degree; higher is more accurate and larger
+            ef_construction: Candidate list size while inserting
+        """
+        hnswlib = self._import_hnswlib()
+        graph = hnswlib.Index(space="cosine", dim=self.dim)
+        graph.init_index(max_elements=max(self.count, 1), ef_construction=ef_construction, M=m)
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, self.count)
+            graph.add_items(self._rows_float32(slice(start, end)), np.arange(start, end))
+        graph.save_index(str(self.index_dir / HNSW_FILE))
+        self.hnsw = graph
+        logger.info(f"Built HNSW graph over {self.count} vectors")
+
+    def _load_hnsw(self):
+        """Saved HNSW graph, or None if hnswlib is not installed"""
+        try:
+            hnswlib = self._import_hnswlib()
+        except ImportError:
+            return None
+        graph = hnswlib.Index(space="cosine", dim=self.dim)
+        graph.load_index(str(self.index_dir / HNSW_FILE), max_elements=max(self.count, 1))
+        return graph
+
+    @staticmethod
+    def _import_hnswlib():
+        """The optional hnswlib module"""
+        try:
+            import hnswlib
+        except ImportError:
+            logger.error("hnswlib not installed. Run: pip install hnswlib")
+            raise
+        return hnswlib
+
+
+# Usage Example
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    writer = VectorIndex.writer("data/vector_demo", dtype="int8")
+    writer.add(vectors)
+    index = writer.close()
+    print(np.argsort(-index.scores(vectors[42]))[:5])
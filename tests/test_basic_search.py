@@ -2,9 +2,12 @@
 Unit tests for MVP1 components
 """
 
+import re
+
 import pytest
-from src.text_processor import TextProcessor
+from src.text_processor import TextProcessor, ENGLISH_STOPWORDS
 from src.sparse_search import BM25SearchEngine
+from src.document_loader import DocumentLoader
 
 
 @pytest.fixture
@@ -41,6 +44,37 @@ def test_text_processor():
     assert tokens == ['hello', 'world', '123']
 
 
+@pytest.mark.parametrize("text", [
+    "Maxwell's e-mail (sent 2005-11-30) to J. Epstein: \"Flight\tlogs\"...",
+    "Ünïcödé  straße—résumé_draft  x y z  İstanbul",
+    ""
+])
+def test_tokenize_matches_split_tokenizer(text):
+    """The single-pass tokenizer gives the same tokens as sub-and-split"""
+    for min_length in (1, 2, 3):
+        lowered = re.sub(r'[^\w\s]', ' ', text.lower())
+        expected = [t for t in lowered.split() if len(t) >= min_length]
+        assert TextProcessor(min_length).tokenize(text) == expected
+
+
+def test_tokenize_options_and_batch():
+    """Stopwords, stemming, the batch API and term-id interning"""
+    processor = TextProcessor(stopwords=ENGLISH_STOPWORDS, stem=True)
+    assert processor.tokenize("The flights of the companies and glasses") == \
+        ['flight', 'company', 'glasse']
+    assert processor.get_config() != TextProcessor().get_config()
+    
+    texts = ["Flight logs to Paris", "Emails about flights", "Paris"] * 50
+    serial = list(processor.tokenize_many(texts))
+    assert serial == [processor.tokenize(text) for text in texts]
+    assert list(processor.tokenize_many(texts, processes=2, chunksize=8)) == serial
+    
+    vocabulary = {}
+    ids = TextProcessor().tokenize_ids("flights to Paris, flights", vocabulary)
+    assert vocabulary == {'flights': 0, 'to': 1, 'paris': 2}
+    assert ids.tolist() == [0, 1, 2, 0]
+
+
 def test_bm25_search(sample_documents):
     """Test BM25 search functionality"""
     engine = BM25SearchEngine(sample_documents)
@@ -74,6 +108,45 @@ def test_preview_extraction():
     assert preview.endswith("...")
 
 
+@pytest.fixture
+def mixed_encoding_dir(tmp_path):
+    """Directory of files in the encodings found in the collection"""
+    (tmp_path / "ascii.txt").write_bytes(b"Plain ASCII text")
+    (tmp_path / "utf8.txt").write_bytes("Caf\u00e9 in Paris".encode('utf-8'))
+    (tmp_path / "bom.txt").write_bytes("\ufeffHouse Oversight".encode('utf-8'))
+    (tmp_path / "latin1.txt").write_bytes("Se\u00f1or M\u00fcller".encode('latin-1'))
+    return tmp_path
+
+
+def test_fast_encoding_matches_chardet(mixed_encoding_dir):
+    """Fast-path decoding produces the same text as full chardet detection"""
+    slow = DocumentLoader(str(mixed_encoding_dir), fast_encoding=False).load_documents()
+    fast = DocumentLoader(str(mixed_encoding_dir)).load_documents()
+    
+    assert [d['text'] for d in fast] == [d['text'] for d in slow]
+    assert not any(d['text'].startswith('\ufeff') for d in fast)
+
+
+def test_parallel_loading_matches_serial(mixed_encoding_dir):
+    """Thread pool loading returns the same documents in the same order"""
+    serial = DocumentLoader(str(mixed_encoding_dir)).load_documents()
+    loader = DocumentLoader(str(mixed_encoding_dir), workers=4)
+    parallel = loader.load_documents()
+    
+    assert parallel == serial
+    assert loader.last_load_stats['documents'] == len(serial)
+
+
+def test_doc_ids_stable_when_files_added(mixed_encoding_dir):
+    """Content-derived doc ids do not shift when the collection grows"""
+    before = {d['filename']: d['doc_id'] for d in DocumentLoader(str(mixed_encoding_dir)).load_documents()}
+    (mixed_encoding_dir / "aaa_new.txt").write_bytes(b"Newly released file")
+    after = {d['filename']: d['doc_id'] for d in DocumentLoader(str(mixed_encoding_dir)).load_documents()}
+    
+    assert all(after[name] == doc_id for name, doc_id in before.items())
+    assert len(set(after.values())) == len(after)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
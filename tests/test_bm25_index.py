@@ -0,0 +1,226 @@
+"""
+Unit tests for the persistent BM25 index
+"""
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from src.bm25_index import BM25Index
+from src.document_loader import DocumentLoader
+from src.sparse_search import BM25SearchEngine
+from src.text_processor import ENGLISH_STOPWORDS, TextProcessor
+from src.token_arrays import TokenArrays
+
+
+@pytest.fixture
+def sample_documents():
+    """Create sample documents for testing"""
+    return [
+        {
+            'doc_id': 'doc_000001',
+            'filename': 'doc1.txt',
+            'text': 'Jeffrey Epstein met with Maxwell in Paris.'
+        },
+        {
+            'doc_id': 'doc_000002',
+            'filename': 'doc2.txt',
+            'text': 'Flight logs show trips to Paris and London.'
+        },
+        {
+            'doc_id': 'doc_000003',
+            'filename': 'doc3.txt',
+            'text': 'Maxwell sent emails about financial transactions.'
+        },
+        {
+            'doc_id': 'doc_000004',
+            'filename': 'doc4.txt',
+            'text': 'Maxwell Maxwell Paris flight to New York with Epstein.'
+        }
+    ]
+
+
+def test_scores_match_bm25okapi(sample_documents):
+    """Index scores must be identical to rank_bm25"""
+    processor = TextProcessor()
+    corpus = [processor.tokenize(doc['text']) for doc in sample_documents]
+
+    reference = BM25Okapi(corpus)
+    index = BM25Index.build(corpus)
+
+    for query in ["maxwell paris", "epstein", "flight flight london", "unknown"]:
+        tokens = processor.tokenize(query)
+        assert np.array_equal(index.get_scores(tokens), reference.get_scores(tokens))
+
+
+def test_sparse_scoring_touches_only_postings(sample_documents):
+    """Sparse scorer returns only matching documents with BM25Okapi scores"""
+    processor = TextProcessor()
+    corpus = [processor.tokenize(doc['text']) for doc in sample_documents]
+    reference = BM25Okapi(corpus)
+    index = BM25Index.build(corpus)
+
+    tokens = processor.tokenize("London emails emails")
+    docs, scores = index.score(tokens)
+
+    assert docs.tolist() == [1, 2]
+    assert np.array_equal(scores, reference.get_scores(tokens)[docs])
+
+    empty_docs, empty_scores = index.score(["unknown"])
+    assert len(empty_docs) == 0 and len(empty_scores) == 0
+
+
+def test_top_k_matches_exhaustive_ranking(monkeypatch):
+    """MaxScore pruning returns the same top k as scoring every document"""
+    import random
+    import src.bm25_index as bm25_index
+    monkeypatch.setattr(bm25_index, "MAXSCORE_MIN_POSTINGS", 0)
+
+    rng = random.Random(7)
+    words = [f"w{i}" for i in range(200)]
+    corpus = [
+        rng.choices(words, weights=[1 / (i + 1) for i in range(200)], k=rng.randint(5, 60))
+        for _ in range(400)
+    ]
+    index = BM25Index.build(corpus)
+
+    for _ in range(50):
+        query = rng.sample(words[:40], rng.randint(2, 4))
+        for k in (1, 5, 50):
+            docs, scores = index.score(query)
+            order = np.lexsort((docs, -scores))[:k]
+            top_docs, top_scores = index.top_k(query, k)
+            assert np.array_equal(top_docs, docs[order])
+            assert np.array_equal(top_scores, scores[order])
+
+
+def test_save_and_load(sample_documents, tmp_path):
+    """Saved index loads back with the same scores"""
+    processor = TextProcessor()
+    corpus = [processor.tokenize(doc['text']) for doc in sample_documents]
+    index = BM25Index.build(corpus)
+    index.save(str(tmp_path), fingerprint="abc")
+
+    loaded = BM25Index.load(str(tmp_path), fingerprint="abc")
+    assert loaded is not None
+    assert loaded.vocabulary == index.vocabulary
+    tokens = ["maxwell", "paris"]
+    assert np.array_equal(loaded.get_scores(tokens), index.get_scores(tokens))
+
+    # Fingerprint mismatch marks the index stale
+    assert BM25Index.load(str(tmp_path), fingerprint="other") is None
+
+
+def test_save_replaces_files_of_mapped_index(sample_documents, tmp_path):
+    """Saving over a loaded index leaves the reader's mapped arrays intact"""
+    processor = TextProcessor()
+    corpus = [processor.tokenize(doc['text']) for doc in sample_documents]
+    BM25Index.build(corpus).save(str(tmp_path), fingerprint="old")
+    reader = BM25Index.load(str(tmp_path), fingerprint="old")
+    post_docs = np.array(reader.post_docs)
+    doc_tokens = np.array(reader.tokens.doc_tokens)
+    tokens = ["maxwell", "paris"]
+    scores = reader.get_scores(tokens)
+
+    BM25Index.build(corpus[:1]).save(str(tmp_path), fingerprint="new")
+
+    assert np.array_equal(reader.post_docs, post_docs)
+    assert np.array_equal(reader.tokens.doc_tokens, doc_tokens)
+    assert np.array_equal(reader.get_scores(tokens), scores)
+    assert BM25Index.load(str(tmp_path), fingerprint="new").corpus_size == 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_token_arrays_encode_corpus(sample_documents, tmp_path):
+    """The index keeps the corpus as int32 term ids and persists it"""
+    processor = TextProcessor()
+    corpus = [processor.tokenize(doc['text']) for doc in sample_documents]
+    index = BM25Index.build(corpus)
+
+    terms = {term_id: term for term, term_id in index.vocabulary.items()}
+    assert index.tokens.doc_tokens.dtype == np.int32
+    for doc_index, tokens in enumerate(corpus):
+        assert [terms[t] for t in index.tokens.document(doc_index)] == tokens
+    assert np.array_equal(index.tokens.lengths(), index.doc_len)
+
+    # Building from pre-encoded arrays gives the same postings
+    vocabulary = {}
+    encoded = TokenArrays.from_id_arrays(
+        processor.tokenize_ids(doc['text'], vocabulary) for doc in sample_documents
+    )
+    rebuilt = BM25Index.build_from_arrays(encoded, vocabulary)
+    assert rebuilt.vocabulary == index.vocabulary
+    for name in ("term_ptr", "post_docs", "post_tfs", "idf"):
+        assert np.array_equal(getattr(rebuilt, name), getattr(index, name))
+
+    index.save(str(tmp_path), fingerprint="abc")
+    loaded = BM25Index.load(str(tmp_path), fingerprint="abc")
+    assert np.array_equal(loaded.tokens.doc_tokens, index.tokens.doc_tokens)
+    assert np.array_equal(loaded.tokens.doc_ptr, index.tokens.doc_ptr)
+
+
+def test_engine_invalidates_stale_index(sample_documents, tmp_path):
+    """Engine rebuilds the index when the corpus changes"""
+    index_dir = str(tmp_path / "bm25")
+    BM25SearchEngine(sample_documents, index_dir=index_dir)
+
+    engine = BM25SearchEngine(sample_documents, index_dir=index_dir)
+    assert engine.search("Maxwell Paris", top_k=1)[0]['filename'] == 'doc4.txt'
+
+    changed = sample_documents[:3]
+    engine = BM25SearchEngine(changed, index_dir=index_dir)
+    assert engine.index.corpus_size == 3
+
+
+def test_streaming_engine_matches_in_memory(sample_documents, tmp_path):
+    """from_loader builds the same index without keeping document text"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for doc in sample_documents:
+        (data_dir / doc['filename']).write_text(doc['text'], encoding='utf-8')
+    
+    loader = DocumentLoader(str(data_dir))
+    index_dir = str(tmp_path / "bm25")
+    engine = BM25SearchEngine.from_loader(loader, index_dir=index_dir)
+    
+    assert all('text' not in doc for doc in engine.documents)
+    reference = BM25SearchEngine(loader.load_documents())
+    tokens = ["maxwell", "paris"]
+    assert np.array_equal(engine.index.get_scores(tokens), reference.index.get_scores(tokens))
+    
+    # Reloaded engine reads no documents at startup; previews come from disk
+    reloaded = BM25SearchEngine.from_loader(loader, index_dir=index_dir)
+    assert reloaded.documents == engine.documents
+    results = reloaded.search("Maxwell Paris", top_k=1)
+    assert results[0]['preview'] == reference.search("Maxwell Paris", top_k=1)[0]['preview']
+    
+    # Touching the collection invalidates the index
+    (data_dir / "doc5.txt").write_text("Court records from London.", encoding='utf-8')
+    rebuilt = BM25SearchEngine.from_loader(loader, index_dir=index_dir)
+    assert rebuilt.index.corpus_size == len(sample_documents) + 1
+
+
+def test_engine_uses_given_processor(sample_documents, tmp_path):
+    """Documents and queries go through the given tokenizer, whose settings key the index"""
+    index_dir = str(tmp_path / "bm25")
+    plain = BM25SearchEngine(sample_documents, index_dir=index_dir)
+    assert plain.search("email", top_k=5) == []
+
+    processor = TextProcessor(stopwords=ENGLISH_STOPWORDS, stem=True)
+    stemmed = BM25SearchEngine(sample_documents, index_dir=index_dir, processor=processor)
+    assert stemmed.index_version != plain.index_version
+    assert 'with' not in stemmed.index.vocabulary
+    assert [r['filename'] for r in stemmed.search("an email", top_k=5)] == ['doc3.txt']
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for doc in sample_documents:
+        (data_dir / doc['filename']).write_text(doc['text'], encoding='utf-8')
+    streamed = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)),
+                                            index_dir=str(tmp_path / "streamed"),
+                                            processor=processor)
+    assert streamed.processor is processor
+    assert set(streamed.index.vocabulary) == set(stemmed.index.vocabulary)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
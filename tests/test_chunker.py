@@ -0,0 +1,114 @@
+"""
+Unit tests for passage chunking and passage-level BM25 search
+"""
+
+import random
+
+import pytest
+from src.chunker import TextChunker, utf8_offsets
+from src.document_loader import DocumentLoader
+from src.sparse_search import BM25SearchEngine
+
+
+@pytest.fixture
+def documents():
+    """A long document with one relevant section, and short ones"""
+    rng = random.Random(2)
+    vocabulary = [f"word{i}" for i in range(3000)]
+    long_text = (" ".join(rng.choices(vocabulary, k=2000))
+                 + "\fThe flight log lists Maxwell on the Paris trip.\f"
+                 + " ".join(rng.choices(vocabulary, k=2000)))
+    documents = [{'doc_id': 'doc_long', 'filename': 'long.txt', 'text': long_text}]
+    for i in range(20):
+        words = rng.choices(vocabulary, k=60)
+        if i < 3:
+            words[30:30] = ["Maxwell", "flight"]
+        documents.append({'doc_id': f'doc_{i:02d}', 'filename': f'doc_{i:02d}.txt',
+                          'text': "Ünïcödé " + " ".join(words)})
+    return documents
+
+
+def test_spans_cover_text_with_bounded_overlap():
+    """Passages fit the window, cover the text and overlap at word boundaries"""
+    rng = random.Random(1)
+    words = [rng.choice(["flight", "log", "Maxwell", "\n", "\n\n", "\f"]) for _ in range(3000)]
+    text = " ".join(words)
+    chunker = TextChunker(window=300, overlap=40)
+    spans = chunker.spans(text)
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert end - start <= 300
+        assert end - 40 <= next_start <= end
+        if next_start < end:
+            assert text[next_start - 1] == " "
+        if text[end - 1] == "\f":
+            # No overlap across a page break
+            assert next_start == end
+    assert chunker.spans("") == []
+    assert chunker.spans("short") == [(0, 5)]
+
+
+def test_page_breaks_end_passages():
+    """A passage ends at a page break rather than at the last space"""
+    text = "a" * 100 + " " + "b" * 20 + "\f" + "c " * 200
+    spans = TextChunker(window=200, overlap=20).spans(text)
+    assert spans[0] == (0, 122)
+    assert spans[1][0] == 122
+
+    with pytest.raises(ValueError):
+        TextChunker(window=100, overlap=60)
+
+
+def test_utf8_offsets():
+    """Byte offsets of character positions"""
+    text = "İstanbul — café résumé"
+    positions = [0, 3, 10, 15]
+    assert utf8_offsets(text, positions) == [len(text[:p].encode('utf-8')) for p in positions]
+
+
+def test_passage_search_ranks_by_best_passage(documents):
+    """A relevant section of a long document is not diluted by its length"""
+    whole = BM25SearchEngine(documents)
+    passages = BM25SearchEngine(documents, chunker=TextChunker(window=1000, overlap=100))
+    assert passages.index.corpus_size > passages.num_documents == len(documents)
+
+    query = "Maxwell flight Paris"
+    assert whole.search(query, top_k=1)[0]['doc_id'] != 'doc_long'
+    best = passages.search(query, top_k=4)
+    assert best[0]['doc_id'] == 'doc_long'
+    assert "The flight log lists Maxwell on the Paris trip." in best[0]['preview']
+    assert [r['doc_id'] for r in best[1:]] == ['doc_00', 'doc_01', 'doc_02']
+
+    assert [r['doc_id'] for r in passages.search('"flight log" Maxwell')] == ['doc_long']
+
+
+def test_passage_index_persisted(documents, tmp_path):
+    """Streamed, reloaded and in-memory passage engines agree"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for doc in documents:
+        (data_dir / doc['filename']).write_text(doc['text'], encoding='utf-8')
+    chunker = TextChunker(window=1000, overlap=100)
+    index_dir = str(tmp_path / "bm25")
+
+    streamed = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)), index_dir=index_dir,
+                                            chunker=chunker)
+    loaded = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)), index_dir=index_dir,
+                                          chunker=chunker)
+    in_memory = BM25SearchEngine(documents, chunker=chunker)
+
+    assert loaded.passage_ptr.tolist() == streamed.passage_ptr.tolist()
+    assert not list((tmp_path / "bm25").glob("*.tmp"))
+    query = "maxwell paris word7"
+    expected = {r['filename']: r['preview'] for r in in_memory.search(query)}
+    for engine in (streamed, loaded):
+        assert {r['filename']: r['preview'] for r in engine.search(query)} == expected
+
+    # A different chunker invalidates the persisted passages
+    whole = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)), index_dir=index_dir)
+    assert whole.passage_ptr is None and whole.index.corpus_size == len(documents)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
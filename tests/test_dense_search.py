@@ -0,0 +1,154 @@
+"""
+Unit tests for the vector index and dense passage retrieval
+"""
+
+import zlib
+
+import numpy as np
+import pytest
+from src.chunker import TextChunker
+from src.dense_search import DenseSearchEngine
+from src.sparse_search import BM25SearchEngine
+from src.vector_index import VectorIndex
+
+DIM = 512
+
+
+class HashingEncoder:
+    """Bag-of-words embeddings from hashed lowercase words (counts calls)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode('utf-8')) % DIM] += 1.0
+        return vectors
+
+
+@pytest.fixture
+def documents():
+    """Documents about distinct topics, one of them long"""
+    topics = [
+        "flight log passengers island trip",
+        "bank account transfer payment wire",
+        "court deposition witness testimony lawyer",
+        "island villa staff house visitors",
+    ]
+    documents = []
+    for i in range(12):
+        text = f"{topics[i % 4]} " * 5
+        documents.append({'doc_id': f'doc_{i:02d}', 'filename': f'doc_{i:02d}.txt',
+                          'text': f"Dokument №{i}. {text}"})
+    documents[0]['text'] = ("bank payment " * 300) + "\n\n" + f"{topics[0]} " * 4
+    return documents
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 2e-3), ("int8", 2e-2)])
+def test_vector_index_matches_float32(tmp_path, dtype, tolerance):
+    """Compressed storage keeps cosine scores close to float32"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    writer = VectorIndex.writer(str(tmp_path), dtype)
+    writer.add(vectors[:300])
+    writer.add(vectors[300:])
+    index = writer.close()
+    assert len(index) == 1000 and VectorIndex.exists(str(tmp_path))
+
+    query = vectors[42]
+    exact = vectors @ query
+    assert np.abs(index.scores(query) - exact).max() < tolerance
+    assert np.argsort(-index.scores(query))[0] == 42
+    rows = np.array([900, 42, 7])
+    assert np.allclose(index.scores(query, rows), exact[rows], atol=tolerance)
+
+    reopened = VectorIndex(str(tmp_path))
+    assert np.array_equal(reopened.scores(query), index.scores(query))
+    with pytest.raises(ValueError):
+        reopened.approximate_top_k(query, 5)
+    with pytest.raises(ValueError):
+        VectorIndex.writer(str(tmp_path), "float64")
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_rewrite_keeps_mapped_index_valid(tmp_path, dtype):
+    """Writing a new index leaves one already mapped by a reader intact"""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(500, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    writer = VectorIndex.writer(str(tmp_path), dtype)
+    writer.add(vectors)
+    reader = writer.close()
+    scores = reader.scores(vectors[7])
+
+    writer = VectorIndex.writer(str(tmp_path), dtype)
+    writer.add(vectors[:10] * -1)
+    rewritten = writer.close()
+
+    assert np.array_equal(reader.scores(vectors[7]), scores)
+    assert len(rewritten) == 10 and rewritten.scores(vectors[7])[7] < 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_dense_search_best_passage(documents, tmp_path, dtype):
+    """Documents rank by their best passage, built once and reloaded"""
+    bm25 = BM25SearchEngine(documents)
+    encoder = HashingEncoder()
+    chunker = TextChunker(window=200, overlap=20)
+    engine = DenseSearchEngine(bm25, str(tmp_path), encoder=encoder, chunker=chunker,
+                               dtype=dtype, batch_size=8)
+    assert len(engine.vectors) > len(documents)
+    assert engine.passage_ptr[-1] == len(engine.vectors)
+
+    # doc_00 is mostly about payments, but one passage matches the query
+    results = engine.search("island flight passengers", top_k=4)
+    top = {r['doc_id']: r for r in results[:3]}
+    assert set(top) == {'doc_00', 'doc_04', 'doc_08'}
+    assert "flight log passengers" in top['doc_00']['preview']
+    assert top['doc_00']['highlights']
+
+    # Brute force over every passage agrees
+    query = engine.encode_query("island flight passengers")
+    brute = {}
+    for doc_index, doc in enumerate(documents):
+        passages = engine.encode(chunker.chunks(doc['text']))
+        brute[doc['doc_id']] = float((passages @ query).max())
+    for result in results:
+        assert result['score'] == pytest.approx(brute[result['doc_id']], abs=2e-2)
+
+    # Reloading maps the stored vectors instead of re-encoding the corpus
+    encoder.calls = 0
+    reloaded = DenseSearchEngine(bm25, str(tmp_path), encoder=encoder, chunker=chunker,
+                                 dtype=dtype)
+    assert [r['doc_id'] for r in reloaded.search("island flight passengers", top_k=4)] == \
+        [r['doc_id'] for r in results]
+    assert encoder.calls == 1
+
+
+def test_dense_filter_and_rerank(documents, tmp_path):
+    """The allowed mask restricts retrieval; rerank re-orders BM25 candidates"""
+    bm25 = BM25SearchEngine(documents)
+    engine = DenseSearchEngine(bm25, str(tmp_path), encoder=HashingEncoder(),
+                               chunker=TextChunker(window=200, overlap=20))
+
+    allowed = np.zeros(len(documents), dtype=bool)
+    allowed[[1, 2, 3]] = True
+    results = engine.search("court witness testimony", top_k=5, allowed=allowed)
+    assert results[0]['doc_id'] == 'doc_02'
+    assert {r['doc_id'] for r in results} == {'doc_01', 'doc_02', 'doc_03'}
+
+    candidates = bm25.search("villa bank", top_k=10)
+    reranked = engine.rerank("island villa visitors", candidates, top_k=3)
+    assert {r['doc_id'] for r in reranked} == {'doc_03', 'doc_07', 'doc_11'}
+    assert all('bm25_score' in r for r in reranked)
+    assert reranked[0]['score'] >= reranked[1]['score'] >= reranked[2]['score']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,68 @@
+"""
+Unit tests for the memory-mapped document store
+"""
+
+import pytest
+from src.document_store import DocumentStore
+from src.text_processor import TextProcessor
+
+
+@pytest.fixture
+def texts():
+    """Texts of varying length and character width"""
+    return [
+        "Jeffrey Epstein met with Maxwell in Paris.",
+        "",
+        "Café — “quoted” " * 40,
+        "A" * 300
+    ]
+
+
+def test_store_roundtrip(texts, tmp_path):
+    """Stored texts are returned unchanged"""
+    writer = DocumentStore.writer(str(tmp_path))
+    for text in texts:
+        writer.add(text)
+    store = writer.close()
+
+    assert DocumentStore.exists(str(tmp_path))
+    assert len(store) == len(texts)
+    assert [store.get_text(i) for i in range(len(texts))] == texts
+    store.close()
+
+
+def test_rewrite_keeps_open_store_valid(texts, tmp_path):
+    """Writing a new store leaves one already open (mapped) readable"""
+    writer = DocumentStore.writer(str(tmp_path))
+    for text in texts:
+        writer.add(text)
+    store = writer.close()
+
+    writer = DocumentStore.writer(str(tmp_path))
+    writer.add("short")
+    rewritten = writer.close()
+
+    assert [store.get_text(i) for i in range(len(texts))] == texts
+    assert rewritten.get_text(0) == "short" and len(rewritten) == 1
+    assert not list(tmp_path.glob("*.tmp"))
+    store.close()
+    rewritten.close()
+
+
+def test_preview_matches_text_processor(texts, tmp_path):
+    """Previews sliced from the mmap equal extract_preview on the full text"""
+    writer = DocumentStore.writer(str(tmp_path))
+    for text in texts:
+        writer.add(text)
+    writer.close()
+
+    store = DocumentStore(str(tmp_path))
+    processor = TextProcessor()
+    for i, text in enumerate(texts):
+        for max_length in (10, 200):
+            assert store.preview(i, max_length) == processor.extract_preview(text, max_length)
+    store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,177 @@
+"""
+Unit tests for filter strategies of the enhanced search engine
+"""
+
+import random
+
+import pytest
+from src.enhanced_search import BOOST_WEIGHTS, EnhancedSearchEngine
+from src.metadata_store import MetadataStore
+from src.sparse_search import BM25SearchEngine
+
+PEOPLE = ['Ghislaine Maxwell', 'Jeffrey Epstein', 'Bill Clinton']
+LOCATIONS = ['Paris', 'London', 'New York']
+
+
+@pytest.fixture(params=[True, False], ids=['facets', 'sql'])
+def engine(request, tmp_path):
+    """Engine over a random corpus where one document in three mentions 'flight'"""
+    rng = random.Random(11)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    documents = []
+    metadata = []
+    for i in range(90):
+        words = rng.sample(vocabulary, 40)
+        if i % 3 == 0:
+            words += ['flight'] * rng.randint(1, 4)
+        documents.append({'doc_id': f'doc_{i:03d}', 'filename': f'doc_{i:03d}.txt',
+                          'text': ' '.join(words)})
+        metadata.append({'doc_id': f'doc_{i:03d}',
+                         'people': rng.sample(PEOPLE, rng.randint(0, 2)),
+                         'organizations': [],
+                         'locations': rng.sample(LOCATIONS, rng.randint(0, 1)),
+                         'dates': [], 'emails': [], 'word_count': len(words)})
+
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.store_many(metadata)
+    engine = EnhancedSearchEngine(BM25SearchEngine(documents), store,
+                                  use_facet_index=request.param, cache_size=0)
+    engine.metadata = {entry['doc_id']: entry for entry in metadata}
+    yield engine
+    store.close()
+
+
+def matches(entry, people, locations):
+    """Per filter type match, as (people, locations)"""
+    return (bool(set(entry['people']) & set(people)),
+            bool(set(entry['locations']) & set(locations)))
+
+
+def test_strict_and_loose(engine):
+    """Strict requires every filter type, loose any of them"""
+    people, locations = ['Ghislaine Maxwell'], ['Paris']
+    strict = engine.search("flight", top_k=50, filter_people=people,
+                           filter_locations=locations, filter_strategy="strict")
+    loose = engine.search("flight", top_k=50, filter_people=people,
+                          filter_locations=locations, filter_strategy="loose")
+
+    assert strict and all(all(matches(engine.metadata[r['doc_id']], people, locations))
+                          for r in strict)
+    assert all(any(matches(engine.metadata[r['doc_id']], people, locations))
+               for r in loose)
+    assert {r['doc_id'] for r in strict} < {r['doc_id'] for r in loose}
+
+
+def test_boost_keeps_and_reranks_candidates(engine):
+    """Boost keeps all BM25 candidates and applies the weighted match fraction"""
+    people, locations = ['Ghislaine Maxwell', 'Bill Clinton'], ['London']
+    plain = engine.search("flight", top_k=50)
+    boosted = engine.search("flight", top_k=50, filter_people=people,
+                            filter_locations=locations, filter_strategy="boost")
+
+    assert {r['doc_id'] for r in boosted} == {r['doc_id'] for r in plain}
+    for result in boosted:
+        entry = engine.metadata[result['doc_id']]
+        expected = (BOOST_WEIGHTS['people'] * len(set(entry['people']) & set(people)) / 2
+                    + BOOST_WEIGHTS['locations'] * ('London' in entry['locations']))
+        assert result['metadata_boost'] == pytest.approx(expected)
+        assert result['score'] == pytest.approx(result['bm25_score'] * (1 + expected))
+    scores = [r['score'] for r in boosted]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_adaptive_relaxes_until_top_k(engine):
+    """Adaptive uses strict filtering when it suffices, then loosens"""
+    people, locations = ['Jeffrey Epstein'], ['New York']
+    strict = engine.search("flight", top_k=50, filter_people=people,
+                           filter_locations=locations, filter_strategy="strict")
+
+    engine.search("flight", top_k=len(strict), filter_people=people,
+                  filter_locations=locations, filter_strategy="adaptive")
+    assert engine.last_plan['filter_strategy'] == 'strict'
+
+    engine.search("flight", top_k=len(strict) + 1, filter_people=people,
+                  filter_locations=locations, filter_strategy="adaptive")
+    assert engine.last_plan['filter_strategy'] == 'loose'
+
+    results = engine.search("flight", top_k=30, filter_people=people,
+                            filter_locations=locations, filter_strategy="adaptive")
+    assert engine.last_plan['filter_strategy'] == 'boost'
+    assert len(results) == 30
+
+
+def add_person(engine, name, doc_ids):
+    """Store name as one more person of each document"""
+    for doc_id in doc_ids:
+        engine.metadata[doc_id]['people'] = engine.metadata[doc_id]['people'] + [name]
+    engine.metadata_store.store_many([engine.metadata[doc_id] for doc_id in doc_ids])
+
+
+def filter_first(engine, *args, **kwargs):
+    """The same search with the planner forced to filter first"""
+    choose_strategy = engine._choose_strategy
+    engine._choose_strategy = lambda *_: 'filter_first'
+    try:
+        return engine.search(*args, **kwargs)
+    finally:
+        engine._choose_strategy = choose_strategy
+
+
+def test_planner_filters_first_when_selective(engine):
+    """A filter few documents pass is evaluated before BM25"""
+    add_person(engine, 'Larry Visoski', ['doc_003', 'doc_004', 'doc_006'])
+    results = engine.search("flight", top_k=5, filter_people=['Larry Visoski'])
+
+    assert engine.last_plan['strategy'] == 'filter_first'
+    assert engine.last_plan['estimated_docs'] == 3
+    assert not engine.last_plan['fallback']
+    assert [r['doc_id'] for r in results] == ['doc_003', 'doc_006']
+
+
+def test_planner_post_filters_when_broad(engine):
+    """A filter most documents pass is applied to the BM25 candidates"""
+    people = list(PEOPLE)
+    results = engine.search("flight", top_k=5, filter_people=people, filter_strategy="loose")
+
+    assert engine.last_plan['strategy'] == 'post_filter'
+    assert not engine.last_plan['fallback']
+    passing = sum(bool(entry['people']) for entry in engine.metadata.values())
+    if engine.facet_index is not None:
+        # The facet mask counts the passing documents exactly
+        assert engine.last_plan['estimated_docs'] == passing
+    else:
+        assert engine.last_plan['estimated_docs'] >= passing
+
+    expected = filter_first(engine, "flight", top_k=5, filter_people=people,
+                            filter_strategy="loose")
+    assert [(r['doc_id'], r['score']) for r in results] == \
+        [(r['doc_id'], r['score']) for r in expected]
+
+
+def test_planner_falls_back_when_candidates_filtered_out(engine):
+    """Post-filtering that keeps too few candidates reruns as filter-first"""
+    plain = engine.search("flight", top_k=50)
+    top = {r['doc_id'] for r in plain[:10]}
+    add_person(engine, 'Larry Visoski', sorted(set(engine.metadata) - top))
+    results = engine.search("flight", top_k=3, filter_people=['Larry Visoski'],
+                            bm25_candidates=10)
+
+    assert engine.last_plan['strategy'] == 'post_filter'
+    assert engine.last_plan['fallback']
+    assert [r['doc_id'] for r in results] == [r['doc_id'] for r in plain[10:13]]
+
+    expected = filter_first(engine, "flight", top_k=3, filter_people=['Larry Visoski'],
+                            bm25_candidates=10)
+    assert not engine.last_plan['fallback']
+    assert [(r['doc_id'], r['score']) for r in results] == \
+        [(r['doc_id'], r['score']) for r in expected]
+
+
+def test_unknown_strategy(engine):
+    """Invalid strategies are rejected"""
+    with pytest.raises(ValueError):
+        engine.search("flight", filter_people=['Paris'], filter_strategy="fuzzy")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
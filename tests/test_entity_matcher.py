@@ -0,0 +1,109 @@
+"""
+Unit tests for partial and fuzzy entity lookup
+"""
+
+import random
+import string
+from difflib import SequenceMatcher
+
+import pytest
+from src import entity_matcher
+from src.entity_matcher import EntityMatcher, name_tokens
+from src.metadata_store import MetadataStore
+
+
+@pytest.fixture
+def matcher():
+    """Matcher over a few people, locations and organizations"""
+    return EntityMatcher({
+        'people': ['Ghislaine Maxwell', 'G. Maxwell', 'Robert Maxwell',
+                   'Jeffrey Epstein', 'Mr. Epstein', 'Bill Clinton'],
+        'locations': ['New York', 'Paris', 'Palm Beach'],
+        'organizations': ['Clinton Foundation', 'The Clinton Foundation', 'Maxwell Group'],
+        'dates': ['2005-11-30']
+    })
+
+
+def test_name_tokens():
+    """Case, punctuation, initials and titles are dropped"""
+    assert name_tokens("G. Maxwell") == ['maxwell']
+    assert name_tokens("Mr.  Epstein") == ['epstein']
+    assert name_tokens("The Clinton Foundation") == ['clinton', 'foundation']
+
+
+def test_partial_expansion(matcher):
+    """A name matches entities whose name contains it, and vice versa"""
+    assert matcher.expand('people', "Maxwell") == \
+        ['G. Maxwell', 'Ghislaine Maxwell', 'Robert Maxwell']
+    assert matcher.expand('people', "ghislaine maxwell") == \
+        ['G. Maxwell', 'Ghislaine Maxwell']
+    assert matcher.expand('organizations', "Clinton") == \
+        ['Clinton Foundation', 'The Clinton Foundation']
+    assert matcher.expand('locations', "York") == ['New York']
+
+
+def test_fuzzy_expansion(matcher):
+    """Fuzzy mode tolerates typos in filter names"""
+    assert matcher.expand('people', "Maxwel") == ["Maxwel"]
+    assert matcher.expand('people', "Epstien", mode="fuzzy") == ['Jeffrey Epstein', 'Mr. Epstein']
+    assert matcher.expand('people', "Ghislane Maxwell", mode="fuzzy") == \
+        ['G. Maxwell', 'Ghislaine Maxwell']
+    assert matcher.expand('people', "Einstein", mode="fuzzy") == ["Einstein"]
+
+
+def test_exact_mode_and_unknown_names(matcher):
+    """Exact mode and names without matches are passed through"""
+    assert matcher.expand('people', "Maxwell", mode="exact") == ["Maxwell"]
+    assert matcher.expand('locations', "London") == ["London"]
+    with pytest.raises(ValueError):
+        matcher.expand('people', "Maxwell", mode="approximate")
+
+
+def test_expand_filters_keeps_other_filters(matcher):
+    """Only entity name lists are expanded"""
+    filters = {'people': ['Epstein'], 'locations': None,
+               'date_range': ('2005-01-01', '2005-12-31')}
+    expanded = matcher.expand_filters(filters)
+
+    assert expanded['people'] == ['Jeffrey Epstein', 'Mr. Epstein']
+    assert expanded['locations'] is None
+    assert expanded['date_range'] == filters['date_range']
+    assert filters['people'] == ['Epstein']
+
+
+def test_expansion_feeds_store_filter(tmp_path):
+    """Expanded names select every document mentioning a variant"""
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    for doc_id, person in [('doc_1', 'Ghislaine Maxwell'), ('doc_2', 'G. Maxwell'),
+                           ('doc_3', 'Jeffrey Epstein')]:
+        store.store_metadata({'doc_id': doc_id, 'people': [person], 'organizations': [],
+                              'locations': [], 'dates': [], 'emails': [], 'word_count': 10})
+    matcher = EntityMatcher.from_store(store)
+
+    people = matcher.expand('people', "Maxwell")
+    assert store.filter_documents(None, people=["Maxwell"]) == []
+    assert store.filter_documents(None, people=people) == ['doc_1', 'doc_2']
+    store.close()
+
+
+def test_expansion_touches_few_candidates(monkeypatch):
+    """A fuzzy lookup compares against a handful of tokens, not the vocabulary"""
+    rng = random.Random(5)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+             for _ in range(20000)]
+    names = [f"{rng.choice(words)} {rng.choice(words)}" for _ in range(50000)]
+    matcher = EntityMatcher({'people': names})
+
+    comparisons = []
+    monkeypatch.setattr(entity_matcher, "SequenceMatcher",
+                        lambda *args: comparisons.append(args[1:]) or SequenceMatcher(*args))
+    target = next(word for name in names for word in name.split() if len(word) >= 6)
+    expanded = matcher.expand('people', target[:-1] + "x", mode="fuzzy")
+
+    assert {name for name in names if target in name.split()} <= set(expanded)
+    assert 0 < len(comparisons) < 50
+    assert len(matcher.postings['people']) > 10000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,84 @@
+"""
+Unit tests for the in-memory facet index
+"""
+
+import random
+
+import numpy as np
+import pytest
+from src.bm25_index import BM25Index
+from src.facet_index import FacetIndex
+from src.metadata_store import MetadataStore
+
+
+@pytest.fixture
+def populated_store(tmp_path):
+    """Metadata store with random entities, plus the document id order"""
+    rng = random.Random(7)
+    people = ['Jeffrey Epstein', 'Ghislaine Maxwell', 'Bill Clinton', 'Donald Trump']
+    locations = ['Paris', 'New York', 'London', 'Palm Beach']
+    dates = ['2001-03-04', 'November 30, 2005', '6/15/2010', '2015-07-12']
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    doc_ids = [f'doc_{i:03d}' for i in range(60)]
+    store.store_many([
+        {
+            'doc_id': doc_id,
+            'people': rng.sample(people, rng.randint(0, 2)),
+            'organizations': [],
+            'locations': rng.sample(locations, rng.randint(0, 2)),
+            'dates': rng.sample(dates, rng.randint(0, 2)),
+            'emails': [],
+            'word_count': 100
+        }
+        for doc_id in doc_ids
+    ])
+    yield store, doc_ids
+    store.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {'people': ['Ghislaine Maxwell']},
+    {'people': ['jeffrey epstein', 'Bill Clinton'], 'locations': ['Paris']},
+    {'people': ['Jeffrey Epstein'], 'locations': ['London'], 'combine': 'or'},
+    {'people': ['Jeffrey Epstein', 'Donald Trump'], 'require_all': True},
+    {'date_range': ('2005-01-01', '2010-12-31'), 'locations': ['Palm Beach']},
+    {'people': ['Nobody']},
+])
+def test_mask_matches_store_filter(populated_store, filters):
+    """Facet masks select the same documents as MetadataStore.filter_documents"""
+    store, doc_ids = populated_store
+    facets = FacetIndex.from_store(store, doc_ids)
+
+    allowed = facets.mask(**filters)
+    expected = store.filter_documents(doc_ids, **filters)
+
+    assert [doc_ids[i] for i in np.flatnonzero(allowed)] == expected
+
+
+def test_mask_without_filters_is_none(populated_store):
+    """No filters means no restriction"""
+    store, doc_ids = populated_store
+    assert FacetIndex.from_store(store, doc_ids).mask() is None
+
+
+@pytest.mark.parametrize("fraction", [0.05, 0.2, 0.9])
+def test_bm25_top_k_with_allowed_mask(fraction):
+    """Masked top-k equals exhaustive scoring restricted to the allowed docs"""
+    rng = random.Random(3)
+    words = [f"w{i}" for i in range(40)]
+    corpus = [[rng.choice(words) for _ in range(rng.randint(5, 30))] for _ in range(200)]
+    index = BM25Index.build(corpus)
+    allowed = np.array([rng.random() < fraction for _ in corpus])
+
+    query = ["w1", "w2", "w3"]
+    docs, scores = index.top_k(query, 10, allowed=allowed)
+
+    full = index.get_scores(query)
+    candidates = [i for i in range(len(corpus)) if allowed[i] and full[i] != 0]
+    expected = sorted(candidates, key=lambda i: (-full[i], i))[:10]
+    assert docs.tolist() == expected
+    assert np.allclose(scores, full[expected])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
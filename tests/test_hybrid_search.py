@@ -0,0 +1,168 @@
+"""
+Unit tests for hybrid BM25 + dense retrieval in the enhanced search engine
+"""
+
+import random
+
+import pytest
+from src.chunker import TextChunker
+from src.dense_search import DenseSearchEngine
+from src.enhanced_search import BOOST_WEIGHTS, RRF_K, EnhancedSearchEngine
+from src.metadata_store import MetadataStore
+from src.sparse_search import BM25SearchEngine
+from tests.test_dense_search import HashingEncoder
+
+PEOPLE = ['Ghislaine Maxwell', 'Jeffrey Epstein', 'Bill Clinton']
+
+QUERY = "flight island passengers"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Hybrid engine over a random corpus with topical words in some documents"""
+    rng = random.Random(5)
+    vocabulary = [f"word{i}" for i in range(500)]
+    topical = ["flight", "island", "passengers", "pilot", "villa"]
+    documents = []
+    metadata = []
+    for i in range(60):
+        words = rng.sample(vocabulary, 30) + rng.sample(topical, rng.randint(0, 3))
+        rng.shuffle(words)
+        documents.append({'doc_id': f'doc_{i:03d}', 'filename': f'doc_{i:03d}.txt',
+                          'text': ' '.join(words)})
+        metadata.append({'doc_id': f'doc_{i:03d}',
+                         'people': rng.sample(PEOPLE, rng.randint(0, 2)),
+                         'organizations': [], 'locations': [],
+                         'dates': [], 'emails': [], 'word_count': len(words)})
+
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.store_many(metadata)
+    bm25 = BM25SearchEngine(documents)
+    dense = DenseSearchEngine(bm25, str(tmp_path / "dense"), encoder=HashingEncoder(),
+                              chunker=TextChunker(window=400, overlap=40))
+    engine = EnhancedSearchEngine(bm25, store, dense_engine=dense)
+    engine.metadata = {entry['doc_id']: entry for entry in metadata}
+    yield engine
+    engine.close()
+    store.close()
+
+
+def rankings(engine, candidates, allowed=None):
+    """Standalone BM25 and dense rankings as {doc_id: (rank, score)}"""
+    bm25 = engine.bm25_engine
+    docs, scores = bm25.rank(bm25.parse_query(QUERY)[0], [], candidates, allowed)
+    keyword = {bm25.documents[d]['doc_id']: (rank, s)
+               for rank, (d, s) in enumerate(zip(docs.tolist(), scores.tolist()), 1) if s > 0}
+    docs, scores, _ = engine.dense_engine.rank(engine.dense_engine.encode_query(QUERY),
+                                               candidates, allowed)
+    semantic = {bm25.documents[d]['doc_id']: (rank, s)
+                for rank, (d, s) in enumerate(zip(docs.tolist(), scores.tolist()), 1)}
+    return keyword, semantic
+
+
+def test_rrf_fuses_both_rankings(engine):
+    """Every candidate of either ranking is kept, scored by reciprocal rank"""
+    keyword, semantic = rankings(engine, 10)
+    results = engine.search(QUERY, top_k=100, mode="hybrid", hybrid_candidates=10)
+
+    assert {r['doc_id'] for r in results} == set(keyword) | set(semantic)
+    assert set(semantic) - set(keyword), "expected documents found only by the dense stage"
+    for result in results:
+        expected = sum(1.0 / (RRF_K + ranking[result['doc_id']][0])
+                       for ranking in (keyword, semantic) if result['doc_id'] in ranking)
+        assert result['score'] == pytest.approx(expected)
+        bm25_score = keyword.get(result['doc_id'], (None, None))[1]
+        assert result['bm25_score'] == (pytest.approx(bm25_score) if bm25_score else None)
+        assert result['preview']
+    scores = [r['score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+    plan = engine.last_plan
+    assert plan['strategy'] == 'hybrid' and plan['fusion'] == 'rrf'
+    assert set(plan['latency_ms']) >= {'encode', 'bm25', 'dense', 'fusion', 'total'}
+
+
+def test_linear_fusion_blends_normalized_scores(engine):
+    """Linear fusion weights min-max normalized scores"""
+    keyword, semantic = rankings(engine, 20)
+    results = engine.search(QUERY, top_k=5, mode="hybrid", fusion="linear",
+                            dense_weight=0.7, hybrid_candidates=20)
+
+    def normalized(ranking, doc_id):
+        if doc_id not in ranking:
+            return 0.0
+        scores = [score for _, score in ranking.values()]
+        return (ranking[doc_id][1] - min(scores)) / (max(scores) - min(scores))
+
+    assert len(results) == 5
+    for result in results:
+        expected = (0.3 * normalized(keyword, result['doc_id'])
+                    + 0.7 * normalized(semantic, result['doc_id']))
+        assert result['score'] == pytest.approx(expected)
+
+    bm25_only = engine.search(QUERY, top_k=5, mode="hybrid", fusion="linear", dense_weight=0.0,
+                              hybrid_candidates=20)
+    assert [r['doc_id'] for r in bm25_only] == \
+        [r['doc_id'] for r in engine.search(QUERY, top_k=5)]
+
+
+def test_filters_apply_to_both_stages(engine):
+    """Strict filters restrict both rankings; boost reranks the fused list"""
+    people = ['Ghislaine Maxwell']
+    results = engine.search(QUERY, top_k=100, filter_people=people, mode="hybrid",
+                            hybrid_candidates=30)
+    assert results
+    assert all(set(engine.metadata[r['doc_id']]['people']) & set(people) for r in results)
+    assert engine.last_plan['allowed_docs'] == sum(
+        bool(set(entry['people']) & set(people)) for entry in engine.metadata.values())
+
+    plain = engine.search(QUERY, top_k=100, mode="hybrid", hybrid_candidates=30)
+    boosted = engine.search(QUERY, top_k=100, filter_people=people, mode="hybrid",
+                            hybrid_candidates=30, filter_strategy="boost")
+    fused = {r['doc_id']: r['score'] for r in plain}
+    assert {r['doc_id'] for r in boosted} == set(fused)
+    for result in boosted:
+        matched = people[0] in engine.metadata[result['doc_id']]['people']
+        expected = BOOST_WEIGHTS['people'] * matched
+        assert result['metadata_boost'] == pytest.approx(expected)
+        assert result['score'] == pytest.approx(fused[result['doc_id']] * (1 + expected))
+
+
+def test_hybrid_cache_and_validation(engine):
+    """Hybrid results are cached apart from BM25 ones; bad options are rejected"""
+    engine.search(QUERY, top_k=5, mode="hybrid")
+    engine.search(QUERY, top_k=5)
+    assert engine.last_plan['strategy'] == 'unfiltered'
+    engine.search(QUERY, top_k=5, mode="hybrid")
+    assert engine.last_plan['strategy'] == 'cached'
+
+    with pytest.raises(ValueError):
+        engine.search(QUERY, mode="hybrid", fusion="max")
+    with pytest.raises(ValueError):
+        engine.search(QUERY, mode="dense")
+    bm25_only = EnhancedSearchEngine(engine.bm25_engine, engine.metadata_store)
+    with pytest.raises(ValueError):
+        bm25_only.search(QUERY, mode="hybrid")
+
+
+def test_close_stops_worker_threads(engine):
+    """close() shuts the hybrid thread pool down; the context manager calls it"""
+    engine.search(QUERY, top_k=5, mode="hybrid")
+    executor = engine._executor
+    assert any(thread.is_alive() for thread in executor._threads)
+    engine.close()
+    for thread in executor._threads:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in executor._threads)
+    with pytest.raises(ValueError):
+        engine.search("another query", mode="hybrid")
+    engine.close()
+
+    with EnhancedSearchEngine(engine.bm25_engine, engine.metadata_store,
+                              dense_engine=engine.dense_engine) as scoped:
+        assert scoped.search(QUERY, top_k=3, mode="hybrid")
+    assert scoped._executor is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
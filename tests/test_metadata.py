@@ -5,7 +5,8 @@ Unit tests for MVP2 metadata extraction and filtering
 import pytest
 import os
 from src.metadata_extractor import MetadataExtractor
-from src.metadata_store import MetadataStore
+from datetime import date
+from src.metadata_store import MetadataStore, parse_date
 from src.enhanced_search import EnhancedSearchEngine
 from src.sparse_search import BM25SearchEngine
 
@@ -95,6 +96,42 @@ def test_extract_organizations(metadata_extractor):
     assert len(metadata['organizations']) >= 1
 
 
+def test_batch_extraction_matches_serial(metadata_extractor, sample_documents):
+    """nlp.pipe batch extraction returns the same metadata as the serial path"""
+    serial = [
+        metadata_extractor.extract_metadata(doc['text'], doc['doc_id'])
+        for doc in sample_documents
+    ]
+    batch = list(metadata_extractor.extract_metadata_batch(
+        ((doc['text'], doc['doc_id']) for doc in sample_documents),
+        batch_size=2
+    ))
+    
+    assert batch == serial
+
+
+def test_batch_extraction_of_multi_passage_documents(metadata_extractor):
+    """Documents split into many passages give the same metadata in batches"""
+    from src.chunker import TextChunker
+    
+    metadata_extractor.chunker = TextChunker(window=80, overlap=20)
+    documents = [
+        (" ".join([
+            "Jeffrey Epstein met with Ghislaine Maxwell in Paris on July 15, 2015.",
+            "Flights to London were booked by jeffrey@example.com on 2015-08-20.",
+            "Bill Clinton visited New York with the Clinton Foundation.",
+        ] * 4), 'doc_long'),
+        ("Short note from Maxwell.", 'doc_short'),
+        ("", 'doc_empty'),
+    ]
+    serial = [metadata_extractor.extract_metadata(text, doc_id) for text, doc_id in documents]
+    batch = list(metadata_extractor.extract_metadata_batch(documents, batch_size=3))
+    
+    assert len(metadata_extractor.chunker.spans(documents[0][0])) > 5
+    assert batch == serial
+    assert batch[0]['emails'] == ['jeffrey@example.com']
+
+
 def test_store_and_retrieve_metadata(metadata_store):
     """Test storing and retrieving metadata"""
     metadata = {
@@ -210,6 +247,87 @@ def test_filter_multiple_criteria(metadata_store):
     assert 'doc_001' in result
 
 
+def test_filter_combinations(metadata_store):
+    """Filters combine with AND/OR across types and any/all within a list"""
+    for doc_id, people, locations in [('doc_001', ['Maxwell', 'Epstein'], ['Paris']),
+                                      ('doc_002', ['Maxwell'], ['London']),
+                                      ('doc_003', ['Clinton'], ['Paris'])]:
+        metadata_store.store_metadata({
+            'doc_id': doc_id,
+            'people': people,
+            'organizations': [],
+            'locations': locations,
+            'dates': [],
+            'emails': [],
+            'word_count': 100
+        })
+    doc_ids = ['doc_003', 'doc_002', 'doc_001', 'doc_999']
+    
+    assert metadata_store.filter_documents(
+        doc_ids, people=['maxwell'], locations=['Paris']) == ['doc_001']
+    assert metadata_store.filter_documents(
+        doc_ids, people=['Maxwell'], locations=['Paris'], combine='or'
+    ) == ['doc_003', 'doc_002', 'doc_001']
+    assert metadata_store.filter_documents(
+        doc_ids, people=['Maxwell', 'Epstein'], require_all=True) == ['doc_001']
+    assert metadata_store.filter_documents(doc_ids, people=['Nobody']) == []
+
+
+def test_estimate_filter_cardinality(metadata_store):
+    """Cardinality estimates bound the filtered document count"""
+    for i in range(10):
+        metadata_store.store_metadata({
+            'doc_id': f'doc_{i:03d}',
+            'people': ['Maxwell'] + (['Epstein'] if i < 3 else []),
+            'organizations': [],
+            'locations': ['Paris'] if i % 2 else [],
+            'dates': [],
+            'emails': [],
+            'word_count': 100
+        })
+    
+    assert metadata_store.estimate_filter_cardinality() == 10
+    assert metadata_store.estimate_filter_cardinality(people=['Epstein']) == 3
+    assert metadata_store.estimate_filter_cardinality(people=['Epstein'], locations=['Paris']) == 3
+    assert metadata_store.estimate_filter_cardinality(
+        people=['Epstein'], locations=['Paris'], combine='or') == 8
+    assert metadata_store.estimate_filter_cardinality(people=['Nobody']) == 0
+    assert len(metadata_store.filter_documents(None, people=['Epstein'])) == 3
+
+
+def test_parse_date_formats():
+    """All extracted date formats parse to the same ordinal day"""
+    expected = date(2015, 7, 12).toordinal()
+    for text in ['2015-07-12', '7/12/2015', '07-12-2015', 'July 12, 2015', 'Jul 12 2015']:
+        assert parse_date(text) == expected
+    assert parse_date('13/45/2015') is None
+    assert parse_date('Someday 12, 2015') is None
+
+
+def test_date_range_uses_parsed_dates(metadata_store):
+    """Date ranges compare calendar days, not strings in mixed formats"""
+    for doc_id, dates in [('doc_001', ['July 12, 2015']),
+                          ('doc_002', ['1/2/2003', '2010-05-05']),
+                          ('doc_003', ['12/31/2016'])]:
+        metadata_store.store_metadata({
+            'doc_id': doc_id,
+            'people': [],
+            'organizations': [],
+            'locations': [],
+            'dates': dates,
+            'emails': [],
+            'word_count': 100
+        })
+    
+    assert metadata_store.documents_in_date_range('2015-01-01', '2015-12-31') == ['doc_001']
+    assert metadata_store.filter_documents(
+        ['doc_001', 'doc_002', 'doc_003'],
+        date_range=(date(2010, 1, 1), 'December 31, 2016')
+    ) == ['doc_001', 'doc_002', 'doc_003']
+    assert metadata_store.get_date_bounds('doc_002') == (date(2003, 1, 2), date(2010, 5, 5))
+    assert metadata_store.get_date_bounds('doc_999') is None
+
+
 def test_enhanced_search_with_filters(sample_documents, metadata_store):
     """Test enhanced search with metadata filters"""
     # Create BM25 engine
@@ -269,6 +387,203 @@ def test_get_all_entities(metadata_store):
     assert 'Paris' in entities['locations']
 
 
+def test_store_many_replaces_existing(metadata_store):
+    """Bulk writes replace earlier metadata and keep indexes after a deferred load"""
+    metadata_store.store_metadata({
+        'doc_id': 'doc_001',
+        'people': ['Old Name'],
+        'organizations': [],
+        'locations': [],
+        'dates': [],
+        'emails': [],
+        'word_count': 5
+    })
+    batch = [
+        {
+            'doc_id': f'doc_00{i}',
+            'people': ['Jeffrey Epstein'],
+            'organizations': ['FBI'],
+            'locations': ['Paris'] if i % 2 else ['London'],
+            'dates': ['2015-07-12'],
+            'emails': [],
+            'word_count': 100 + i
+        }
+        for i in range(1, 4)
+    ]
+    with metadata_store.bulk_load(defer_indexes=True):
+        metadata_store.store_many(batch)
+    
+    retrieved = metadata_store.get_metadata('doc_001')
+    assert retrieved['people'] == ['Jeffrey Epstein']
+    assert retrieved['word_count'] == 101
+    
+    result = metadata_store.filter_documents(
+        doc_ids=['doc_001', 'doc_002', 'doc_003'],
+        locations=['Paris']
+    )
+    assert sorted(result) == ['doc_001', 'doc_003']
+    
+    indexes = {row['name'] for row in metadata_store.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_doc_entities_doc' in indexes
+
+
+def test_bulk_load_restores_journal_mode(tmp_path):
+    """The build leaves no WAL files next to the database"""
+    db_path = tmp_path / "metadata.db"
+    store = MetadataStore(str(db_path))
+    before = store.conn.execute("PRAGMA journal_mode").fetchone()[0]
+    with store.bulk_load():
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        store.store_many([{'doc_id': 'doc_001', 'people': ['Jeffrey Epstein'],
+                           'organizations': [], 'locations': [], 'dates': [],
+                           'emails': [], 'word_count': 3}])
+    
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == before
+    assert not (tmp_path / "metadata.db-wal").exists()
+    assert store.get_metadata('doc_001')['people'] == ['Jeffrey Epstein']
+    store.close()
+
+
+def test_legacy_schema_is_migrated(tmp_path):
+    """A database with one table per entity type is normalized on open"""
+    import sqlite3
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE document_metadata (
+            doc_id TEXT PRIMARY KEY,
+            word_count INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for table, column in [('people', 'name'), ('organizations', 'name'),
+                          ('locations', 'name'), ('dates', 'date_str'), ('emails', 'email')]:
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_id TEXT,
+                {column} TEXT,
+                FOREIGN KEY (doc_id) REFERENCES document_metadata(doc_id)
+            )
+        """)
+    conn.execute("CREATE INDEX idx_people_name ON people(name)")
+    conn.execute("CREATE INDEX idx_dates_str ON dates(date_str)")
+    
+    rows = {
+        'doc_001': {'people': ['Ghislaine Maxwell'], 'locations': ['Paris'],
+                    'dates': ['July 12, 2015']},
+        'doc_002': {'people': ['ghislaine  maxwell', 'Jeffrey Epstein'],
+                    'locations': ['London'], 'dates': ['2010-05-05', '1/2/2003']},
+        'doc_003': {'people': ['Jeffrey Epstein'], 'locations': ['Paris'], 'dates': []}
+    }
+    for doc_id, entities in rows.items():
+        conn.execute("INSERT INTO document_metadata (doc_id, word_count) VALUES (?, ?)",
+                     (doc_id, 10))
+        for name in entities['people']:
+            conn.execute("INSERT INTO people (doc_id, name) VALUES (?, ?)", (doc_id, name))
+        for name in entities['locations']:
+            conn.execute("INSERT INTO locations (doc_id, name) VALUES (?, ?)", (doc_id, name))
+        for date_str in entities['dates']:
+            conn.execute("INSERT INTO dates (doc_id, date_str) VALUES (?, ?)", (doc_id, date_str))
+    conn.commit()
+    
+    # Filter results of the old schema's exact-name lookups
+    def legacy_filter(table, names):
+        placeholders = ",".join("?" * len(names))
+        return sorted(row[0] for row in conn.execute(
+            f"SELECT DISTINCT doc_id FROM {table} WHERE name IN ({placeholders})", names))
+    
+    before = {
+        'people': legacy_filter('people', ['Jeffrey Epstein']),
+        'locations': legacy_filter('locations', ['Paris', 'London'])
+    }
+    conn.close()
+    
+    store = MetadataStore(db_path)
+    tables = {row['name'] for row in store.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not tables & {'people', 'organizations', 'locations', 'dates', 'emails'}
+    assert not any(name.startswith('legacy_') for name in tables)
+    
+    # Spellings of the same person share one entity row
+    people = store.conn.execute(
+        "SELECT name FROM entities WHERE type = 'person' ORDER BY name").fetchall()
+    assert [row['name'] for row in people] == ['Ghislaine Maxwell', 'Jeffrey Epstein']
+    assert store.conn.execute("SELECT COUNT(*) FROM doc_entities").fetchone()[0] == 10
+    assert store.get_metadata('doc_002')['people'] == ['Ghislaine Maxwell', 'Jeffrey Epstein']
+    
+    all_docs = sorted(rows)
+    assert store.filter_documents(all_docs, people=['Jeffrey Epstein']) == before['people']
+    assert store.filter_documents(all_docs, locations=['Paris', 'London']) == \
+        before['locations']
+    assert store.filter_documents(all_docs, people=['GHISLAINE MAXWELL']) == \
+        ['doc_001', 'doc_002']
+    
+    # Parsed dates are backfilled for range queries and bounds
+    assert store.conn.execute("SELECT COUNT(*) FROM doc_dates").fetchone()[0] == 3
+    assert store.documents_in_date_range('2015-01-01', '2015-12-31') == ['doc_001']
+    assert store.get_date_bounds('doc_002') == (date(2003, 1, 2), date(2010, 5, 5))
+    assert store.get_date_bounds('doc_003') is None
+    store.close()
+    
+    # Reopening the migrated database leaves it as it is
+    reopened = MetadataStore(db_path)
+    assert reopened.document_count() == 3
+    reopened.close()
+
+
+def test_manifest_and_prune(metadata_store):
+    """Metadata of documents no manifest entry refers to is pruned"""
+    for doc_id in ['doc_aaa', 'doc_bbb']:
+        metadata_store.store_metadata({
+            'doc_id': doc_id,
+            'people': ['Maxwell'],
+            'organizations': [],
+            'locations': [],
+            'dates': [],
+            'emails': [],
+            'word_count': 10
+        })
+    metadata_store.update_manifest([
+        {'path': 'a.txt', 'size': 1, 'mtime_ns': 1, 'content_hash': 'aaa',
+         'doc_id': 'doc_aaa', 'extractor_version': 1},
+        {'path': 'b.txt', 'size': 1, 'mtime_ns': 1, 'content_hash': 'bbb',
+         'doc_id': 'doc_bbb', 'extractor_version': 1}
+    ])
+    assert set(metadata_store.get_manifest()) == {'a.txt', 'b.txt'}
+    
+    metadata_store.remove_from_manifest(['b.txt'])
+    assert metadata_store.prune_unreferenced() == 1
+    assert metadata_store.get_metadata('doc_bbb') is None
+    assert metadata_store.get_metadata('doc_aaa') is not None
+
+
+def test_plan_update_skips_unchanged_files(tmp_path):
+    """Only new or modified files are scheduled for extraction"""
+    from build_metadata_index import plan_update
+    from src.document_loader import DocumentLoader
+    
+    (tmp_path / "kept.txt").write_text("unchanged")
+    (tmp_path / "edited.txt").write_text("before")
+    loader = DocumentLoader(str(tmp_path))
+    
+    version = MetadataExtractor.EXTRACTOR_VERSION
+    manifest = {}
+    for name in ["kept.txt", "edited.txt", "deleted.txt"]:
+        stat = (tmp_path / "kept.txt").stat() if name == "deleted.txt" else (tmp_path / name).stat()
+        manifest[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                          'extractor_version': version}
+    (tmp_path / "edited.txt").write_text("after the edit")
+    (tmp_path / "added.txt").write_text("new file")
+    
+    to_load, _, unchanged, removed = plan_update(loader, manifest)
+    
+    assert sorted(path.name for path in to_load) == ["added.txt", "edited.txt"]
+    assert unchanged == 1
+    assert removed == ["deleted.txt"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,108 @@
+"""
+Unit tests for phrase and proximity queries
+"""
+
+import random
+
+import numpy as np
+import pytest
+from src.bm25_index import BM25Index
+from src.sparse_search import BM25SearchEngine, PROXIMITY_WEIGHT
+
+
+@pytest.fixture
+def documents():
+    """Documents mentioning the same words with and without the phrase"""
+    filler = " ".join(f"filler{i}" for i in range(50))
+    return [
+        {'doc_id': 'doc_1', 'filename': 'doc1.txt',
+         'text': f"Visitors flew to Little St. James island. {filler}"},
+        {'doc_id': 'doc_2', 'filename': 'doc2.txt',
+         'text': f"James said the island was little. {filler} St. Thomas airport."},
+        {'doc_id': 'doc_3', 'filename': 'doc3.txt',
+         'text': f"The flight log lists passengers. {filler}"},
+        {'doc_id': 'doc_4', 'filename': 'doc4.txt',
+         'text': f"Flight times were noted. {filler} See log book. Another flight."},
+        {'doc_id': 'doc_5', 'filename': 'doc5.txt',
+         'text': f"Unrelated text about Paris. {filler}"}
+    ]
+
+
+@pytest.fixture
+def random_corpus():
+    """Random corpus over a small vocabulary, so phrases repeat"""
+    rng = random.Random(3)
+    vocabulary = [f"w{i}" for i in range(40)]
+    return [rng.choices(vocabulary[:8] + vocabulary, k=rng.randint(0, 150)) for _ in range(200)]
+
+
+def test_phrase_docs_match_brute_force(random_corpus):
+    """Phrase documents and frequencies equal a scan of every document"""
+    index = BM25Index.build(random_corpus)
+    rng = random.Random(4)
+    for _ in range(100):
+        phrase = [f"w{rng.randrange(10)}" for _ in range(rng.randint(1, 3))]
+        expected = {}
+        for doc, tokens in enumerate(random_corpus):
+            count = sum(tokens[i:i + len(phrase)] == phrase
+                        for i in range(len(tokens) - len(phrase) + 1))
+            if count:
+                expected[doc] = count
+
+        docs, counts = index.phrase_docs(phrase)
+        assert dict(zip(docs.tolist(), counts.tolist())) == expected
+
+
+def test_proximity_closeness(random_corpus):
+    """Closeness is the mean inverse distance of consecutive query terms"""
+    index = BM25Index.build(random_corpus)
+    query = ["w1", "w2", "w3"]
+    docs, closeness = index.proximity(query)
+
+    assert set(docs.tolist()) == {doc for doc, tokens in enumerate(random_corpus)
+                                  if set(query) <= set(tokens)}
+    for doc, value in zip(docs, closeness):
+        tokens = random_corpus[doc]
+        expected = 0.0
+        for first, second in zip(query, query[1:]):
+            expected += 1 / min(abs(i - j) for i, a in enumerate(tokens) if a == first
+                                for j, b in enumerate(tokens) if b == second)
+        assert value == pytest.approx(expected / 2)
+
+
+def test_positions_saved_and_loaded(random_corpus, tmp_path):
+    """Delta-encoded positions round-trip through the index directory"""
+    index = BM25Index.build(random_corpus)
+    index.save(str(tmp_path), "fp")
+    loaded = BM25Index.load(str(tmp_path), "fp")
+
+    assert loaded.positions.pos_deltas.dtype == np.uint8
+    for phrase in (["w1", "w2"], ["w3", "w3", "w0"]):
+        for expected, actual in zip(index.phrase_docs(phrase), loaded.phrase_docs(phrase)):
+            assert np.array_equal(expected, actual)
+
+
+def test_quoted_phrase_query(documents):
+    """Quoted phrases drop documents that only contain the words"""
+    engine = BM25SearchEngine(documents)
+
+    assert {r['doc_id'] for r in engine.search("Little St. James")} == {'doc_1', 'doc_2'}
+    assert [r['doc_id'] for r in engine.search('"Little St. James"')] == ['doc_1']
+    assert [r['doc_id'] for r in engine.search('"flight log" passengers')] == ['doc_3']
+    assert engine.search('"log flight"') == []
+    assert engine.parse_query('"flight" log "St. James') == (['flight', 'log', 'st', 'james'], [])
+
+
+def test_proximity_boost(documents):
+    """Proximity raises documents where the terms are adjacent"""
+    engine = BM25SearchEngine(documents)
+    plain = {r['doc_id']: r['score'] for r in engine.search("flight log")}
+    near = {r['doc_id']: r['score'] for r in engine.search("flight log", proximity=True)}
+
+    assert set(near) == set(plain)
+    assert near['doc_3'] == pytest.approx(plain['doc_3'] * (1 + PROXIMITY_WEIGHT))
+    assert plain['doc_4'] < near['doc_4'] < plain['doc_4'] * (1 + PROXIMITY_WEIGHT / 2)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
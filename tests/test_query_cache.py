@@ -0,0 +1,89 @@
+"""
+Unit tests for the query result cache
+"""
+
+import pytest
+from src.metadata_store import MetadataStore
+from src.query_cache import QueryCache
+
+
+class FakeClock:
+    """Manually advanced time source"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    """The least recently used entry is evicted first"""
+    cache = QueryCache(max_size=2, ttl_seconds=None)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == [1]
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL are treated as misses"""
+    clock = FakeClock()
+    cache = QueryCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.put("query", ["result"])
+
+    clock.now = 59
+    assert cache.get("query") == ["result"]
+    clock.now = 121
+    assert cache.get("query") is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['expirations'] == 1
+    assert stats['size'] == 0
+
+
+def test_returned_values_are_copies():
+    """Callers cannot corrupt cached results"""
+    cache = QueryCache()
+    cache.put("query", [{'doc_id': 'doc_1', 'score': 2.0}])
+    cache.get("query")[0]['score'] = -1.0
+
+    assert cache.get("query")[0]['score'] == 2.0
+
+
+def test_metadata_version_changes_on_write(tmp_path):
+    """Writes from any connection change the store's data version"""
+    db_path = str(tmp_path / "metadata.db")
+    store = MetadataStore(db_path)
+    other = MetadataStore(db_path)
+    metadata = {
+        'doc_id': 'doc_001',
+        'people': ['Maxwell'],
+        'organizations': [],
+        'locations': [],
+        'dates': [],
+        'emails': [],
+        'word_count': 10
+    }
+
+    version = store.data_version()
+    store.store_metadata(metadata)
+    assert store.data_version() != version
+
+    version = store.data_version()
+    other.store_metadata(metadata)
+    assert store.data_version() != version
+
+    other.close()
+    store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
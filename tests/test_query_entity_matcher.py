@@ -0,0 +1,89 @@
+"""
+Unit tests for the gazetteer query entity matcher
+"""
+
+import pytest
+from src.metadata_store import MetadataStore
+from src.query_entity_matcher import QueryEntityMatcher
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Metadata store with a few overlapping entity names"""
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.store_many([
+        {
+            'doc_id': 'doc_001',
+            'people': ['Ghislaine Maxwell', 'Maxwell', 'Al'],
+            'organizations': ['New York Times'],
+            'locations': ['New York', 'Paris'],
+            'dates': [],
+            'emails': [],
+            'word_count': 100
+        },
+        {
+            'doc_id': 'doc_002',
+            'people': ['Jeffrey Epstein'],
+            'organizations': ['Paris', 'Flight', 'The'],
+            'locations': ['Paris', 'Palm Beach'],
+            'dates': [],
+            'emails': [],
+            'word_count': 100
+        }
+    ])
+    yield store
+    store.close()
+
+
+def test_match_longest_names(store):
+    """The longest known name wins and canonical names are returned"""
+    matcher = QueryEntityMatcher.from_store(store)
+    found = matcher.match("what did ghislaine  MAXWELL tell the New York Times?")
+
+    assert found['people'] == ['Ghislaine Maxwell']
+    assert found['organizations'] == ['New York Times']
+    assert found['locations'] == []
+
+
+def test_match_multiple_types(store):
+    """Ambiguous names take the type with the most documents"""
+    matcher = QueryEntityMatcher.from_store(store)
+    found = matcher.match("Maxwell flights from New York to Paris and Palm Beach")
+
+    assert found['people'] == ['Maxwell']
+    assert found['locations'] == ['New York', 'Paris', 'Palm Beach']
+    assert found['organizations'] == []
+
+
+def test_short_and_partial_names_ignored(store):
+    """Very short names and partial tokens are not tagged"""
+    matcher = QueryEntityMatcher.from_store(store)
+    found = matcher.match("Al met Epstein's lawyer in Parisian cafes")
+
+    assert found == {'people': [], 'locations': [], 'organizations': []}
+
+
+def test_common_words_need_capitals(store):
+    """Single-word names in lowercase queries are taken as common words"""
+    matcher = QueryEntityMatcher.from_store(store)
+
+    assert matcher.match("flight logs from the new york trip") == \
+        {'people': [], 'locations': ['New York'], 'organizations': []}
+    assert matcher.match("maxwell in paris")['people'] == []
+    assert matcher.match("Flight logs")['organizations'] == ['Flight']
+    assert matcher.match("The Paris flights") == \
+        {'people': [], 'locations': ['Paris'], 'organizations': []}
+
+
+def test_empty_store(tmp_path):
+    """A store without entities gives an empty gazetteer"""
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    matcher = QueryEntityMatcher.from_store(store)
+
+    assert matcher.size == 0
+    assert matcher.match("Maxwell in Paris")['people'] == []
+    store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,114 @@
+"""
+Unit tests for query-aware snippets
+"""
+
+import numpy as np
+import pytest
+from src.bm25_index import BM25Index
+from src.document_loader import DocumentLoader
+from src.snippets import SnippetGenerator
+from src.sparse_search import BM25SearchEngine
+from src.text_processor import TextProcessor
+
+
+@pytest.fixture
+def documents():
+    """Documents whose query matches lie far from the start"""
+    filler = " ".join(f"filler{i}" for i in range(300))
+    return [
+        {
+            'doc_id': 'doc_1',
+            'filename': 'doc1.txt',
+            'text': "HOUSE OVERSIGHT 001\n\n" + filler
+                    + "\nThe flight logs list Maxwell on the Paris trip.\n" + filler
+                    + " Another flight."
+        },
+        {
+            'doc_id': 'doc_2',
+            'filename': 'doc2.txt',
+            'text': "Page 2 — “Café” İstanbul résumé. " * 20
+                    + "Maxwell’s flight to İstanbul and Paris. " + "Ünïcödé tail. " * 20
+        },
+        {
+            'doc_id': 'doc_3',
+            'filename': 'doc3.txt',
+            'text': "Short note mentioning Paris."
+        }
+    ]
+
+
+def highlighted_terms(result):
+    """Lowercased text of every highlighted span"""
+    return [result['preview'][start:end].lower() for start, end in result['highlights']]
+
+
+def test_token_offsets_locate_tokens():
+    """Stored byte offsets point at each token, also after multi-byte text"""
+    processor = TextProcessor()
+    text = "İstanbul — Café “Maxwell” x résumé ünïcödé 42"
+    tokens, starts = processor.tokenize_spans(text)
+
+    assert tokens == processor.tokenize(text)
+    assert "maxwell" in tokens and "résumé" in tokens
+    data = text.encode('utf-8')
+    for (token, char_start, char_end), start in zip(processor.token_spans(text), starts):
+        assert data[:start].decode('utf-8') == text[:char_start]
+        assert text[char_start:char_end].lower().endswith(token[-1])
+
+
+def test_snippet_finds_best_passage(documents):
+    """The snippet shows the window holding most query terms, highlighted"""
+    engine = BM25SearchEngine(documents)
+    results = {r['doc_id']: r for r in engine.search("Maxwell flight Paris", top_k=5)}
+
+    first = results['doc_1']
+    assert "The flight logs list Maxwell on the Paris trip." in first['preview']
+    assert first['preview'].startswith("...") and first['preview'].endswith("...")
+    assert highlighted_terms(first) == ['flight', 'maxwell', 'paris']
+    assert len(first['preview']) <= 206
+
+    second = results['doc_2']
+    assert "Maxwell’s flight to İstanbul and Paris." in second['preview']
+    assert highlighted_terms(second) == ['maxwell', 'flight', 'paris']
+    assert SnippetGenerator.highlight(
+        {'text': second['preview'], 'highlights': second['highlights']}
+    ).count("**") == 6
+
+    assert results['doc_3']['preview'] == "Short note mentioning Paris."
+    assert highlighted_terms(results['doc_3']) == ['paris']
+
+
+def test_store_backed_snippets_match(documents, tmp_path):
+    """Snippets read from the memory-mapped store equal in-memory ones"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for doc in documents:
+        (data_dir / doc['filename']).write_text(doc['text'], encoding='utf-8')
+
+    streamed = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)),
+                                            index_dir=str(tmp_path / "bm25"))
+    loaded = BM25SearchEngine.from_loader(DocumentLoader(str(data_dir)),
+                                          index_dir=str(tmp_path / "bm25"))
+    in_memory = BM25SearchEngine(documents)
+
+    query = "maxwell flight paris"
+    expected = {r['filename']: r['preview'] for r in in_memory.search(query)}
+    for engine in (streamed, loaded):
+        assert {r['filename']: r['preview'] for r in engine.search(query)} == expected
+
+
+def test_fallback_without_offsets(documents):
+    """Indexes built without offsets fall back to the document start"""
+    processor = TextProcessor()
+    index = BM25Index.build([processor.tokenize(doc['text']) for doc in documents])
+    assert not SnippetGenerator(index, processor).available
+
+    engine = BM25SearchEngine(documents)
+    engine.index = index
+    snippet = engine.get_snippet(0, ["maxwell"])
+    assert snippet == {'text': engine.get_preview(0), 'highlights': []}
+    assert np.array_equal(index.doc_len, engine.index.tokens.lengths())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])